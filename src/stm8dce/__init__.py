@@ -14,3 +14,6 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 __version__ = "1.1.0"
+
+from .dce import Options, Analysis, analyze, apply, rewrite
+from .jobserver import JobSlots
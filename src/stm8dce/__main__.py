@@ -22,36 +22,28 @@ SDCC STM8 Dead Code Elimination Tool
 """
 
 import os
+import io
+import sys
+import functools
+import contextlib
 import argparse
-import shutil
 
 from . import debug
-from . import asm_analysis
-from . import rel_analysis
+from . import dce
+from . import rel_index
+from . import asm_summary
 from . import settings
+from . import server
+from . import archive
 
 from .__init__ import __version__
-from .asm_parser import ASMParser
-from .rel_parser import RELParser
-
-
-def eval_flabel(flabel):
-    """
-    Evaluates a function label for exclusion.
-
-    Users can specify a function label either as is (e.g., _hello) or with its filename (e.g., file.asm:_hello)
-    to allow exclusion for cases where multiple functions have the same name.
-
-    Args:
-        flabel (str): The function label to evaluate.
-
-    Returns:
-        tuple: A tuple of filename and name. If the filename is not specified, filename is None.
-    """
-    if ":" in flabel:
-        filename, name = flabel.split(":")
-        return filename, name
-    return None, flabel
+from .cache import ParseCache
+from .settings import Options
+from .watch import FileWatcher, WatchState
+from .variants import load_variants
+from .batch import load_projects
+from .jobserver import JobSlots
+from .exclusions import load_exclude_file
 
 
 def run(
@@ -65,16 +57,40 @@ def run(
     verbose,
     debug_flag,
     opt_irq,
+    cache=None,
+    jobs=None,
+    output_strategy="copy",
+    depfile=None,
+    input_archive=None,
+    output_archive=None,
+    exclude_patterns=None,
+    explain=None,
+    flash_budget=None,
+    retained=None,
+    opt_fold=False,
+    opt_pool=False,
+    opt_blocks=False,
+    opt_trampolines=False,
+    opt_calls=False,
+    stack_report=False,
+    stack_budget=None,
 ):
     """
     Perform dead code elimination on the given input files.
 
-    This function processes the specified assembly (.asm), relocatable (.rel), and library (.lib) files to identify and remove unused functions and constants.
-    The processed files are stored in the specified output directory.
+    This function processes the specified assembly (.asm), relocatable (.rel), and library (.lib) files to identify and remove unused functions, constants and variables.
+    Prebuilt indexes (.dceidx) may be provided in place of, or alongside, the .rel and .lib files they were generated from.
+    Likewise, summaries (.dcesum) may be provided in place of the assembly files they were generated from, in which case
+    the assembly files are only copied and edited, but not parsed.
+    The processed files are stored in the specified output directory. Output files whose content
+    is unchanged are left untouched, preserving their modification times for build tools.
+    Input files may also be read from a tar archive, and the processed files written into one,
+    without touching the filesystem.
 
     Args:
-        input_files (list of str): List of input file paths (ASM, rel, and lib files).
-        output_dir (str): Directory where the processed ASM files will be stored.
+        input_files (list of str): List of input file paths (ASM, dcesum, rel, lib and dceidx files).
+        output_dir (str): Directory where the processed ASM files will be stored (may be None if
+                          an output archive is provided).
         entry_label (str): Entry label (default: "_main").
         exclude_functions (list of str): List of function labels to exclude from dead code elimination.
         exclude_constants (list of str): List of constant labels to exclude from dead code elimination.
@@ -83,468 +99,1039 @@ def run(
         verbose (bool): Enable verbose output.
         debug_flag (bool): Enable debug output.
         opt_irq (bool): Option to remove unused IRQ handlers (Caution: Removes iret's for unused interrupts!).
+        cache (ParseCache, optional): Cache of parsed input files, allowing consecutive runs to skip
+                                      parsing unchanged files. If not provided, all files are parsed.
+        jobs (JobSlots, optional): Job slots to parse and write files in parallel. If not provided,
+                                   all files are processed sequentially.
+        output_strategy (str, optional): How output files without dead code are created
+                                         (See dce.OUTPUT_STRATEGIES, default: "copy").
+        depfile (str, optional): If provided, a Makefile dependency file listing the input files
+                                 each output file depends on is written to this path.
+        input_archive (str or file object, optional): A tar archive (or "-" for stdin) whose ASM, rel and
+                                                      lib members are processed along with the input files.
+        output_archive (str or file object, optional): A tar archive (or "-" for stdout) to write
+                                                       the processed ASM files into.
+        exclude_patterns (list of str, optional): Patterns matching functions and constants to exclude
+                                                  from dead code elimination (See exclusions).
+        explain (list of str, optional): Functions and constants to print the shortest chain of
+                                         references that keeps them for.
+        flash_budget (int, optional): If provided, the run fails if the estimated size of the kept
+                                      functions, constants and initializers exceeds this number of bytes.
+        retained (int, optional): If provided, prints this number of functions and constants with
+                                  the largest retained size (See dce.Analysis.retained_sizes).
+        opt_fold (bool, optional): Fold kept functions with identical code into a single copy.
+        opt_pool (bool, optional): Pool kept constants with identical data into a single definition.
+        opt_blocks (bool, optional): Remove code of kept functions that is unreachable from their entry.
+        opt_trampolines (bool, optional): Redirect references to functions that only jump to another function.
+        opt_calls (bool, optional): Remove calls to functions that only return, along with these functions.
+        stack_report (bool, optional): Print the worst-case stack depth of the entry, excluded functions
+                                       and interrupt handlers (See dce.Analysis.stack_usage).
+        stack_budget (int, optional): If provided, the run fails if the worst-case stack depth, including
+                                      interrupts, exceeds this number of bytes or is unbounded.
+
+    Raises:
+        ValueError: If the kept functions, constants and initializers exceed the flash budget,
+                    or the worst-case stack depth exceeds the stack budget.
     """
-    settings.verbose = verbose or debug_flag
-    settings.debug = debug_flag
-    settings.opt_irq = opt_irq
-    settings.codeseg = codeseg
-    settings.constseg = constseg
+    options = Options(
+        entry_label,
+        exclude_functions,
+        exclude_constants,
+        codeseg,
+        constseg,
+        opt_irq,
+        verbose,
+        debug_flag,
+        exclude_patterns,
+        opt_fold,
+        opt_pool,
+        opt_blocks,
+        opt_trampolines,
+        opt_calls,
+    )
+
+    if output_dir is None and output_archive is None:
+        raise ValueError("Error: No output directory or output archive provided")
+
+    if depfile and (output_dir is None or input_archive):
+        raise ValueError(
+            "Error: A dependency file requires an output directory and no input archive"
+        )
 
     # Check if output directory exists
-    if not os.path.exists(output_dir):
+    if output_dir is not None and not os.path.exists(output_dir):
         raise ValueError(f"Error: Output directory does not exist: {output_dir}")
 
-    # ==========================================
-    # rel and lib Parsing
-    # ==========================================
+    # Archive members are processed like input files of the same name
+    sources = archive.read_archive(input_archive) if input_archive else {}
+    input_files = list(sources) + list(input_files)
+
+    analysis = dce.analyze(input_files, options, cache, output_dir, jobs, sources)
 
-    # Gather all modules from rel and lib files
-    modules = []
+    for diagnostic in analysis.diagnostics:
+        print(diagnostic)
 
-    for input_file in input_files:
-        if input_file.endswith(".rel") or input_file.endswith(".lib"):
-            relparser = RELParser(input_file)
-            modules += relparser.modules
+    remove_functions = analysis.remove_functions
+    remove_constants = analysis.remove_constants
+    keep_functions = analysis.keep_functions
+    keep_constants = analysis.keep_constants
+    functions = analysis.functions
+    constants = analysis.constants
+
+    if options.verbose:
+        print()
+        print("Removing Functions:")
+        for removed_function in remove_functions:
+            print(
+                f"\t{removed_function.name} - {removed_function.path}:{removed_function.start_line_number} ({removed_function.size} bytes)"
+            )
+        print()
+        print("Removing Constants:")
+        for removed_constant in remove_constants:
+            print(
+                f"\t{removed_constant.name} - {removed_constant.path}:{removed_constant.start_line_number} ({removed_constant.size} bytes)"
+            )
+        print()
+        print("Removing Variables:")
+        for removed_variable in analysis.remove_variables:
+            print(
+                f"\t{removed_variable.name} - {removed_variable.path}:{removed_variable.start_line_number} ({removed_variable.size} bytes of RAM)"
+            )
+        print()
+        if analysis.folded_functions:
+            print("Folding Functions:")
+            for folded, function in analysis.folded_functions.items():
+                print(
+                    f"\t{folded.name} - {folded.path}:{folded.start_line_number} -> {function.name} - {function.path}:{function.start_line_number} ({folded.size} bytes)"
+                )
+            print()
+        if analysis.pooled_constants:
+            print("Pooling Constants:")
+            for pooled, constant in analysis.pooled_constants.items():
+                print(
+                    f"\t{pooled.name} - {pooled.path}:{pooled.start_line_number} -> {constant.name} - {constant.path}:{constant.start_line_number} ({pooled.size} bytes)"
+                )
+            print()
+        if analysis.remove_blocks:
+            print("Removing Unreachable Code:")
+            for function, first, last, size in analysis.remove_blocks:
+                print(
+                    f"\t{function.name} - {function.path}:{first}-{last} ({size} bytes)"
+                )
+            print()
+        if analysis.collapsed_trampolines:
+            print("Collapsing Trampolines:")
+            for trampoline, target in analysis.collapsed_trampolines.items():
+                print(
+                    f"\t{trampoline.name} - {trampoline.path}:{trampoline.start_line_number} -> {target} ({trampoline.size} bytes)"
+                )
+            print()
+        if analysis.remove_stubs:
+            print("Removing Calls to Stubs:")
+            for stub in analysis.remove_stubs:
+                print(
+                    f"\t{stub.name} - {stub.path}:{stub.start_line_number} ({stub.size} bytes)"
+                )
+                for function, line_number, size, called in analysis.remove_calls:
+                    if called is stub:
+                        print(
+                            f"\t\tcalled by {function.name} - {function.path}:{line_number} ({size} bytes)"
+                        )
+            print()
+        print("Keeping Functions (by size):")
+        for kept_function in sorted(keep_functions, key=lambda f: -f.size):
+            print(
+                f"\t{kept_function.name} - {kept_function.path}:{kept_function.start_line_number} ({kept_function.size} bytes)"
+            )
+        print()
+        print("Keeping Constants (by size):")
+        for kept_constant in sorted(keep_constants, key=lambda c: -c.size):
+            print(
+                f"\t{kept_constant.name} - {kept_constant.path}:{kept_constant.start_line_number} ({kept_constant.size} bytes)"
+            )
+        print()
 
     # ==========================================
-    # ASM Parsing
+    # Dead Code Removal
     # ==========================================
 
-    # Copy all files to output directory
-    for file in input_files:
-        if file.endswith(".asm"):
-            shutil.copy(file, output_dir)
-
-    # Parse all asm files for globals, interrupts, functions and constants
-    globals = []
-    interrupts = []
-    functions = []
-    constants = []
-    initializers = []
-
-    for output_file in os.listdir(output_dir):
-        if output_file.endswith(".asm"):
-            asmparser = ASMParser(os.path.join(output_dir, output_file))
-            globals += asmparser.globals
-            interrupts += asmparser.interrupts
-            constants += asmparser.constants
-            functions += asmparser.functions
-            initializers += asmparser.initializers
+    # Write all asm files to the output directory, with unused
+    # functions, global definitions, interrupt definitions,
+    # constants and variables removed (commented out)
+    # Unchanged output files are left untouched
+    updated = []
+    if output_dir is not None:
+        updated = dce.apply(analysis, jobs=jobs, strategy=output_strategy)
+
+    if output_archive:
+        archive.write_archive(output_archive, dce.rewrite(analysis))
+
+    if depfile:
+        dce.write_depfile(analysis, depfile)
 
     # ==========================================
-    # Reference Resolution
+    # Summary
     # ==========================================
 
-    # Resolve globals assigned to functions
-    debug.pdbg()
-    debug.pdbg("Resolving globals assigned to functions")
-    debug.pseperator()
+    print("Detected and removed:")
+    print(
+        f"{len(remove_functions)} unused functions from a total of {len(functions)} functions"
+    )
+    print(
+        f"{len(remove_constants)} unused constants from a total of {len(constants)} constants"
+    )
+    print(
+        f"{len(analysis.remove_variables)} unused variables from a total of {len(analysis.variables)} variables"
+    )
+    startup_size = sum(initializer.size for initializer in analysis.remove_initializers)
+    print(
+        f"{len(analysis.remove_initializers)} unused initializers from a total of {len(analysis.initializers)} initializers ({startup_size} bytes less copied at startup)"
+    )
+    if options.opt_fold:
+        folded_size = sum(function.size for function in analysis.folded_functions)
+        print(
+            f"{len(analysis.folded_functions)} identical functions folded ({folded_size} bytes)"
+        )
+    if options.opt_pool:
+        pooled_size = sum(constant.size for constant in analysis.pooled_constants)
+        print(
+            f"{len(analysis.pooled_constants)} identical constants pooled ({pooled_size} bytes)"
+        )
+    if options.opt_blocks:
+        unreachable_size = sum(size for _, _, _, size in analysis.remove_blocks)
+        affected = {function for function, _, _, _ in analysis.remove_blocks}
+        print(
+            f"{len(analysis.remove_blocks)} unreachable blocks in {len(affected)} kept functions ({unreachable_size} bytes)"
+        )
+    if options.opt_calls:
+        call_size = sum(stub.size for stub in analysis.remove_stubs) + sum(
+            size for _, _, size, _ in analysis.remove_calls
+        )
+        print(
+            f"{len(analysis.remove_calls)} calls to {len(analysis.remove_stubs)} stubs removed ({call_size} bytes, {dce.Analysis.CALL_CYCLES} cycles saved per executed call)"
+        )
+    if options.opt_trampolines:
+        trampoline_size = sum(
+            trampoline.size for trampoline in analysis.collapsed_trampolines
+        )
+        print(
+            f"{len(analysis.retargets)} references to trampolines redirected, {len(analysis.collapsed_trampolines)} trampolines removed ({trampoline_size} bytes)"
+        )
+    kept_size, removed_size = analysis.sizes()
+    print(f"{removed_size} bytes removed, {kept_size} bytes kept (estimated)")
+    kept_ram, removed_ram = analysis.ram_sizes()
+    print(f"{removed_ram} bytes of RAM removed, {kept_ram} bytes of RAM kept")
+    if output_dir is not None:
+        print(f"Updated {len(updated)} of {len(analysis.asm_files)} output files")
+        if options.verbose:
+            for output_file in updated:
+                print(f"\t{output_file}")
+
+    for name in explain or ():
+        print_explanation(analysis, name)
+
+    if retained:
+        print_retained(analysis, retained)
+
+    if stack_report or stack_budget is not None:
+        print_stack(analysis)
+
+    if flash_budget is not None and kept_size > flash_budget:
+        raise ValueError(
+            f"Error: Kept functions, constants and initializers ({kept_size} bytes) exceed the flash budget of {flash_budget} bytes"
+        )
+
+    if stack_budget is not None:
+        stack_total = analysis.stack_usage()[2]
+        if stack_total is None:
+            raise ValueError(
+                f"Error: Worst-case stack depth is unbounded due to recursion, the stack budget of {stack_budget} bytes can't be checked"
+            )
+        if stack_total > stack_budget:
+            raise ValueError(
+                f"Error: Worst-case stack depth ({stack_total} bytes) exceeds the stack budget of {stack_budget} bytes"
+            )
+
+    # Return removed and kept functions and constants for testing
+    return remove_functions, remove_constants, keep_functions, keep_constants
 
-    for function in functions:
-        function.resolve_globals(globals)
 
-    # Resolve interrupts
-    debug.pdbg()
-    debug.pdbg("Resolving interrupts")
-    debug.pseperator()
+def print_explanation(analysis, name):
+    """
+    Prints the shortest chain of references that keeps a function or constant
+    (ex. _main [entry] -call-> _UART1_Init -call-> _CLK_GetClockFreq).
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        name (str): The name of the function or constant, optionally with its filename.
+
+    Raises:
+        ValueError: If no function, constant or variable matches the name.
+    """
+    for obj, chain in analysis.explain(name):
+        label = f"{os.path.basename(obj.path)}:{obj.name}"
+        if chain is None:
+            print(f"{label} is removed")
+            continue
+
+        root, reason = chain[0]
+        text = f"{root.name} [{reason}]"
+        for node, kind in chain[1:]:
+            text += f" -{kind}-> {node.name}"
+        print(f"{label} is kept by: {text}")
 
-    for function in functions:
-        function.resolve_isr(interrupts)
 
-    # Resolve function calls
-    debug.pdbg()
-    debug.pdbg("Resolving function calls")
-    debug.pseperator()
+def print_retained(analysis, count):
+    """
+    Prints the kept functions and constants with the largest retained size, which is
+    the estimated size that would be removed along with them if they weren't referenced.
 
-    for function in functions:
-        function.resolve_calls(functions)
+    Args:
+        analysis (Analysis): The results of the analysis.
+        count (int): The number of functions and constants to print.
+    """
+    retained = analysis.retained_sizes()
+    ranked = sorted(retained.items(), key=lambda item: -item[1])[:count]
 
-    # Resolve function pointers
-    debug.pdbg()
-    debug.pdbg("Resolving function pointers")
-    debug.pseperator()
+    print(f"Largest retained sizes (top {len(ranked)}):")
+    for obj, size in ranked:
+        print(
+            f"\t{size:6} bytes - {obj.name} - {obj.path}:{obj.start_line_number} ({obj.size} bytes own)"
+        )
 
-    for function in functions:
-        function.resolve_fptrs(functions)
 
-    # Resolve globals assigned to constants
-    debug.pdbg()
-    debug.pdbg("Resolving globals assigned to constants")
-    debug.pseperator()
+def print_stack(analysis):
+    """
+    Prints the worst-case stack depth of the entry, excluded functions and interrupt
+    handlers, along with their deepest call paths, and of the program as a whole.
 
-    for constant in constants:
-        constant.resolve_globals(globals)
+    Args:
+        analysis (Analysis): The results of the analysis.
+    """
+    depths, deepest = analysis.stack_depths()
 
-    # Resolve constants loaded by functions
-    debug.pdbg()
-    debug.pdbg("Resolving constants loaded by functions")
-    debug.pseperator()
+    def describe(depth):
+        return "unbounded" if depth is None else f"{depth} bytes"
 
-    for function in functions:
-        function.resolve_constants(constants)
+    print("Worst-case stack depth (estimated):")
+    roots = dict.fromkeys(
+        (root, reason) for root, reason in analysis.roots if root in depths
+    )
+    for root, reason in roots:
+        depth = depths[root]
+        if reason == "interrupt handler" and depth is not None:
+            depth += analysis.INTERRUPT_CONTEXT
+
+        path = [root]
+        while deepest[path[-1]] is not None and deepest[path[-1]] not in path:
+            path.append(deepest[path[-1]])
+        if deepest[path[-1]] is not None:
+            path.append(deepest[path[-1]])
+
+        print(
+            f"\t{describe(depth):>11} - {root.name} - {root.path}:{root.start_line_number} ({reason})"
+        )
+        print(f"\t\t{' -> '.join(function.name for function in path)}")
 
-    # Resolve functions and constants accessed by initializers
-    debug.pdbg()
-    debug.pdbg("Resolving functions and constants accessed by initializers")
-    debug.pseperator()
+    main, interrupts, total = analysis.stack_usage()
+    print(
+        f"Main: {describe(main)}, interrupts: {describe(interrupts)}, total: {describe(total)}"
+    )
 
-    for initializer in initializers:
-        initializer.resolve_pointers(functions, constants)
 
-    # ==========================================
-    # Dead Code Evaluation
-    # ==========================================
+def run_variants(
+    input_files,
+    variants,
+    codeseg,
+    constseg,
+    verbose,
+    debug_flag,
+    cache=None,
+    jobs=None,
+    output_strategy="copy",
+):
+    """
+    Perform dead code elimination on the given input files for multiple variants.
 
-    keep_functions = []
-    keep_constants = []
+    The input files are parsed and resolved only once. Each variant is then evaluated
+    with its own entry label, exclusions and IRQ optimization, and its processed
+    assembly files are stored in its own output directory (created if necessary).
 
-    # Get entry function object
-    entry_function = asm_analysis.functions_by_name(functions, entry_label)
+    Args:
+        input_files (list of str): List of input file paths (See run).
+        variants (list of Variant): The variants to process (See variants.load_variants).
+        codeseg (str): Name of the code segment (default: "CODE").
+        constseg (str): Name of the constant segment (default: "CONST").
+        verbose (bool): Enable verbose output.
+        debug_flag (bool): Enable debug output.
+        cache (ParseCache, optional): Cache of parsed input files.
+        jobs (JobSlots, optional): Job slots to parse and write files in parallel.
+        output_strategy (str, optional): How output files without dead code are created
+                                         (See dce.OUTPUT_STRATEGIES, default: "copy").
 
-    if entry_function:
-        if len(entry_function) > 1:
-            raise ValueError(
-                f"Error: Multiple definitions for entry label: {entry_label}"
+    Returns:
+        dict: Maps variant names to their removed and kept functions and constants (See run).
+              The returned objects refer to the source paths of their files.
+    """
+    options = Options(
+        codeseg=codeseg, constseg=constseg, verbose=verbose, debug=debug_flag
+    )
+
+    ret = {}
+    with settings.use(options):
+        # Resolve without an output directory, each variant is written to its own
+        resolved = dce.resolve(input_files, None, cache, options, jobs)
+        for diagnostic in resolved.diagnostics:
+            print(diagnostic)
+
+        for variant in variants:
+            debug.pdbg()
+            debug.pdbg(f"Evaluating variant: {variant.name}")
+            debug.pseperator()
+
+            analysis = dce.evaluate(
+                resolved,
+                options.replace(
+                    entry_label=variant.entry_label,
+                    exclude_functions=variant.exclude_functions,
+                    exclude_constants=variant.exclude_constants,
+                    opt_irq=variant.opt_irq,
+                ),
             )
+            for diagnostic in analysis.diagnostics[len(resolved.diagnostics) :]:
+                print(f"{variant.name}: {diagnostic}")
 
-        entry_function = entry_function[0]
+            os.makedirs(variant.output_dir, exist_ok=True)
+            updated = dce.apply(
+                analysis, variant.output_dir, jobs=jobs, strategy=output_strategy
+            )
 
-        # Keep entry function and all of its traversed functions
-        debug.pdbg()
-        debug.pdbg(f"Traversing entry function: {entry_label}")
-        debug.pseperator()
-        keep_functions += [entry_function] + asm_analysis.traverse_functions(
-            functions, entry_function
-        )
-    elif modules:
-        # If it's not provided in the asm files, try to look for it in rel and lib files
-        debug.pdbg()
-        debug.pdbg("Entry label not found in ASM files, looking in rel and lib files")
-
-        entry_module = rel_analysis.modules_by_defined_symbol(modules, entry_label)
-        if not entry_module:
-            raise ValueError(f"Error: Entry label not found: {entry_label}")
-        if len(entry_module) > 1:
-            raise ValueError(
-                f"Error: Multiple definitions for entry label: {entry_label}"
+            print(
+                f"{variant.name}: Removed {len(analysis.remove_functions)}/{len(analysis.functions)} functions "
+                f"and {len(analysis.remove_constants)}/{len(analysis.constants)} constants -> {variant.output_dir} "
+                f"({len(updated)} files updated)"
             )
 
-        entry_module = entry_module[0]
+            ret[variant.name] = (
+                analysis.remove_functions,
+                analysis.remove_constants,
+                analysis.keep_functions,
+                analysis.keep_constants,
+            )
 
-        debug.pdbg(
-            f"Entry label found in {entry_module.path}:{entry_module.line_number} in module {entry_module.name}"
-        )
+    return ret
 
-        entry_module.resolve_outgoing_references(functions, constants)
-        for function in entry_module.references:
-            debug.pdbg()
-            debug.pdbg(
-                f"Traversing function {function.name} referenced by module {entry_module.name}"
+
+# Parse cache of the current batch worker process (See run_batch)
+_worker_cache = None
+
+
+def _run_project(project, verbose, debug_flag, cache=None):
+    """
+    Performs dead code elimination for a single batch project and captures its output.
+
+    Args:
+        project (Project): The project to process.
+        verbose (bool): Enable verbose output.
+        debug_flag (bool): Enable debug output.
+        cache (ParseCache, optional): Cache of parsed input files. If not provided,
+                                      the cache of the current worker process is used.
+
+    Returns:
+        tuple: The exit status and the captured output of the project.
+    """
+    global _worker_cache
+    if cache is None:
+        if _worker_cache is None:
+            _worker_cache = ParseCache()
+        cache = _worker_cache
+
+    output = io.StringIO()
+    status = 0
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            os.makedirs(project.output_dir, exist_ok=True)
+            run(
+                input_files=project.input_files,
+                output_dir=project.output_dir,
+                entry_label=project.entry_label,
+                exclude_functions=project.exclude_functions,
+                exclude_constants=project.exclude_constants,
+                codeseg=project.codeseg,
+                constseg=project.constseg,
+                verbose=verbose,
+                debug_flag=debug_flag,
+                opt_irq=project.opt_irq,
+                cache=cache,
             )
-            debug.pseperator()
-            keep_functions += [function] + asm_analysis.traverse_functions(
-                functions, function
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            status = 1
+            print(e)
+
+    return status, output.getvalue()
+
+
+def run_batch(projects, jobs, verbose, debug_flag, cache=None):
+    """
+    Perform dead code elimination for multiple independent projects.
+
+    Projects are distributed across a pool of worker processes. Each worker keeps its
+    parsed input files in memory, so that input files shared by multiple projects
+    (ex. libraries) are only parsed once per worker, regardless of their path.
+    With a single job, all projects are processed in this process, sharing a single cache.
+
+    The output of each project is printed once all projects have been processed, in manifest order.
+    A failing project doesn't stop the remaining projects from being processed.
+
+    Args:
+        projects (list of Project): The projects to process (See batch.load_projects).
+        jobs (int): Number of worker processes (None for the number of CPUs). When run
+                    from make, make's jobserver limits the number of workers as well.
+        verbose (bool): Enable verbose output.
+        debug_flag (bool): Enable debug output.
+        cache (ParseCache, optional): Cache of parsed input files, only used with a single job.
+
+    Returns:
+        dict: Maps project names to their exit status.
+    """
+    slots = JobSlots(jobs)
+    try:
+        if slots.jobs <= 1 or len(projects) <= 1:
+            if cache is None:
+                cache = ParseCache()
+            results = (
+                _run_project(project, verbose, debug_flag, cache)
+                for project in projects
+            )
+        else:
+            results = slots.map(
+                functools.partial(
+                    _run_project, verbose=verbose, debug_flag=debug_flag
+                ),
+                projects,
+                processes=True,
             )
-    else:
-        raise ValueError(f"Error: Entry label not found: {entry_label}")
 
-    # Keep interrupt handlers and all of their traversed functions
-    # but exclude unused IRQ handlers if opted by the user
-    interrupt_handlers = asm_analysis.interrupt_handlers(functions)
-    for handler in interrupt_handlers:
-        if settings.opt_irq and handler.empty:
-            continue
-        debug.pdbg()
-        debug.pdbg(f"Traversing IRQ handler: {handler.name}")
-        debug.pseperator()
-        keep_functions += [handler] + asm_analysis.traverse_functions(
-            functions, handler
+        ret = {}
+        for project, (status, output) in zip(projects, results):
+            print(f"== {project.name} ==")
+            print(output, end="")
+            if status:
+                print(f"Failed with exit status {status}")
+            ret[project.name] = status
+    finally:
+        slots.close()
+
+    failed = len([status for status in ret.values() if status])
+    print(f"Processed {len(projects)} projects, {failed} failed")
+
+    return ret
+
+
+def _output_signatures(analysis, cache):
+    """
+    Returns a signature of each output file, identifying its source content and edits.
+    An output file only has to be written again if its signature changed.
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        cache (ParseCache): Cache used to hash the source files.
+
+    Returns:
+        dict: Maps output paths to their signatures.
+    """
+    edits = analysis.edits()
+    return {
+        output_file: (
+            cache.file_hash(source_path),
+            tuple(
+                sorted(edit) for edit in edits.get(output_file, (set(), set(), set()))
+            ),
         )
+        for output_file, source_path in analysis.asm_files.items()
+    }
 
-    # Keep functions accessed by initializers
-    for initializer in initializers:
-        for function_pointer in initializer.function_pointers:
-            if (
-                isinstance(function_pointer, asm_analysis.Function)
-                and function_pointer not in keep_functions
-            ):
-                debug.pdbg()
-                debug.pdbg(
-                    f"Traversing function {function_pointer.name} accessed by initializer"
-                )
-                debug.pseperator()
-                keep_functions += [function_pointer] + asm_analysis.traverse_functions(
-                    functions, function_pointer
-                )
 
-    # Keep functions excluded by the user and all of their traversed functions
-    if exclude_functions:
-        for exclude_name in exclude_functions:
-            filename, name = eval_flabel(exclude_name)
-            if filename:
-                excluded_function = asm_analysis.function_by_filename_name(
-                    functions, filename, name
-                )
-            else:
-                excluded_function = asm_analysis.functions_by_name(functions, name)
-                if len(excluded_function) > 1:
-                    raise ValueError(
-                        f"Error: Multiple possible definitions for excluded function: {name}"
-                    )
-
-                excluded_function = excluded_function[0] if excluded_function else None
-
-            if not excluded_function:
-                print(f"Warning: Excluded function not found: {name}")
-                continue
-
-            if excluded_function not in keep_functions:
-                debug.pdbg()
-                debug.pdbg(f"Traversing excluded function: {name}")
-                debug.pseperator()
-                keep_functions += [excluded_function] + asm_analysis.traverse_functions(
-                    functions, excluded_function
-                )
+def watch_iteration(
+    input_files,
+    output_dir,
+    options,
+    cache,
+    state,
+    jobs=None,
+    output_strategy="copy",
+    depfile=None,
+):
+    """
+    Performs a single run of the watch mode (See watch).
 
-    # Remove duplicates
-    keep_functions = list(set(keep_functions))
+    Only output files whose source or edits changed since the previous run are written.
+    After the first run, the functions that are newly kept or newly removed compared to
+    the previous run are printed.
 
-    # Resolve external references
-    for module in modules:
-        module.resolve_references(keep_functions, initializers, functions, constants)
+    Args:
+        input_files (list of str): List of input file paths (See run).
+        output_dir (str): Directory where the processed ASM files will be stored.
+        options (Options): The DCE options.
+        cache (ParseCache): Cache of parsed input files, shared by all runs.
+        state (WatchState): Results of the previous run, updated with the results of this run.
+        jobs (JobSlots, optional): Job slots to parse and write files in parallel.
+        output_strategy (str, optional): How output files without dead code are created
+                                         (See dce.OUTPUT_STRATEGIES, default: "copy").
+        depfile (str, optional): If provided, a Makefile dependency file is written to this path.
 
-    # Keep functions and constants that are referenced by lib and rel files
-    for module in modules:
-        for ref in module.references:
-            if isinstance(ref, asm_analysis.Function) and ref not in keep_functions:
-                debug.pdbg()
-                debug.pdbg(
-                    f"Traversing function {ref.name} referenced by module {module.name}"
-                )
-                debug.pseperator()
-                keep_functions += [ref] + asm_analysis.traverse_functions(
-                    functions, ref
-                )
-            elif isinstance(ref, asm_analysis.Constant) and ref not in keep_constants:
-                keep_constants.append(ref)
-
-    # Once again, remove possible duplicates
-    keep_functions = list(set(keep_functions))
-
-    # Keep constants loaded by kept functions
-    for kept_function in keep_functions:
-        keep_constants += kept_function.constants
-
-    # Keep constants accessed by initializers
-    for initializer in initializers:
-        for constant in initializer.constant_pointers:
-            if constant not in keep_constants:
-                keep_constants.append(constant)
-
-    # Keep excluded constants
-    if exclude_constants:
-        for excluded_const_name in exclude_constants:
-            filename, name = eval_flabel(excluded_const_name)
-            if filename:
-                excluded_constant = asm_analysis.constant_by_filename_name(
-                    constants, filename, name
-                )
-            else:
-                excluded_constant = asm_analysis.constants_by_name(constants, name)
-                if len(excluded_constant) > 1:
-                    raise ValueError(
-                        f"Error: Multiple possible definitions for excluded constant: {name}"
-                    )
+    Returns:
+        tuple: The analysis and the list of written output files.
 
-                excluded_constant = excluded_constant[0] if excluded_constant else None
+    Raises:
+        ValueError: If the analysis fails.
+        OSError: If an input file can't be read or an output file can't be written.
+    """
+    analysis = dce.analyze(input_files, options, cache, output_dir, jobs)
+
+    for diagnostic in analysis.diagnostics:
+        print(diagnostic)
+
+    signatures = _output_signatures(analysis, cache)
+    changed = {
+        output_file
+        for output_file, signature in signatures.items()
+        if state.signatures.get(output_file) != signature
+        or not os.path.exists(output_file)
+    }
+    updated = dce.apply(analysis, only=changed, jobs=jobs, strategy=output_strategy)
+    if depfile:
+        dce.write_depfile(analysis, depfile)
+
+    kept = {
+        (function.name, analysis.asm_files[function.path])
+        for function in analysis.keep_functions
+    }
+    removed = {
+        (function.name, analysis.asm_files[function.path])
+        for function in analysis.remove_functions
+    }
+
+    if state.kept is None:
+        print(
+            f"Removed {len(analysis.remove_functions)} unused functions from a total of {len(analysis.functions)} functions"
+        )
+        print(
+            f"Removed {len(analysis.remove_constants)} unused constants from a total of {len(analysis.constants)} constants"
+        )
+    else:
+        for name, path in sorted(kept & state.removed):
+            print(f"Newly kept: {name} - {path}")
+        for name, path in sorted(removed & state.kept):
+            print(f"Newly removed: {name} - {path}")
 
-            if not excluded_constant:
-                print(f"Warning: Excluded constant not found: {name}")
-                continue
+    for output_file in sorted(updated):
+        print(f"Updated {output_file}")
 
-            if excluded_constant and (excluded_constant not in keep_constants):
-                keep_constants.append(excluded_constant)
+    state.signatures = signatures
+    state.kept = kept
+    state.removed = removed
 
-    # Remove duplicates
-    keep_constants = list(set(keep_constants))
+    return analysis, updated
 
-    # Remove functions that are not in keep_functions
-    remove_functions = [func for func in functions if func not in keep_functions]
 
-    # Remove global labels assigned to removed functions
-    remove_globals = []
-    for removed_function in remove_functions:
-        remove_globals += removed_function.global_defs
+def watch(
+    input_files,
+    output_dir,
+    entry_label,
+    exclude_functions,
+    exclude_constants,
+    codeseg,
+    constseg,
+    verbose,
+    debug_flag,
+    opt_irq,
+    interval=0.5,
+    jobs=None,
+    output_strategy="copy",
+    depfile=None,
+    exclude_patterns=None,
+    opt_fold=False,
+    opt_pool=False,
+    opt_blocks=False,
+    opt_trampolines=False,
+    opt_calls=False,
+):
+    """
+    Performs dead code elimination on the given input files and repeats it whenever they change.
 
-    # Remove interrupt definitions assigned to removed IRQ handlers
-    remove_interrupts = []
-    for removed_function in remove_functions:
-        if removed_function.isr_def:
-            remove_interrupts.append(removed_function.isr_def)
+    Parsed files are kept in memory, so that only changed files are parsed again. After each run,
+    only output files whose source or edits changed are written, and the functions that are newly
+    kept or newly removed compared to the previous run are printed. Runs until interrupted.
 
-    # Remove constants that are not in keep_constants
-    remove_constants = [const for const in constants if const not in keep_constants]
+    Args:
+        input_files (list of str): List of input file paths (See run).
+        output_dir (str): Directory where the processed ASM files will be stored.
+        entry_label (str): Entry label (default: "_main").
+        exclude_functions (list of str): List of function labels to exclude from dead code elimination.
+        exclude_constants (list of str): List of constant labels to exclude from dead code elimination.
+        codeseg (str): Name of the code segment (default: "CODE").
+        constseg (str): Name of the constant segment (default: "CONST").
+        verbose (bool): Enable verbose output.
+        debug_flag (bool): Enable debug output.
+        opt_irq (bool): Option to remove unused IRQ handlers (Caution: Removes iret's for unused interrupts!).
+        interval (float, optional): Polling interval in seconds.
+        jobs (JobSlots, optional): Job slots to parse and write files in parallel.
+        output_strategy (str, optional): How output files without dead code are created
+                                         (See dce.OUTPUT_STRATEGIES, default: "copy").
+        depfile (str, optional): If provided, a Makefile dependency file listing the input files
+                                 each output file depends on is written to this path.
+        exclude_patterns (list of str, optional): Patterns matching functions and constants to exclude
+                                                  from dead code elimination (See exclusions).
+        opt_fold (bool, optional): Fold kept functions with identical code into a single copy.
+        opt_pool (bool, optional): Pool kept constants with identical data into a single definition.
+        opt_blocks (bool, optional): Remove code of kept functions that is unreachable from their entry.
+        opt_trampolines (bool, optional): Redirect references to functions that only jump to another function.
+        opt_calls (bool, optional): Remove calls to functions that only return, along with these functions.
+    """
+    options = Options(
+        entry_label,
+        exclude_functions,
+        exclude_constants,
+        codeseg,
+        constseg,
+        opt_irq,
+        verbose,
+        debug_flag,
+        exclude_patterns,
+        opt_fold,
+        opt_pool,
+        opt_blocks,
+        opt_trampolines,
+        opt_calls,
+    )
 
-    # Remove global labels assigned to removed constants
-    remove_globals += [
-        glob_def for const in remove_constants for glob_def in const.global_defs
-    ]
+    # Check if output directory exists
+    if not os.path.exists(output_dir):
+        raise ValueError(f"Error: Output directory does not exist: {output_dir}")
 
-    if settings.verbose:
-        print()
-        print("Removing Functions:")
-        for removed_function in remove_functions:
-            print(
-                f"\t{removed_function.name} - {removed_function.path}:{removed_function.start_line_number}"
-            )
-        print()
-        print("Removing Constants:")
-        for removed_constant in remove_constants:
-            print(
-                f"\t{removed_constant.name} - {removed_constant.path}:{removed_constant.start_line_number}"
+    cache = ParseCache()
+    watcher = FileWatcher(input_files, interval)
+    state = WatchState()
+
+    while True:
+        try:
+            analysis, _ = watch_iteration(
+                input_files,
+                output_dir,
+                options,
+                cache,
+                state,
+                jobs,
+                output_strategy,
+                depfile,
             )
-        print()
+        except (ValueError, OSError) as e:
+            # Keep watching, the inputs may be in the middle of being rebuilt
+            print(e)
+            print("Waiting for changes...")
+            watcher.wait()
+            continue
 
-    # ==========================================
-    # Dead Code Removal
-    # ==========================================
+        # Also watch the assembly files of summaries
+        watcher.set_paths(set(input_files) | set(analysis.asm_files.values()))
 
-    # Group functions, globals, int defs and constants by file to reduce file I/O
-    file_functions = {}
-    file_globals = {}
-    file_interrupts = {}
-    file_constants = {}
-    for removed_function in remove_functions:
-        if removed_function.path not in file_functions:
-            file_functions[removed_function.path] = []
-        file_functions[removed_function.path].append(removed_function)
-    for removed_global in remove_globals:
-        if removed_global.path not in file_globals:
-            file_globals[removed_global.path] = []
-        file_globals[removed_global.path].append(removed_global)
-    for removed_interrupt in remove_interrupts:
-        if removed_interrupt.path not in file_interrupts:
-            file_interrupts[removed_interrupt.path] = []
-        file_interrupts[removed_interrupt.path].append(removed_interrupt)
-    for removed_constant in remove_constants:
-        if removed_constant.path not in file_constants:
-            file_constants[removed_constant.path] = []
-        file_constants[removed_constant.path].append(removed_constant)
-
-    # Remove (comment out) unused functions,
-    # global definitions, interrupt definitions
-    # and constants from the files
-    for file_path in file_functions:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-
-        # Global definitions
-        if file_path in file_globals:
-            for global_def in file_globals[file_path]:
-                lines[global_def.line_number - 1] = (
-                    ";" + lines[global_def.line_number - 1]
-                )
-            file_globals[file_path].remove(global_def)
-
-        # Interrupt definitions
-        # These must be set to 0x000000 instead of being commented out.
-        # else remaining IRQ handlers will be moved to a different VTABLE
-        # entry!
-        if file_path in file_interrupts:
-            for interrupt_def in file_interrupts[file_path]:
-                lines[interrupt_def.line_number - 1] = "    int 0x000000\n"
-            file_interrupts[file_path].remove(interrupt_def)
-
-        # Functions
-        if file_path in file_functions:
-            for function_def in file_functions[file_path]:
-                for line_number in range(
-                    function_def.start_line_number - 1, function_def.end_line_number
-                ):
-                    lines[line_number] = ";" + lines[line_number]
-
-        # Constants
-        if file_path in file_constants:
-            for constant_def in file_constants[file_path]:
-                for line_number in range(
-                    constant_def.start_line_number - 1, constant_def.end_line_number
-                ):
-                    lines[line_number] = ";" + lines[line_number]
-
-        with open(file_path, "w") as file:
-            file.writelines(lines)
-
-    # Remove any remaining global definitions
-    # assigned to removed functions
-    # This catches any global labels that import unused
-    # functions from other files
-    for file_path in file_globals:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-
-        for global_def in file_globals[file_path]:
-            lines[global_def.line_number - 1] = ";" + lines[global_def.line_number - 1]
-
-        with open(file_path, "w") as file:
-            file.writelines(lines)
-
-    # Remove interrupt definitions assigned to removed IRQ handlers
-    # if they haven't already been removed
-    for file_path in file_interrupts:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-
-        for interrupt_def in file_interrupts[file_path]:
-            lines[interrupt_def.line_number - 1] = "    int 0x000000\n"
-
-        with open(file_path, "w") as file:
-            file.writelines(lines)
-
-    # Remove any remaining constants
-    for file_path in file_constants:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-
-        for constant_def in file_constants[file_path]:
-            for line_number in range(
-                constant_def.start_line_number - 1, constant_def.end_line_number
-            ):
-                lines[line_number] = ";" + lines[line_number]
-
-        with open(file_path, "w") as file:
-            file.writelines(lines)
+        print("Waiting for changes...")
+        watcher.wait()
 
-    # ==========================================
-    # Summary
-    # ==========================================
 
-    print("Detected and removed:")
-    print(
-        f"{len(remove_functions)} unused functions from a total of {len(functions)} functions"
+def index_main(argv):
+    """
+    Entry point of the index subcommand.
+    Writes a prebuilt symbol index of a .rel or .lib file.
+
+    Args:
+        argv (list of str): Command-line arguments following the subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stm8dce index",
+        description="Create a prebuilt symbol index of a rel or lib file",
     )
-    print(
-        f"{len(remove_constants)} unused constants from a total of {len(constants)} constants"
+    parser.add_argument("input", help="rel or lib file to index", type=str)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help=f"Output index file (default: <input>{rel_index.INDEX_EXTENSION})",
+        type=str,
     )
+    parser.add_argument("-d", "--debug", help="Debug output", action="store_true")
 
-    # Return removed and kept functions and constants for testing
-    return remove_functions, remove_constants, keep_functions, keep_constants
+    parser.epilog = f"Example: stm8dce index stm8.lib -o stm8.lib{rel_index.INDEX_EXTENSION}"
 
+    args = parser.parse_args(argv)
 
-def main():
+    output = args.output or args.input + rel_index.INDEX_EXTENSION
+    with settings.use(Options(debug=args.debug)):
+        modules = rel_index.write_index(args.input, output)
+
+    print(f"Indexed {len(modules)} modules from {args.input} into {output}")
+
+
+def summarize_main(argv):
     """
-    The main function of the STM8DCE tool.
-    Parses command-line arguments and calls the run function.
+    Entry point of the summarize subcommand.
+    Writes a summary of an assembly file to be consumed by the link subcommand.
+
+    Args:
+        argv (list of str): Command-line arguments following the subcommand.
     """
-    # ==========================================
-    # Arg Parsing
-    # ==========================================
-    parser = argparse.ArgumentParser(description="STM8 SDCC dead code elimination tool")
-    parser.add_argument("input", nargs="+", help="ASM, rel and lib files", type=str)
+    parser = argparse.ArgumentParser(
+        prog="stm8dce summarize",
+        description="Create a summary of an ASM file for a later link step",
+    )
+    parser.add_argument("input", help="ASM file to summarize", type=str)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help=f"Output summary file (default: <input without .asm>{asm_summary.SUMMARY_EXTENSION})",
+        type=str,
+    )
+    parser.add_argument(
+        "--codeseg", help="Code segment name (default: CODE)", type=str, default="CODE"
+    )
+    parser.add_argument(
+        "--constseg",
+        help="Constant segment name (default: CONST)",
+        type=str,
+        default="CONST",
+    )
+    parser.add_argument("-d", "--debug", help="Debug output", action="store_true")
+
+    parser.epilog = (
+        f"Example: stm8dce summarize main.asm -o main{asm_summary.SUMMARY_EXTENSION}"
+    )
+
+    args = parser.parse_args(argv)
+
+    options = Options(codeseg=args.codeseg, constseg=args.constseg, debug=args.debug)
+
+    output = (
+        args.output or os.path.splitext(args.input)[0] + asm_summary.SUMMARY_EXTENSION
+    )
+    with settings.use(options):
+        asm_summary.write_summary(args.input, output, options)
+
+
+def link_main(argv):
+    """
+    Entry point of the link subcommand.
+    Equivalent to the main command, but intended to be
+    provided with summaries instead of assembly files.
+
+    Args:
+        argv (list of str): Command-line arguments following the subcommand.
+    """
+    dce_main(argv, prog="stm8dce link")
+
+
+def serve_main(argv):
+    """
+    Entry point of the serve subcommand.
+    Runs a DCE server which keeps parsed input files in memory between requests.
+
+    Args:
+        argv (list of str): Command-line arguments following the subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stm8dce serve",
+        description="Run a DCE server which keeps parsed files in memory between builds",
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"Unix domain socket to listen on (default: {server.default_socket_path()})",
+        type=str,
+        default=server.default_socket_path(),
+    )
+
+    parser.epilog = "Requests are sent using: stm8dce client [--socket SOCKET] <args>"
+
+    args = parser.parse_args(argv)
+
+    server.serve(
+        args.socket, lambda argv, cache: dce_main(argv, cache=cache, served=True)
+    )
+
+
+def client_main(argv):
+    """
+    Entry point of the client subcommand.
+    Sends a DCE request to a running server, or runs
+    it locally if no server is running.
+
+    Args:
+        argv (list of str): Command-line arguments following the subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stm8dce client",
+        description="Send a DCE request to a running stm8dce server. "
+        "All arguments besides the ones below are the same as for the main command.",
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"Unix domain socket of the server (default: {server.default_socket_path()})",
+        type=str,
+        default=server.default_socket_path(),
+    )
+    parser.add_argument(
+        "--shutdown", help="Stop the running server", action="store_true"
+    )
+
+    args, dce_argv = parser.parse_known_args(argv)
+
+    if args.shutdown:
+        req = {"command": "shutdown"}
+    else:
+        req = {"argv": dce_argv, "cwd": os.getcwd()}
+
+    try:
+        response = server.request(args.socket, req)
+    except ConnectionError as e:
+        if args.shutdown:
+            print(e)
+            return
+        print(f"Warning: {e}, running locally", file=sys.stderr)
+        dce_main(dce_argv)
+        return
+
+    print(response["output"], end="")
+    if response["status"]:
+        sys.exit(response["status"])
+
+
+def variants_main(argv):
+    """
+    Entry point of the variants subcommand.
+    Performs dead code elimination for all variants of a variant manifest.
+
+    Args:
+        argv (list of str): Command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stm8dce variants",
+        description="Perform dead code elimination for multiple variants of the same input files",
+    )
+    parser.add_argument("manifest", help="Variant manifest (JSON or TOML)", type=str)
+    parser.add_argument(
+        "input", nargs="+", help="ASM, dcesum, rel, lib and dceidx files", type=str
+    )
+    parser.add_argument(
+        "--codeseg", help="Code segment name (default: CODE)", type=str, default="CODE"
+    )
+    parser.add_argument(
+        "--constseg",
+        help="Constant segment name (default: CONST)",
+        type=str,
+        default="CONST",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of parallel jobs (default: number of CPUs, limited by make's jobserver)",
+        type=int,
+    )
+    parser.add_argument(
+        "--output-strategy",
+        help="How output files without dead code are created (default: copy)",
+        choices=dce.OUTPUT_STRATEGIES,
+        default="copy",
+    )
+    parser.add_argument("-v", "--verbose", help="Verbose output", action="store_true")
+    parser.add_argument("-d", "--debug", help="Debug output", action="store_true")
+    parser.epilog = "Example: stm8dce variants variants.json file1.asm file2.asm file3.lib ..."
+    args = parser.parse_args(argv)
+
+    jobs = JobSlots(args.jobs)
+    try:
+        run_variants(
+            input_files=args.input,
+            variants=load_variants(args.manifest),
+            codeseg=args.codeseg,
+            constseg=args.constseg,
+            verbose=args.verbose,
+            debug_flag=args.debug,
+            jobs=jobs,
+            output_strategy=args.output_strategy,
+        )
+    finally:
+        jobs.close()
+
+
+def batch_main(argv):
+    """
+    Entry point of the batch subcommand.
+    Performs dead code elimination for all projects of a batch manifest.
+
+    Args:
+        argv (list of str): Command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stm8dce batch",
+        description="Perform dead code elimination for multiple independent projects",
+    )
+    parser.add_argument("manifest", help="Batch manifest (JSON or TOML)", type=str)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes (default: number of CPUs, limited by make's jobserver)",
+        type=int,
+    )
+    parser.add_argument("-v", "--verbose", help="Verbose output", action="store_true")
+    parser.add_argument("-d", "--debug", help="Debug output", action="store_true")
+    parser.epilog = "Example: stm8dce batch projects.json -j 8"
+    args = parser.parse_args(argv)
+
+    results = run_batch(
+        projects=load_projects(args.manifest),
+        jobs=args.jobs,
+        verbose=args.verbose,
+        debug_flag=args.debug,
+    )
+
+    if any(results.values()):
+        sys.exit(1)
+
+
+SUBCOMMANDS = {
+    "index": index_main,
+    "summarize": summarize_main,
+    "link": link_main,
+    "serve": serve_main,
+    "client": client_main,
+    "variants": variants_main,
+    "batch": batch_main,
+}
+
+
+def dce_argument_parser(prog=None):
+    """
+    Creates the argument parser of the main (dead code elimination) command.
+
+    Args:
+        prog (str, optional): Program name to show in the usage message.
+
+    Returns:
+        argparse.ArgumentParser: The argument parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="STM8 SDCC dead code elimination tool",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "input", nargs="*", help="ASM, dcesum, rel, lib and dceidx files", type=str
+    )
     parser.add_argument(
         "-o",
         "--output",
         help="Output directory to store processed ASM files",
-        required=True,
     )
     parser.add_argument("-e", "--entry", help="Entry label", type=str, default="_main")
     parser.add_argument(
@@ -557,6 +1144,43 @@ def main():
         type=str,
         nargs="+",
     )
+    parser.add_argument(
+        "--exclude-file",
+        help="File with one exclusion pattern per line (name, file.asm:name, glob or re:regex)",
+        type=str,
+        action="append",
+    )
+    parser.add_argument(
+        "--explain",
+        help="Print the shortest chain of references that keeps a function or constant",
+        type=str,
+        action="append",
+        metavar="SYMBOL",
+    )
+    parser.add_argument(
+        "--flash-budget",
+        help="Fail if the estimated size of the kept functions and constants exceeds this number of bytes",
+        type=int,
+        metavar="BYTES",
+    )
+    parser.add_argument(
+        "--retained",
+        help="Print the N functions and constants with the largest retained size "
+        "(the size that is only kept through them)",
+        type=int,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--stack",
+        help="Print the worst-case stack depth of the entry, excluded functions and interrupt handlers",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stack-budget",
+        help="Fail if the worst-case stack depth, including interrupts, exceeds this number of bytes",
+        type=int,
+        metavar="BYTES",
+    )
     parser.add_argument(
         "--codeseg", help="Code segment name (default: CODE)", type=str, default="CODE"
     )
@@ -576,25 +1200,213 @@ def main():
         help="Remove unused IRQ handlers (Caution: Removes iret's for unused interrupts!)",
         action="store_true",
     )
+    parser.add_argument(
+        "--opt-fold",
+        help="Fold kept functions with identical code into a single copy and redirect their calls",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--opt-pool",
+        help="Pool kept constants with identical data (ex. tables and strings) into a single definition",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--opt-blocks",
+        help="Remove code of kept functions that is unreachable from their entry",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--opt-calls",
+        help="Remove calls to functions that only return (ex. stubbed hooks), along with these functions",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--opt-trampolines",
+        help="Redirect calls and jumps to functions that only jump to another function to the final target",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of parallel jobs (default: number of CPUs, limited by make's jobserver)",
+        type=int,
+    )
+    parser.add_argument(
+        "--output-strategy",
+        help="How output files without dead code are created. Linked files must not be "
+        "edited in place (default: copy)",
+        choices=dce.OUTPUT_STRATEGIES,
+        default="copy",
+    )
+    parser.add_argument(
+        "--depfile",
+        help="Write a Makefile dependency file listing the input files each output file depends on",
+        type=str,
+    )
+    parser.add_argument(
+        "--input-archive",
+        help="Tar archive (or - for stdin) whose ASM, rel and lib files are processed as input files",
+        type=str,
+    )
+    parser.add_argument(
+        "--output-archive",
+        help="Tar archive (or - for stdout) to write the processed ASM files into",
+        type=str,
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running and repeat DCE whenever an input file changes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        help="Polling interval of --watch in seconds (default: 0.5)",
+        type=float,
+        default=0.5,
+    )
 
     parser.epilog = (
-        "Example: stm8dce file1.asm file2.asm file3.rel file4.lib ... -o output/"
+        "Example: stm8dce file1.asm file2.asm file3.rel file4.lib ... -o output/\n"
+        "Subcommands:\n"
+        "  stm8dce index <file.lib> [-o <file.lib.dceidx>]\n"
+        "  stm8dce summarize <file.asm> [-o <file.dcesum>]\n"
+        "  stm8dce link <file1.dcesum> <file2.dcesum> ... -o output/\n"
+        "  stm8dce serve [--socket SOCKET]\n"
+        "  stm8dce client [--socket SOCKET] [--shutdown] <same arguments as above>\n"
+        "  stm8dce variants <manifest> <file1.asm> <file2.asm> ... [-j JOBS]\n"
+        "  stm8dce batch <manifest> [-j JOBS]"
     )
 
-    args = parser.parse_args()
+    return parser
 
-    run(
-        input_files=args.input,
-        output_dir=args.output,
-        entry_label=args.entry,
-        exclude_functions=args.exclude_function,
-        exclude_constants=args.exclude_constant,
-        codeseg=args.codeseg,
-        constseg=args.constseg,
-        verbose=args.verbose,
-        debug_flag=args.debug,
-        opt_irq=args.opt_irq,
-    )
+
+def dce_main(argv, prog=None, cache=None, served=False):
+    """
+    Parses the arguments of the main command and calls the run function.
+
+    Args:
+        argv (list of str): Command-line arguments.
+        prog (str, optional): Program name to show in the usage message.
+        cache (ParseCache, optional): Cache of parsed input files to pass to the run function.
+        served (bool, optional): Whether the arguments are a request to a DCE server, which
+                                 rejects options that would block the server.
+    """
+    parser = dce_argument_parser(prog)
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.input_archive:
+        parser.error("no input files or input archive provided")
+    if args.output is None and (args.watch or not args.output_archive):
+        parser.error("the following arguments are required: -o/--output")
+    if args.watch and (args.input_archive or args.output_archive):
+        parser.error("--watch can't be combined with archives")
+    if args.watch and (
+        args.explain
+        or args.flash_budget is not None
+        or args.retained is not None
+        or args.stack
+        or args.stack_budget is not None
+    ):
+        parser.error(
+            "--watch can't be combined with --explain, --flash-budget, --retained, "
+            "--stack or --stack-budget"
+        )
+    if served and args.watch:
+        parser.error("--watch can't be used with a server, run it locally instead")
+    if served and "-" in (args.input_archive, args.output_archive):
+        parser.error("archives can't be read from stdin or written to stdout by a server")
+
+    # Keep stdout free for the archive
+    output_archive = args.output_archive
+    stdout = contextlib.nullcontext()
+    if output_archive == "-":
+        output_archive = sys.stdout.buffer
+        stdout = contextlib.redirect_stdout(sys.stderr)
+
+    exclude_patterns = [
+        pattern
+        for path in args.exclude_file or ()
+        for pattern in load_exclude_file(path)
+    ]
+
+    jobs = JobSlots(args.jobs)
+    try:
+        if args.watch:
+            try:
+                watch(
+                    input_files=args.input,
+                    output_dir=args.output,
+                    entry_label=args.entry,
+                    exclude_functions=args.exclude_function,
+                    exclude_constants=args.exclude_constant,
+                    codeseg=args.codeseg,
+                    constseg=args.constseg,
+                    verbose=args.verbose,
+                    debug_flag=args.debug,
+                    opt_irq=args.opt_irq,
+                    interval=args.watch_interval,
+                    jobs=jobs,
+                    output_strategy=args.output_strategy,
+                    depfile=args.depfile,
+                    exclude_patterns=exclude_patterns,
+                    opt_fold=args.opt_fold,
+                    opt_pool=args.opt_pool,
+                    opt_blocks=args.opt_blocks,
+                    opt_trampolines=args.opt_trampolines,
+                    opt_calls=args.opt_calls,
+                )
+            except KeyboardInterrupt:
+                pass
+            return
+
+        with stdout:
+            run(
+                input_files=args.input,
+                output_dir=args.output,
+                entry_label=args.entry,
+                exclude_functions=args.exclude_function,
+                exclude_constants=args.exclude_constant,
+                codeseg=args.codeseg,
+                constseg=args.constseg,
+                verbose=args.verbose,
+                debug_flag=args.debug,
+                opt_irq=args.opt_irq,
+                cache=cache,
+                jobs=jobs,
+                output_strategy=args.output_strategy,
+                depfile=args.depfile,
+                input_archive=args.input_archive,
+                output_archive=output_archive,
+                exclude_patterns=exclude_patterns,
+                explain=args.explain,
+                flash_budget=args.flash_budget,
+                retained=args.retained,
+                opt_fold=args.opt_fold,
+                opt_pool=args.opt_pool,
+                opt_blocks=args.opt_blocks,
+                opt_trampolines=args.opt_trampolines,
+                opt_calls=args.opt_calls,
+                stack_report=args.stack,
+                stack_budget=args.stack_budget,
+            )
+    finally:
+        jobs.close()
+
+
+def main():
+    """
+    The main function of the STM8DCE tool.
+    Dispatches to a subcommand if one is provided,
+    else parses command-line arguments and calls the run function.
+    """
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+            SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        else:
+            dce_main(sys.argv[1:])
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
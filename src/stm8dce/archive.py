@@ -0,0 +1,150 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides functions to read input files from and write
+processed assembly files to tar archives, without touching the filesystem.
+
+Archives are processed as streams, so they may also be read from stdin and
+written to stdout (See read_archive and write_archive). Compressed archives
+(gzip, bzip2 and xz) are detected when reading and selected by the file
+extension when writing.
+
+Members are decoded with surrogate escapes, so that their bytes are
+preserved exactly when they are written back.
+"""
+
+import io
+import sys
+import time
+import tarfile
+
+############################################
+# Constants
+############################################
+
+# Archive members the tool processes, dispatched by extension like input files
+MEMBER_EXTENSIONS = (".asm", ".rel", ".lib")
+
+_COMPRESSIONS = {
+    ".gz": "gz",
+    ".tgz": "gz",
+    ".bz2": "bz2",
+    ".tbz2": "bz2",
+    ".xz": "xz",
+    ".txz": "xz",
+}
+
+############################################
+# Reading
+############################################
+
+
+def read_archive(archive):
+    """
+    Reads all assembly, .rel and .lib members of a tar archive.
+    Other members are skipped.
+
+    Args:
+        archive (str or file object): The path of the archive, "-" for stdin, or a binary file object.
+
+    Returns:
+        dict: Maps member names to their decoded contents, in archive order.
+
+    Raises:
+        ValueError: If the archive can't be read.
+    """
+    if archive == "-":
+        archive = sys.stdin.buffer
+
+    ret = {}
+    try:
+        if isinstance(archive, str):
+            tar = tarfile.open(archive, mode="r|*")
+        else:
+            tar = tarfile.open(fileobj=archive, mode="r|*")
+
+        with tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith(MEMBER_EXTENSIONS):
+                    continue
+                if member.name in ret:
+                    raise ValueError(
+                        f"Error: Archive member {member.name} appears multiple times"
+                    )
+                # Stream mode: Members must be read in order
+                data = tar.extractfile(member).read()
+                ret[member.name] = data.decode("utf-8", "surrogateescape")
+    except (tarfile.TarError, OSError) as e:
+        raise ValueError(f"Error: Cannot read archive {archive}: {e}")
+
+    return ret
+
+
+############################################
+# Writing
+############################################
+
+
+def write_archive(archive, contents):
+    """
+    Writes files into a new tar archive.
+
+    Args:
+        archive (str or file object): The path of the archive, "-" for stdout, or a binary file object.
+                                      Paths ending with .gz/.tgz, .bz2/.tbz2 or .xz/.txz are compressed.
+        contents (dict): Maps member names to their contents.
+    """
+    if archive == "-":
+        archive = sys.stdout.buffer
+
+    if isinstance(archive, str):
+        compression = next(
+            (c for ext, c in _COMPRESSIONS.items() if archive.endswith(ext)), ""
+        )
+        tar = tarfile.open(archive, mode=f"w|{compression}")
+    else:
+        tar = tarfile.open(fileobj=archive, mode="w|")
+
+    mtime = time.time()
+    with tar:
+        for name, content in contents.items():
+            data = content.encode("utf-8", "surrogateescape")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = mtime
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
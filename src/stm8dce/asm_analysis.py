@@ -93,7 +93,20 @@ class Function:
         name (str): Name of the function.
         end_line_number (int): End line of the function.
         calls_str (list): List of calls made by the function.
+        jumps_str (list): Calls made by jp instructions (subset of calls_str).
         long_read_labels_str (list): List of long read labels.
+        long_write_labels_str (list): List of labels written, modified or tested by long address capable instructions.
+        body_hash (str): Hash of the normalized instructions of the function (See asm_parser), None if
+                         the function doesn't end with a return or an unconditional jump.
+        unreachable_blocks (list): Tuples of the first and last line number and the estimated size of
+                                   code that is unreachable from the function's entry (See cfg).
+        trampoline (str): The label the function jumps to if its whole body is a single jp
+                          instruction, None otherwise.
+        stub (bool): Indicates if the function's whole body is a single ret instruction.
+        call_sites (list): Tuples of the line number, label and estimated size of each call instruction.
+        stack_frame (int): Largest number of bytes the function allocates on the stack (See cfg.stack_usage).
+        stack_calls (list): Tuples of the label of each function the function directly calls or jumps to
+                            and the stack in use once the call's return address is pushed (See cfg.stack_usage).
 
     Generated Attributes:
         function_references (list): List of functions referenced by the function (See resolve_calls & resolve_fptrs).
@@ -103,6 +116,7 @@ class Function:
         global_defs (list): List of resolved global definitions used by the function (See resolve_globals).
         isr_def (IntDef): Resolved interrupt definition associated with the function (See resolve_isr).
         empty (bool): Indicates if the function is empty.
+        size (int): Estimated size of the function in bytes (See sizes).
 
     The intended use of this class is to first parse the input attributes and then call the resolve_* functions
     to resolve the generated attributes.
@@ -114,7 +128,16 @@ class Function:
         self.name = name
         self.end_line_number = None
         self.calls_str = []
+        self.jumps_str = []
         self.long_read_labels_str = []
+        self.long_write_labels_str = []
+        self.body_hash = None
+        self.unreachable_blocks = []
+        self.trampoline = None
+        self.stub = False
+        self.call_sites = []
+        self.stack_frame = 0
+        self.stack_calls = []
 
         self.function_references = []
         self.external_calls = []
@@ -123,6 +146,7 @@ class Function:
         self.global_defs = []
         self.isr_def = None
         self.empty = True
+        self.size = 0
 
     def __str__(self):
         return self.name
@@ -138,6 +162,15 @@ class Function:
         print(f"End line: {self.end_line_number}")
         print(f"Calls: {self.calls_str}")
         print(f"Long read labels: {self.long_read_labels_str}")
+        print(f"Long write labels: {self.long_write_labels_str}")
+        print(f"Body hash: {self.body_hash}")
+        print(f"Unreachable blocks: {self.unreachable_blocks}")
+        print(f"Trampoline to: {self.trampoline}")
+        print(f"Stub: {self.stub}")
+        print(f"Call sites: {self.call_sites}")
+        print(f"Stack frame: {self.stack_frame}")
+        print(f"Stack calls: {self.stack_calls}")
+        print(f"Size: {self.size}")
         print(
             f"Resolved function references: {[call.name for call in self.function_references]}"
         )
@@ -202,12 +235,13 @@ class Function:
 
             if glob:
                 if len(funcs) > 1:
-                    print(
-                        f"Error: Conflicting definitions for non-static function: {call_str}"
+                    raise ValueError(
+                        f"Error: Conflicting definitions for non-static function: {call_str}\n"
+                        + "\n".join(
+                            f"In file {func.path}:{func.start_line_number}"
+                            for func in funcs
+                        )
                     )
-                    for func in funcs:
-                        print(f"In file {func.path}:{func.start_line_number}")
-                    exit(1)
                 self.function_references.append(funcs[0])
                 debug.pdbg(
                     f"Function {self.name} in {self.path}:{self.start_line_number} calls function {funcs[0].name} in {funcs[0].path}:{funcs[0].start_line_number}"
@@ -217,10 +251,9 @@ class Function:
                 for func in funcs:
                     if func.path == self.path:
                         if matched:
-                            print(
+                            raise ValueError(
                                 f"Error: Multiple static definitions for function {func} in {func.path}"
                             )
-                            exit(1)
                         self.function_references.append(func)
                         debug.pdbg(
                             f"Function {self.name} in {self.path}:{self.start_line_number} calls static function {func.name} in {func.path}:{func.start_line_number}"
@@ -263,12 +296,13 @@ class Function:
 
             if glob:
                 if len(consts) > 1:
-                    print(
-                        f"Error: Conflicting definitions for global constant: {long_read_label}"
+                    raise ValueError(
+                        f"Error: Conflicting definitions for global constant: {long_read_label}\n"
+                        + "\n".join(
+                            f"In file {const.path}:{const.start_line_number}"
+                            for const in consts
+                        )
                     )
-                    for const in consts:
-                        print(f"In file {const.path}:{const.start_line_number}")
-                    exit(1)
                 self.constants.append(consts[0])
                 debug.pdbg(
                     f"Function {self.name} in {self.path}:{self.start_line_number} reads global constant {long_read_label} in {consts[0].path}:{consts[0].start_line_number}"
@@ -291,6 +325,10 @@ class Constant:
         start_line_number (int): Start line of the constant.
         name (str): Name of the constant.
         end_line_number (int): End line of the constant.
+        size (int): Estimated size of the constant in bytes (See sizes).
+        data_labels_str (list): List of labels referenced by the data of the constant (ex. tables of pointers).
+        body_hash (str): Hash of the normalized data directives of the constant (See asm_parser),
+                         None if the constant has no data.
 
     Generated Attributes:
         global_defs (list): List of resolved global definitions associated with the constant (See resolve_globals).
@@ -303,6 +341,9 @@ class Constant:
         self.start_line_number = start_line_number
         self.name = name
         self.end_line_number = None
+        self.size = 0
+        self.data_labels_str = []
+        self.body_hash = None
         self.global_defs = []
 
     def __str__(self):
@@ -317,6 +358,9 @@ class Constant:
         print(f"File: {self.path}")
         print(f"Start line: {self.start_line_number}")
         print(f"End line: {self.end_line_number}")
+        print(f"Size: {self.size}")
+        print(f"Data labels: {self.data_labels_str}")
+        print(f"Body hash: {self.body_hash}")
         print(
             f"Resolved global definitions: {[glob.name for glob in self.global_defs]}"
         )
@@ -346,9 +390,12 @@ class Initializer:
         name (str): Name of the initializer.
         end_line_number (int): End line of the initializer.
         pointers_str (list): List of pointers defined by the initializer. Pointers store absolute labels.
+        data_labels_str (list): List of all labels referenced by the data of the initializer (including pointers_str).
+        size (int): Size of the initial value in bytes, copied to RAM at startup (See sizes).
 
     Generated Attributes:
         pointers (list): List of resolved pointers associated with the initializer (See resolve_pointers).
+        variable (Variable): The variable the initializer holds the initial value of (See resolve_variables).
 
     The intended use of this class is to first parse the input attributes and then call the resolve_* functions
     """
@@ -359,10 +406,13 @@ class Initializer:
         self.name = name
         self.end_line_number = None
         self.pointers_str = []
+        self.data_labels_str = []
+        self.size = 0
 
         self.function_pointers = []
         self.constant_pointers = []
         self.unresolved_pointers = []
+        self.variable = None
 
     def __str__(self):
         return self.name
@@ -377,6 +427,8 @@ class Initializer:
         print(f"Start line: {self.start_line_number}")
         print(f"End line: {self.end_line_number}")
         print(f"Pointers: {self.pointers_str}")
+        print(f"Data labels: {self.data_labels_str}")
+        print(f"Size: {self.size}")
         print(
             f"Resolved function pointers: {[fptr.name for fptr in self.function_pointers]}"
         )
@@ -384,6 +436,7 @@ class Initializer:
             f"Resolved constant pointers: {[const.name for const in self.constant_pointers]}"
         )
         print(f"Unresolved pointers: {self.unresolved_pointers}")
+        print(f"Variable: {self.variable}")
 
     def resolve_pointers(self, functions, constants):
         for pointer_str in self.pointers_str:
@@ -394,12 +447,13 @@ class Initializer:
 
                 if glob:
                     if len(consts) > 1:
-                        print(
-                            f"Error: Conflicting definitions for global constant: {pointer_str}"
+                        raise ValueError(
+                            f"Error: Conflicting definitions for global constant: {pointer_str}\n"
+                            + "\n".join(
+                                f"In file {const.path}:{const.start_line_number}"
+                                for const in consts
+                            )
                         )
-                        for const in consts:
-                            print(f"In file {const.path}:{const.start_line_number}")
-                        exit(1)
                     self.constant_pointers.append(consts[0])
                     debug.pdbg(
                         f"Initializer {self.name} in {self.path}:{self.start_line_number} defines pointer to global constant {pointer_str} in {consts[0].path}:{consts[0].start_line_number}"
@@ -418,12 +472,13 @@ class Initializer:
                 glob = any(func.global_defs for func in funcs)
                 if glob:
                     if len(funcs) > 1:
-                        print(
-                            f"Error: Conflicting definitions for global function: {pointer_str}"
+                        raise ValueError(
+                            f"Error: Conflicting definitions for global function: {pointer_str}\n"
+                            + "\n".join(
+                                f"In file {func.path}:{func.start_line_number}"
+                                for func in funcs
+                            )
                         )
-                        for func in funcs:
-                            print(f"In file {func.path}:{func.start_line_number}")
-                        exit(1)
                     self.function_pointers.append(funcs[0])
                     debug.pdbg(
                         f"Initializer {self.name} in {self.path}:{self.start_line_number} defines pointer to global function {pointer_str} in {funcs[0].path}:{funcs[0].start_line_number}"
@@ -443,6 +498,56 @@ class Initializer:
             )
 
 
+class Variable:
+    """
+    Class to store variables (space reserved by .ds in the DATA and INITIALIZED areas).
+
+    Input Attributes:
+        path (str): Path of the file the variable is defined in.
+        start_line_number (int): Start line of the variable.
+        name (str): Name of the variable.
+        area (str): The area the variable is defined in (DATA or INITIALIZED).
+        end_line_number (int): End line of the variable.
+        size (int): Size of the variable in bytes (See sizes).
+
+    Generated Attributes:
+        global_defs (list): List of resolved global definitions associated with the variable (See resolve_variables).
+        initializer (Initializer): The initializer holding the initial value of an INITIALIZED variable (See resolve_variables).
+
+    The intended use of this class is to first parse the input attributes and then call resolve_variables
+    """
+
+    def __init__(self, path, start_line_number, name, area):
+        self.path = path
+        self.start_line_number = start_line_number
+        self.name = name
+        self.area = area
+        self.end_line_number = None
+        self.size = 0
+
+        self.global_defs = []
+        self.initializer = None
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+    def print(self):
+        """Prints the details of the variable."""
+        print(f"Variable: {self.name}")
+        print(f"File: {self.path}")
+        print(f"Area: {self.area}")
+        print(f"Start line: {self.start_line_number}")
+        print(f"End line: {self.end_line_number}")
+        print(f"Size: {self.size}")
+        print(
+            f"Resolved global definitions: {[glob.name for glob in self.global_defs]}"
+        )
+        print(f"Initializer: {self.initializer}")
+
+
 ############################################
 # Filtering & Search functions
 ############################################
@@ -475,16 +580,17 @@ def function_by_filename_name(functions, filename, name):
         Function: Matching Function object.
 
     Raises:
-        SystemExit: If multiple definitions for the function are found.
+        ValueError: If multiple definitions for the function are found.
     """
     ret = None
     for function in functions:
         f_filename = function.path.split("/")[-1]
         if f_filename == filename and function.name == name:
             if ret:
-                print(f"Error: Multiple definitions for function: {name}")
-                print(f"In file {function.path}:{function.start_line_number}")
-                exit(1)
+                raise ValueError(
+                    f"Error: Multiple definitions for function: {name}\n"
+                    f"In file {function.path}:{function.start_line_number}"
+                )
             ret = function
     return ret
 
@@ -553,20 +659,72 @@ def constant_by_filename_name(constants, filename, name):
         Constant: Matching Constant object.
 
     Raises:
-        SystemExit: If multiple definitions for the constant are found.
+        ValueError: If multiple definitions for the constant are found.
     """
     ret = None
     for constant in constants:
         c_filename = constant.path.split("/")[-1]
         if c_filename == filename and constant.name == name:
             if ret:
-                print(f"Error: Multiple definitions for constant: {name}")
-                print(f"In file {constant.path}:{constant.start_line_number}")
-                exit(1)
+                raise ValueError(
+                    f"Error: Multiple definitions for constant: {name}\n"
+                    f"In file {constant.path}:{constant.start_line_number}"
+                )
             ret = constant
     return ret
 
 
+def index_by_name(objects):
+    """
+    Returns a dictionary of objects by their name, allowing
+    symbols to be resolved without searching all objects.
+
+    Args:
+        objects (list): List of objects with a name attribute (ex. Variable or GlobalDef objects).
+
+    Returns:
+        dict: Maps names to lists of objects with that name.
+    """
+    ret = {}
+    for obj in objects:
+        ret.setdefault(obj.name, []).append(obj)
+    return ret
+
+
+def resolve_variables(variables, globals, initializers):
+    """
+    Resolves the global definitions and initializers of variables, and the variables of initializers.
+
+    The initializer of an INITIALIZED variable is the initializer named __xinit_<name>
+    in the same file, holding the data copied into the variable at startup.
+
+    Args:
+        variables (list): List of all Variable objects.
+        globals (list): List of all GlobalDef objects.
+        initializers (list): List of all Initializer objects.
+    """
+    globals_by_name = index_by_name(globals)
+    initializers_by_name = index_by_name(initializers)
+
+    for variable in variables:
+        for global_def in globals_by_name.get(variable.name, []):
+            variable.global_defs.append(global_def)
+            debug.pdbg(
+                f"Global in {global_def.path}:{global_def.line_number} matched to variable {variable.name} in {variable.path}:{variable.start_line_number}"
+            )
+
+        if variable.area != "INITIALIZED":
+            continue
+
+        for initializer in initializers_by_name.get(f"__xinit_{variable.name}", []):
+            if initializer.path == variable.path:
+                variable.initializer = initializer
+                initializer.variable = variable
+                debug.pdbg(
+                    f"Initializer {initializer.name} in {initializer.path}:{initializer.start_line_number} matched to variable {variable.name} in {variable.path}:{variable.start_line_number}"
+                )
+
+
 def traverse_functions(functions, top):
     """
     Traverse all functions referenced by a function and return a list of all traversed functions.
@@ -20,7 +20,13 @@ This module provides classes and functions to pattern match STM8 SDCC generated
 import re
 from itertools import takewhile
 from enum import Enum
-from . import settings
+
+############################################
+# Constants
+############################################
+
+# Local labels (ex. 00102$), which are only valid between two absolute labels
+LOCAL_LABEL = re.compile(r"(?<![\w$])\d+\$")
 
 ############################################
 # Helper functions
@@ -52,12 +58,31 @@ def sanitize_line(line):
 class AreaType(Enum):
     """
     Enum to represent relevant types of areas in assembly code.
+    The actual names of the code and constant segments are configurable (See settings.Options).
     """
 
-    CODE = settings.codeseg
-    CONST = settings.constseg
+    CODE = "CODE"
+    CONST = "CONST"
     OTHER = None
 
+    @staticmethod
+    def of(area_name, options):
+        """
+        Returns the type of an area.
+
+        Args:
+            area_name (str): The name of the area.
+            options (Options): The options providing the code and constant segment names.
+
+        Returns:
+            AreaType: The type of the area.
+        """
+        if area_name == options.codeseg:
+            return AreaType.CODE
+        if area_name == options.constseg:
+            return AreaType.CONST
+        return AreaType.OTHER
+
 
 ############################################
 # Classes
@@ -69,6 +94,9 @@ class Directive:
     Class to represent a directive in the assembly code.
     """
 
+    # Directives emitting data, which may refer to labels
+    _DATA_DIRECTIVES = (".db", ".byte", ".fcb", ".dw", ".word", ".fdb")
+
     def __init__(self, file_path, line_number, line):
         """
         Initializes a Directive object.
@@ -123,6 +151,38 @@ class Directive:
         """
         return self.line.startswith(".dw")
 
+    def is_ds(self):
+        """
+        Checks if the directive is a .ds directive (reserves space).
+
+        Returns:
+            bool: True if the directive is a .ds directive, False otherwise.
+        """
+        return self.line.startswith(".ds")
+
+    def data_labels(self):
+        """
+        Returns the labels referenced by a data directive (.db, .dw and their aliases).
+
+        Criteria for a label:
+            - Is not part of a string
+            - Is not preceded by a letter, number, '_' or '$' (else hex numbers would be detected)
+            - Starts with a letter or '_'
+            - Only contains letters, numbers, and '_'
+
+        This includes labels in expressions, such as '.db #<(_label+2)' or '.dw _label+4'.
+
+        Returns:
+            list: A list of the unique labels, an empty list if the directive is not a data directive.
+        """
+        if not self.value:
+            return []
+        if self.line.split(None, 1)[0] not in self._DATA_DIRECTIVES:
+            return []
+
+        value = re.sub(r"\"[^\"]*\"|'[^']*'", "", self.value)
+        return list(dict.fromkeys(re.findall(r"(?<![\w$])[A-Za-z_]\w*", value)))
+
     @staticmethod
     def is_area_directive(eval, area_name=None):
         """
@@ -192,7 +252,8 @@ class Label:
         self.file_path = file_path
         self.line_number = line_number
 
-        self.name = self.line[:-1]
+        # Global labels may be defined with a double colon (ex. _counter::)
+        self.name = self.line.rstrip(":")
 
     def is_absolute(self):
         """
@@ -280,6 +341,50 @@ class Instruction:
         "int",
     ]
 
+    # Instructions that write to, modify or test their memory operand
+    _LONG_WRITE_INSTRUCTIONS = [
+        "ld",
+        "ldf",
+        "ldw",
+        "mov",
+        "exg",
+        "pop",
+        "clr",
+        "inc",
+        "dec",
+        "neg",
+        "cpl",
+        "tnz",
+        "sll",
+        "sla",
+        "sra",
+        "srl",
+        "rlc",
+        "rrc",
+        "swap",
+        "bset",
+        "bres",
+        "bcpl",
+        "bccm",
+    ]
+
+    # Jumps apart from relative jumps (jr*), with their target as the last argument
+    _JUMP_INSTRUCTIONS = ["jp", "jpf", "btjt", "btjf"]
+
+    # Instructions after which execution never continues with the next line
+    _UNCONDITIONAL_INSTRUCTIONS = [
+        "ret",
+        "retf",
+        "iret",
+        "jp",
+        "jpf",
+        "jra",
+        "jrt",
+    ]
+
+    # Bytes pushed onto the stack by push instructions (negative for pops)
+    _STACK_DELTAS = {"push": 1, "pushw": 2, "pop": -1, "popw": -2}
+
     def __init__(self, file_path, line_number, line):
         """
         Initializes an Instruction object.
@@ -360,7 +465,7 @@ class Instruction:
         Precondition: line is after a function label.
 
         Criteria for a call:
-            - Starts with 'call'
+            - Starts with 'call' or 'callr'
             or
             - Starts with 'jp'
             - Followed by a label which:
@@ -370,7 +475,7 @@ class Instruction:
         Returns:
             str: The call target if it is a call instruction, None otherwise.
         """
-        if self.mnemonic == "call":
+        if self.mnemonic in ("call", "callr"):
             return self.args[0]
 
         if self.mnemonic == "jp":
@@ -393,6 +498,80 @@ class Instruction:
         """
         return self.line == "iret"
 
+    def is_jump(self):
+        """
+        Returns the jump target if the line is a direct jump instruction, None otherwise.
+
+        Criteria for a jump:
+            - Starts with 'jr' (relative jumps), 'jp', 'jpf', 'btjt' or 'btjf'
+            - The target (last argument) is not indirect (ex. jp (x))
+
+        Returns:
+            str: The jump target (a local or absolute label) if it is a jump instruction, None otherwise.
+        """
+        if not (
+            self.mnemonic.startswith("jr") or self.mnemonic in self._JUMP_INSTRUCTIONS
+        ):
+            return None
+        if not self.args or self.args[-1].startswith(("(", "[")):
+            return None
+        return self.args[-1]
+
+    def is_unconditional(self):
+        """
+        Determines if execution never continues with the line after the instruction.
+
+        Criteria for an unconditional instruction:
+            - Is a return (ret, retf, iret) or an unconditional jump (jp, jpf, jra, jrt)
+
+        Returns:
+            bool: True if the instruction is unconditional, False otherwise.
+        """
+        return self.mnemonic in self._UNCONDITIONAL_INSTRUCTIONS
+
+    def stack_delta(self):
+        """
+        Returns the number of bytes the instruction allocates on the stack.
+
+        Criteria for a stack allocation:
+            - Starts with 'push' or 'pushw' (1 or 2 bytes)
+            - Starts with 'pop' or 'popw' (-1 or -2 bytes)
+            - Is 'sub sp, #n' (n bytes) or 'addw sp, #n' (-n bytes)
+
+        Calls, returns and interrupts also change the stack pointer, but restore it
+        once they return. Stack pointer loads (ex. ldw sp, x) are not tracked.
+
+        Returns:
+            int: The number of allocated bytes, negative if bytes are freed.
+        """
+        if self.mnemonic in self._STACK_DELTAS:
+            return self._STACK_DELTAS[self.mnemonic]
+
+        if (
+            self.mnemonic in ("sub", "addw")
+            and len(self.args) == 2
+            and self.args[0].lower() == "sp"
+            and self.args[1].startswith("#")
+        ):
+            try:
+                value = int(self.args[1][1:].strip(), 0)
+            except ValueError:
+                return 0
+            return value if self.mnemonic == "sub" else -value
+
+        return 0
+
+    def normalized(self):
+        """
+        Returns the instruction with all whitespace between its arguments removed
+        (ex. "ld a, (0x01, sp)" -> "ld a,(0x01,sp)").
+
+        Returns:
+            str: The normalized instruction.
+        """
+        args = ",".join("".join(arg.split()) for arg in self.args)
+        return f"{self.mnemonic} {args}" if args else self.mnemonic
+
     def is_int(self):
         """
         Determines if the line is an interrupt definition and the name of the interrupt if it is one.
@@ -434,6 +613,45 @@ class Instruction:
             tuple: A tuple containing the labels ([label1, label2, ...]) if it reads from one or more labels, None otherwise.
         """
 
+        if self.mnemonic not in self._LONG_READ_INSTRUCTIONS:
+            return None
+
+        eval_args = (
+            self.args
+            if len(self.args) == 3
+            else self.args[1:] if len(self.args) == 2 else self.args
+        )
+
+        return self._extract_labels(eval_args)
+
+    def is_long_label_write(self):
+        """
+        Determines if a long addressing capable instruction writes to (or modifies) a label.
+        If it does, it returns the labels.
+
+        Criteria for a long label write:
+            - Starts with an entry in LONG_WRITE_INSTRUCTIONS
+            - Any argument contains a label (See is_long_label_read for the definition of a label)
+
+        Returns:
+            list: A list of the labels ([label1, label2, ...]) if it writes to one or more labels, None otherwise.
+        """
+        if self.mnemonic not in self._LONG_WRITE_INSTRUCTIONS:
+            return None
+
+        return self._extract_labels(self.args)
+
+    def _extract_labels(self, args):
+        """
+        Extracts the first label of each argument (See is_long_label_read for the definition of a label).
+
+        Args:
+            args (list): The arguments to extract the labels from.
+
+        Returns:
+            list: A list of the unique labels, or None if no argument contains a label.
+        """
+
         def is_valid_label_start(char, prev_char):
             return (char.isalpha() or char == "_") and (
                 prev_char is None or not prev_char.isalnum()
@@ -448,17 +666,8 @@ class Instruction:
                     return label if not self._is_register(label) else None
             return None
 
-        if self.mnemonic not in self._LONG_READ_INSTRUCTIONS:
-            return None
-
-        eval_args = (
-            self.args
-            if len(self.args) == 3
-            else self.args[1:] if len(self.args) == 2 else self.args
-        )
-
         labels = []
-        for arg in eval_args:
+        for arg in args:
             label = extract_label(arg)
             if label and label not in labels:
                 labels.append(label)
@@ -481,6 +690,19 @@ class Instruction:
         """
         return isinstance(eval, Instruction) and eval.is_iret()
 
+    @staticmethod
+    def is_unconditional_instruction(eval):
+        """
+        Static method to check if an instance is an Instruction and is an unconditional instruction.
+
+        Args:
+            eval: The instance to check.
+
+        Returns:
+            bool: True if the instance is an Instruction and is an unconditional instruction, False otherwise.
+        """
+        return isinstance(eval, Instruction) and eval.is_unconditional()
+
     @staticmethod
     def is_interrupt_instruction(eval):
         """
@@ -507,6 +729,19 @@ class Instruction:
         """
         return isinstance(eval, Instruction) and eval.is_call()
 
+    @staticmethod
+    def is_long_label_write_instruction(eval):
+        """
+        Static method to check if an instance is an Instruction and is a long label write instruction.
+
+        Args:
+            eval: The instance to check.
+
+        Returns:
+            bool: True if the instance is an Instruction and is a long label write instruction, False otherwise.
+        """
+        return isinstance(eval, Instruction) and eval.is_long_label_write()
+
     @staticmethod
     def is_long_label_read_instruction(eval):
         """
@@ -546,6 +781,11 @@ def _split_instruction_with_label(line):
     """
     sline = sanitize_line(line)
     split = sline.split(":", 1)
+
+    # Global labels may be defined with a double colon (ex. _counter::)
+    if len(split) == 2 and split[1].startswith(":"):
+        split = [split[0] + ":", split[1][1:]]
+
     if len(split) == 2 and split[1].strip():
         return iter((split[0].strip() + ":", split[1].strip()))
 
@@ -17,11 +17,44 @@
 This module provides a class to parse STM8 SDCC generated assembly files.
 """
 
+import io
+import hashlib
+
 from . import settings
 from . import debug
 from . import asm_analysis
+from . import sizes
+from . import cfg
 from .asm_matchers import *
 
+############################################
+# Helper functions
+############################################
+
+
+def _normalize(eval, local_labels):
+    """
+    Normalizes a line of a function or constant for identical code folding and constant
+    pooling. Whitespace is removed and local labels are renamed by their order of
+    appearance, so that functions only differing in their local label numbers normalize equally.
+
+    Args:
+        eval: The matched line.
+        local_labels (dict): Maps the local labels seen so far to their index, updated in place.
+
+    Returns:
+        str: The normalized line.
+    """
+    if isinstance(eval, Instruction):
+        text = eval.normalized()
+    else:
+        text = " ".join(eval.line.split())
+    return LOCAL_LABEL.sub(
+        lambda match: f"L{local_labels.setdefault(match.group(0), len(local_labels))}",
+        text,
+    )
+
+
 ############################################
 # Classes
 ############################################
@@ -32,24 +65,34 @@ class ASMParser:
     Class to parse STM8 SDCC generated assembly files.
 
     Attributes:
+        options (Options): The options the file is parsed with (code and constant segment names).
         globals (list): A list of global definitions.
         interrupts (list): A list of interrupt definitions.
         functions (list): A list of functions.
         constants (list): A list of constants.
+        initializers (list): A list of initializers.
+        variables (list): A list of variables.
+        references (list): Labels referenced by instructions outside of functions (ex. in GSINIT).
     """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, options=None, content=None):
         """
         Initializes the ASMParser with a file path and parses the file.
 
         Args:
             file_path (str): The path to the assembly file to be parsed.
+            options (Options, optional): The options to parse the file with (default: settings.DEFAULT).
+            content (str, optional): The content of the file. If provided, the file isn't read
+                                     and file_path is only used to refer to it (ex. archive members).
         """
+        self.options = options or settings.DEFAULT
         self.globals = []
         self.interrupts = []
         self.functions = []
         self.constants = []
         self.initializers = []
+        self.variables = []
+        self.references = []
 
         self._relevant = []  # Stack of relevant lines to be parsed
 
@@ -57,18 +100,23 @@ class ASMParser:
         debug.pdbg(f"Parsing file: {file_path}")
         debug.pseperator()
 
-        with open(file_path, "r") as file_obj:
-            for line_number, line in enumerate(file_obj.readlines(), 1):
-                match = match_asm_line(file_path, line_number, line)
-                if match:
-                    self._relevant.extend(match)
+        if content is None:
+            with open(file_path, "r") as file_obj:
+                lines = file_obj.readlines()
+        else:
+            lines = io.StringIO(content, newline=None).readlines()
+
+        for line_number, line in enumerate(lines, 1):
+            match = match_asm_line(file_path, line_number, line)
+            if match:
+                self._relevant.extend(match)
 
         self._parse()
 
     def _parse(self):
         """
         Parses the relevant lines of the assembly file and extracts
-        globals, interrupts, functions, and constants.
+        globals, interrupts, functions, constants, initializers and variables.
         """
         while self._relevant:
             eval = self._relevant.pop(0)
@@ -91,12 +139,12 @@ class ASMParser:
                 continue
 
             # Code section
-            if Directive.is_area_directive(eval, settings.codeseg):
+            if Directive.is_area_directive(eval, self.options.codeseg):
                 self._parse_code_section(eval)
                 continue
 
             # Constants section
-            if Directive.is_area_directive(eval, settings.constseg):
+            if Directive.is_area_directive(eval, self.options.constseg):
                 self._parse_const_section(eval)
                 continue
 
@@ -105,6 +153,16 @@ class ASMParser:
                 self._parse_initializer_section(eval)
                 continue
 
+            # RAM sections
+            if Directive.is_area_directive(
+                eval, "DATA"
+            ) or Directive.is_area_directive(eval, "INITIALIZED"):
+                self._parse_variable_section(eval)
+                continue
+
+            # Code outside of functions (ex. GSINIT)
+            self._parse_references(eval)
+
     def _parse_code_section(self, area):
         """
         Parses the code section of the file and extracts functions.
@@ -127,6 +185,8 @@ class ASMParser:
                 self._parse_function(eval)
                 continue
 
+            self._parse_references(eval)
+
         debug.pdbg(f"Line {area.line_number}: Code section ends here")
 
     def _parse_const_section(self, area):
@@ -177,6 +237,50 @@ class ASMParser:
 
         debug.pdbg(f"Line {area.line_number}: Initializer section ends here")
 
+    def _parse_variable_section(self, area):
+        """
+        Parses a RAM section (DATA or INITIALIZED) of the file and extracts variables.
+
+        Args:
+            area (Directive): The directive indicating the start of the RAM section.
+        """
+        area_name = area.value.split()[0]
+        debug.pdbg(f"Line {area.line_number}: {area_name} section starts here")
+
+        while self._relevant:
+            eval = self._relevant.pop(0)
+
+            # Check if this is the end of the RAM section (start of a new area)
+            if Directive.is_area_directive(eval):
+                self._relevant.insert(0, eval)
+                break
+
+            # Parse variable if an absolute label is found
+            if Label.is_absolute_label(eval):
+                self._parse_variable(eval, area_name)
+                continue
+
+        debug.pdbg(f"Line {area.line_number}: {area_name} section ends here")
+
+    def _parse_references(self, eval):
+        """
+        Keeps track of labels referenced by an instruction outside of a function.
+
+        Args:
+            eval: The matched line.
+        """
+        if not isinstance(eval, Instruction):
+            return
+
+        for label in (eval.is_long_label_read() or []) + (
+            eval.is_long_label_write() or []
+        ):
+            debug.pdbg(
+                f"Line {eval.line_number} ({eval.mnemonic}): label {label} is referenced outside of a function"
+            )
+            if label not in self.references:
+                self.references.append(label)
+
     def _parse_function(self, label):
         """
         Parses a function and extracts relevant information.
@@ -188,16 +292,14 @@ class ASMParser:
 
         function = asm_analysis.Function(label.file_path, label.line_number, label.name)
 
+        # Lines of the function, for identical code folding and unreachable code
+        body = []
+
         while self._relevant:
             eval = self._relevant.pop(0)
 
-            # Check if this is an IRQ handler
-            if Instruction.is_iret_instruction(eval):
-                debug.pdbg(
-                    f"Line {label.line_number}: Function {label.name} detected as IRQ Handler"
-                )
-                function.isr = True
-                continue
+            # Labels and area directives ending the function have no size
+            function.size += sizes.size(eval)
 
             # Check if this is the end of the function
             if Label.is_absolute_label(eval) or Directive.is_area_directive(eval):
@@ -207,6 +309,16 @@ class ASMParser:
                 self._relevant.insert(0, eval)
                 break
 
+            body.append(eval)
+
+            # Check if this is an IRQ handler
+            if Instruction.is_iret_instruction(eval):
+                debug.pdbg(
+                    f"Line {label.line_number}: Function {label.name} detected as IRQ Handler"
+                )
+                function.isr = True
+                continue
+
             # From here on we can assume the function is not empty
             function.empty = False
 
@@ -216,8 +328,23 @@ class ASMParser:
                 debug.pdbg(f"Line {eval.line_number}: Call to {call}")
                 if call not in function.calls_str:
                     function.calls_str.append(call)
+                if eval.mnemonic == "jp" and call not in function.jumps_str:
+                    function.jumps_str.append(call)
+                if eval.mnemonic in ("call", "callr"):
+                    function.call_sites.append(
+                        (eval.line_number, call, sizes.size(eval))
+                    )
                 continue
 
+            # Keep track of labels written by long address capable instructions
+            if Instruction.is_long_label_write_instruction(eval):
+                for long_label in eval.is_long_label_write():
+                    debug.pdbg(
+                        f"Line {eval.line_number} ({eval.mnemonic}): long address label {long_label} is written here"
+                    )
+                    if long_label not in function.long_write_labels_str:
+                        function.long_write_labels_str.append(long_label)
+
             # Keep track of labels read by long address capable instructions
             if Instruction.is_long_label_read_instruction(eval):
                 long_labels = eval.is_long_label_read()
@@ -230,6 +357,43 @@ class ASMParser:
                             function.long_read_labels_str.append(long_label)
                     continue
 
+        # Functions falling through into the next function can't be folded
+        if body and Instruction.is_unconditional_instruction(body[-1]):
+            local_labels = {}
+            function.body_hash = hashlib.sha256(
+                "\n".join(_normalize(eval, local_labels) for eval in body).encode(
+                    "utf-8", "surrogateescape"
+                )
+            ).hexdigest()
+
+        # Functions only jumping to another function (ex. wrappers)
+        if (
+            len(body) == 1
+            and Instruction.is_call_instruction(body[0])
+            and body[0].mnemonic == "jp"
+        ):
+            function.trampoline = body[0].is_call()
+            debug.pdbg(
+                f"Line {label.line_number}: Function {label.name} is a trampoline to {function.trampoline}"
+            )
+
+        # Functions only returning (ex. stubbed hooks)
+        if (
+            len(body) == 1
+            and isinstance(body[0], Instruction)
+            and body[0].mnemonic == "ret"
+        ):
+            function.stub = True
+            debug.pdbg(f"Line {label.line_number}: Function {label.name} only returns")
+
+        function.stack_frame, function.stack_calls = cfg.stack_usage(body)
+
+        function.unreachable_blocks = cfg.unreachable_blocks(body)
+        for start, end, size in function.unreachable_blocks:
+            debug.pdbg(
+                f"Line {start}: Lines {start}-{end} of function {label.name} are unreachable ({size} bytes)"
+            )
+
         if function.empty:
             debug.pdbg(f"Line {label.line_number}: Function {label.name} is empty!")
         debug.pdbg(f"Line {label.line_number}: Function {label.name} ends here")
@@ -249,9 +413,16 @@ class ASMParser:
             label.file_path, label.line_number, label.name
         )
 
+        # Normalized data for constant pooling
+        body = []
+        local_labels = {}
+
         while self._relevant:
             eval = self._relevant.pop(0)
 
+            # Labels and area directives ending the constant have no size
+            ret_constant.size += sizes.size(eval)
+
             # Check if this is the end of the constant
             if Label.is_absolute_label(eval) or Directive.is_area_directive(eval):
                 ret_constant.end_line_number = (
@@ -260,6 +431,19 @@ class ASMParser:
                 self._relevant.insert(0, eval)
                 break
 
+            body.append(_normalize(eval, local_labels))
+
+            # Keep track of labels referenced by the data (ex. tables of pointers)
+            if isinstance(eval, Directive):
+                for data_label in eval.data_labels():
+                    if data_label not in ret_constant.data_labels_str:
+                        ret_constant.data_labels_str.append(data_label)
+
+        if body:
+            ret_constant.body_hash = hashlib.sha256(
+                "\n".join(body).encode("utf-8", "surrogateescape")
+            ).hexdigest()
+
         debug.pdbg(f"Line {label.line_number}: Constant {label.name} ends here")
         self.constants.append(ret_constant)
 
@@ -281,9 +465,19 @@ class ASMParser:
 
             # Check if this is the end of the initializer
             if Label.is_absolute_label(eval) or Directive.is_area_directive(eval):
+                ret_initializer.end_line_number = (
+                    eval.line_number - 1  # -1 Since we're already past end
+                )
                 self._relevant.insert(0, eval)
                 break
 
+            ret_initializer.size += sizes.size(eval)
+
+            if isinstance(eval, Directive):
+                for data_label in eval.data_labels():
+                    if data_label not in ret_initializer.data_labels_str:
+                        ret_initializer.data_labels_str.append(data_label)
+
             # Check for .dw directive and see if it defines a label
             # If so, this is a pointer
             if (
@@ -299,6 +493,48 @@ class ASMParser:
         debug.pdbg(f"Line {label.line_number}: Initializer {label.name} ends here")
         self.initializers.append(ret_initializer)
 
+    def _parse_variable(self, label, area_name):
+        """
+        Parses a variable and extracts relevant information.
+        Labels without a .ds directive (ex. labels sharing the space of the following variable)
+        are not treated as variables.
+
+        Args:
+            label (Label): The label indicating the start of the variable.
+            area_name (str): The name of the area the variable is defined in.
+        """
+        ret_variable = asm_analysis.Variable(
+            label.file_path, label.line_number, label.name, area_name
+        )
+        reserves = False
+
+        while self._relevant:
+            eval = self._relevant.pop(0)
+
+            # Check if this is the end of the variable
+            if Label.is_absolute_label(eval) or Directive.is_area_directive(eval):
+                ret_variable.end_line_number = (
+                    eval.line_number - 1  # -1 Since we're already past end
+                )
+                self._relevant.insert(0, eval)
+                break
+
+            ret_variable.end_line_number = eval.line_number
+            ret_variable.size += sizes.size(eval)
+            if isinstance(eval, Directive) and eval.is_ds():
+                reserves = True
+
+        if not reserves:
+            debug.pdbg(
+                f"Line {label.line_number}: Label {label.name} reserves no space, not a variable"
+            )
+            return
+
+        debug.pdbg(
+            f"Line {label.line_number}: Variable {ret_variable.name} ({ret_variable.size} bytes)"
+        )
+        self.variables.append(ret_variable)
+
 
 ############################################
 # Documentation
@@ -0,0 +1,380 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides functions to create and load per-file summaries
+(.dcesum files) of STM8 SDCC generated assembly files.
+
+A summary records everything the dead code evaluation needs to know about
+an assembly file (globals, interrupts, functions, constants, initializers and
+variables, along with their calls, long read and write labels and line ranges).
+Summaries can be created right after each file has been compiled, allowing the
+parsing cost to be spread across a parallel build. The final link step then only has to
+load the summaries instead of parsing every assembly file again.
+
+Summaries are stored as JSON objects.
+"""
+
+import os
+import json
+
+from . import debug
+from . import settings
+from . import asm_analysis
+from .asm_parser import ASMParser
+from .rel_index import file_hash
+
+############################################
+# Constants
+############################################
+
+SUMMARY_EXTENSION = ".dcesum"
+SUMMARY_VERSION = 11
+
+############################################
+# Classes
+############################################
+
+
+class ASMSummary:
+    """
+    Class to load a .dcesum summary of an assembly file.
+    Provides the same attributes as ASMParser, so that it can be used in its place.
+
+    Attributes:
+        summary_path (str): The path to the summary file.
+        source_path (str): The path to the summarized assembly file.
+        source_hash (str): The SHA-256 hash (hex) of the summarized file at the time of summarizing.
+        codeseg (str): The code segment name the file was summarized with.
+        constseg (str): The constant segment name the file was summarized with.
+        globals (list): A list of global definitions.
+        interrupts (list): A list of interrupt definitions.
+        functions (list): A list of functions.
+        constants (list): A list of constants.
+        initializers (list): A list of initializers.
+        variables (list): A list of variables.
+        references (list): Labels referenced by instructions outside of functions.
+    """
+
+    def __init__(self, summary_path):
+        """
+        Initializes the ASMSummary with a file path and loads the summary.
+        The loaded objects are assigned the path of the summarized file (See relocate).
+
+        Args:
+            summary_path (str): The path to the .dcesum file to be loaded.
+
+        Raises:
+            ValueError: If the file is not a valid summary or has an unsupported version.
+        """
+        self.summary_path = summary_path
+        self.globals = []
+        self.interrupts = []
+        self.functions = []
+        self.constants = []
+        self.initializers = []
+        self.variables = []
+        self.references = []
+
+        debug.pdbg()
+        debug.pdbg(f"Loading summary: {summary_path}")
+        debug.pseperator()
+
+        try:
+            with open(summary_path, "r") as file_obj:
+                data = json.load(file_obj)
+        except json.JSONDecodeError:
+            raise ValueError(f"Error: Corrupt summary file: {summary_path}")
+
+        if not isinstance(data, dict) or data.get("format") != "stm8dce-summary":
+            raise ValueError(f"Error: Not a stm8dce summary file: {summary_path}")
+
+        if data.get("version") != SUMMARY_VERSION:
+            raise ValueError(
+                f"Error: Unsupported summary version {data.get('version')} in {summary_path} (expected {SUMMARY_VERSION})"
+            )
+
+        self._load(data, os.path.join(os.path.dirname(summary_path), data["source"]))
+
+    @classmethod
+    def from_data(cls, data, source_path):
+        """
+        Creates an ASMSummary from already decoded summary data (See summary_data).
+
+        Args:
+            data (dict): The decoded summary.
+            source_path (str): The path of the summarized file.
+
+        Returns:
+            ASMSummary: The summary.
+        """
+        ret = cls.__new__(cls)
+        ret.summary_path = None
+        ret.globals = []
+        ret.interrupts = []
+        ret.functions = []
+        ret.constants = []
+        ret.initializers = []
+        ret.variables = []
+        ret.references = []
+        ret._load(data, source_path)
+        return ret
+
+    def _load(self, data, path):
+        """
+        Rebuilds the objects recorded in the summary.
+
+        Args:
+            data (dict): The decoded summary.
+            path (str): The path of the summarized file, assigned to the rebuilt objects.
+        """
+        self.source_path = path
+        self.source_hash = data["source_hash"]
+        self.codeseg = data["codeseg"]
+        self.constseg = data["constseg"]
+
+        for line_number, name in data["globals"]:
+            self.globals.append(asm_analysis.GlobalDef(path, line_number, name))
+
+        for line_number, name in data["interrupts"]:
+            self.interrupts.append(asm_analysis.IntDef(path, line_number, name))
+
+        for entry in data["functions"]:
+            function = asm_analysis.Function(path, entry["start"], entry["name"])
+            function.end_line_number = entry["end"]
+            function.calls_str = list(entry["calls"])
+            function.jumps_str = list(entry["jumps"])
+            function.long_read_labels_str = list(entry["long_reads"])
+            function.long_write_labels_str = list(entry["long_writes"])
+            function.body_hash = entry["body_hash"]
+            function.unreachable_blocks = [
+                tuple(block) for block in entry["unreachable_blocks"]
+            ]
+            function.trampoline = entry["trampoline"]
+            function.stub = entry["stub"]
+            function.call_sites = [tuple(site) for site in entry["call_sites"]]
+            function.stack_frame = entry["stack_frame"]
+            function.stack_calls = [tuple(call) for call in entry["stack_calls"]]
+            function.empty = entry["empty"]
+            function.size = entry["size"]
+            if entry["iret"]:
+                function.isr = True
+            self.functions.append(function)
+
+        for entry in data["constants"]:
+            constant = asm_analysis.Constant(path, entry["start"], entry["name"])
+            constant.end_line_number = entry["end"]
+            constant.size = entry["size"]
+            constant.data_labels_str = list(entry["data_labels"])
+            constant.body_hash = entry["body_hash"]
+            self.constants.append(constant)
+
+        for entry in data["initializers"]:
+            initializer = asm_analysis.Initializer(path, entry["start"], entry["name"])
+            initializer.end_line_number = entry["end"]
+            initializer.pointers_str = list(entry["pointers"])
+            initializer.data_labels_str = list(entry["data_labels"])
+            initializer.size = entry["size"]
+            self.initializers.append(initializer)
+
+        for entry in data["variables"]:
+            variable = asm_analysis.Variable(
+                path, entry["start"], entry["name"], entry["area"]
+            )
+            variable.end_line_number = entry["end"]
+            variable.size = entry["size"]
+            self.variables.append(variable)
+
+        self.references = list(data["references"])
+
+        debug.pdbg(
+            f"Loaded {len(self.functions)} functions, {len(self.constants)} constants, {len(self.initializers)} initializers and {len(self.variables)} variables"
+        )
+
+    def relocate(self, path):
+        """
+        Assigns a new path to all loaded objects.
+        Used when the summarized file is edited under a different path (ex. a copy in the output directory).
+
+        Args:
+            path (str): The path to assign.
+        """
+        for obj in (
+            self.globals
+            + self.interrupts
+            + self.functions
+            + self.constants
+            + self.initializers
+            + self.variables
+        ):
+            obj.path = path
+
+    def is_stale(self, hash_function=file_hash, options=None):
+        """
+        Checks if the summary no longer matches the summarized file or the
+        segment names of the given options.
+
+        Args:
+            hash_function (callable, optional): Function used to hash the summarized file (See file_hash).
+            options (Options, optional): The options providing the segment names (default: settings.DEFAULT).
+
+        Returns:
+            bool: True if the summarized file or segment names have changed, False otherwise.
+
+        Raises:
+            ValueError: If the summarized file no longer exists.
+        """
+        if not os.path.exists(self.source_path):
+            raise ValueError(
+                f"Error: Summarized file of {self.summary_path} not found: {self.source_path}"
+            )
+        options = options or settings.DEFAULT
+        if self.codeseg != options.codeseg or self.constseg != options.constseg:
+            return True
+        return hash_function(self.source_path).hex() != self.source_hash
+
+
+############################################
+# Summary creation
+############################################
+
+
+def summary_data(asmparser, file_path, source_hash=None):
+    """
+    Creates the summary data of a parsed assembly file.
+    The segment names are taken from the options the file was parsed with.
+
+    Args:
+        asmparser (ASMParser): The parser of the assembly file.
+        file_path (str): The path of the assembly file.
+        source_hash (bytes, optional): The SHA-256 hash of the file (default: hash of the file at file_path).
+
+    Returns:
+        dict: The summary data (JSON serializable). The "source" entry is left
+              to be filled in by the caller.
+    """
+    return {
+        "format": "stm8dce-summary",
+        "version": SUMMARY_VERSION,
+        "source": None,
+        "source_hash": (source_hash or file_hash(file_path)).hex(),
+        "codeseg": asmparser.options.codeseg,
+        "constseg": asmparser.options.constseg,
+        "globals": [[glob.line_number, glob.name] for glob in asmparser.globals],
+        "interrupts": [
+            [intdef.line_number, intdef.name] for intdef in asmparser.interrupts
+        ],
+        "functions": [
+            {
+                "name": function.name,
+                "start": function.start_line_number,
+                "end": function.end_line_number,
+                "calls": function.calls_str,
+                "jumps": function.jumps_str,
+                "long_reads": function.long_read_labels_str,
+                "long_writes": function.long_write_labels_str,
+                "body_hash": function.body_hash,
+                "unreachable_blocks": function.unreachable_blocks,
+                "trampoline": function.trampoline,
+                "stub": function.stub,
+                "call_sites": function.call_sites,
+                "stack_frame": function.stack_frame,
+                "stack_calls": function.stack_calls,
+                "iret": getattr(function, "isr", False),
+                "empty": function.empty,
+                "size": function.size,
+            }
+            for function in asmparser.functions
+        ],
+        "constants": [
+            {
+                "name": constant.name,
+                "start": constant.start_line_number,
+                "end": constant.end_line_number,
+                "size": constant.size,
+                "data_labels": constant.data_labels_str,
+                "body_hash": constant.body_hash,
+            }
+            for constant in asmparser.constants
+        ],
+        "initializers": [
+            {
+                "name": initializer.name,
+                "start": initializer.start_line_number,
+                "end": initializer.end_line_number,
+                "pointers": initializer.pointers_str,
+                "data_labels": initializer.data_labels_str,
+                "size": initializer.size,
+            }
+            for initializer in asmparser.initializers
+        ],
+        "variables": [
+            {
+                "name": variable.name,
+                "area": variable.area,
+                "start": variable.start_line_number,
+                "end": variable.end_line_number,
+                "size": variable.size,
+            }
+            for variable in asmparser.variables
+        ],
+        "references": asmparser.references,
+    }
+
+
+def write_summary(file_path, summary_path, options=None):
+    """
+    Parses an assembly file and writes its summary into a summary file.
+
+    Args:
+        file_path (str): The path to the assembly file to be summarized.
+        summary_path (str): The path of the summary file to be written.
+        options (Options, optional): The options to parse the file with (default: settings.DEFAULT).
+
+    Returns:
+        ASMParser: The parser used to summarize the file.
+    """
+    asmparser = ASMParser(file_path, options)
+
+    data = summary_data(asmparser, file_path)
+    data["source"] = os.path.relpath(
+        os.path.abspath(file_path), os.path.dirname(os.path.abspath(summary_path))
+    )
+
+    with open(summary_path, "w") as file_obj:
+        json.dump(data, file_obj, separators=(",", ":"))
+
+    return asmparser
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,162 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides functions to load batch manifests.
+
+A batch manifest describes multiple independent projects, each with its own
+input files, entry label and output directory, to be processed in a single
+invocation of the tool. Manifests are either JSON or TOML (Python 3.11+) files:
+
+JSON:
+    {
+        "projects": [
+            {
+                "name": "board_a",
+                "inputs": ["board_a/main.asm", "spl/stm8s_gpio.asm", "lib/stm8.lib"],
+                "output": "board_a/dce",
+                "entry": "_main",
+                "exclude_functions": ["_keep_me"],
+                "exclude_constants": ["file.asm:_TABLE"],
+                "opt_irq": true,
+                "codeseg": "CODE",
+                "constseg": "CONST"
+            }
+        ]
+    }
+
+Only "name", "inputs" and "output" are required. Paths are relative to the manifest.
+"""
+
+import os
+
+from .manifest import load_manifest, string_list, check_unique_names
+
+############################################
+# Classes
+############################################
+
+
+class Project:
+    """
+    Class to store the configuration of a single project of a batch.
+
+    Attributes:
+        name (str): The name of the project.
+        input_files (list): The input files of the project.
+        output_dir (str): The output directory of the project.
+        entry_label (str): The entry label of the project.
+        exclude_functions (list): Function labels to exclude from dead code elimination.
+        exclude_constants (list): Constant labels to exclude from dead code elimination.
+        opt_irq (bool): Whether unused IRQ handlers are removed.
+        codeseg (str): The code segment name.
+        constseg (str): The constant segment name.
+    """
+
+    def __init__(
+        self,
+        name,
+        input_files,
+        output_dir,
+        entry_label="_main",
+        exclude_functions=None,
+        exclude_constants=None,
+        opt_irq=False,
+        codeseg="CODE",
+        constseg="CONST",
+    ):
+        self.name = name
+        self.input_files = input_files
+        self.output_dir = output_dir
+        self.entry_label = entry_label
+        self.exclude_functions = exclude_functions
+        self.exclude_constants = exclude_constants
+        self.opt_irq = opt_irq
+        self.codeseg = codeseg
+        self.constseg = constseg
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+
+############################################
+# Manifest loading
+############################################
+
+
+def load_projects(manifest_path):
+    """
+    Loads the projects of a batch manifest.
+
+    Args:
+        manifest_path (str): The path to the JSON or TOML manifest.
+
+    Returns:
+        list: A list of Project objects.
+
+    Raises:
+        ValueError: If the manifest is malformed.
+    """
+    entries = load_manifest(manifest_path, "projects")
+    check_unique_names(entries, manifest_path, ["name", "inputs", "output"])
+
+    base_dir = os.path.dirname(manifest_path)
+
+    ret = []
+    for entry in entries:
+        name = f"project {entry['name']}"
+        inputs = string_list(entry, "inputs", name)
+        if not inputs:
+            raise ValueError(f"Error: No input files for {name}")
+
+        ret.append(
+            Project(
+                entry["name"],
+                [os.path.join(base_dir, input_file) for input_file in inputs],
+                os.path.join(base_dir, entry["output"]),
+                entry.get("entry", "_main"),
+                string_list(entry, "exclude_functions", name),
+                string_list(entry, "exclude_constants", name),
+                bool(entry.get("opt_irq", False)),
+                entry.get("codeseg", "CODE"),
+                entry.get("constseg", "CONST"),
+            )
+        )
+
+    return ret
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,379 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides a cache for parsed input files, allowing multiple runs
+within the same process to skip parsing files that haven't changed.
+"""
+
+import os
+import copy
+
+from . import debug
+from . import settings
+from . import asm_summary
+from .asm_parser import ASMParser
+from .asm_summary import ASMSummary
+from .rel_parser import RELParser
+from .rel_index import RELIndex, file_hash
+
+############################################
+# Classes
+############################################
+
+
+class _Entry:
+    """
+    Class to store a cached value along with the state of the file it was created from.
+
+    Attributes:
+        stat (tuple): Modification time and size of the file.
+        hash (bytes): SHA-256 hash of the file.
+        value: The cached value.
+    """
+
+    def __init__(self, stat, hash, value):
+        self.stat = stat
+        self.hash = hash
+        self.value = value
+
+
+class ParseCache:
+    """
+    Class to cache parsed assembly, .rel and .lib files as well as loaded indexes.
+
+    A cached entry is considered valid as long as the modification time and size of its
+    file are unchanged. If either changed, the file is hashed and the entry is only
+    discarded if the content differs as well (ex. a file that was merely touched is not
+    parsed again).
+
+    Files with identical content (ex. copies of the same library in different projects)
+    are only parsed once, regardless of their path.
+
+    Parsed objects are modified during reference resolution. The cache therefore never
+    hands out the cached objects themselves, but fresh copies of them.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._asm = {}
+        self._rel = {}
+        self._indexes = {}
+        self._contents = {}
+
+    @staticmethod
+    def _stat(path):
+        """
+        Returns the modification time and size of a file.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            tuple: Modification time (ns) and size of the file.
+        """
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def file_hash(self, path):
+        """
+        Returns the SHA-256 hash of a file.
+        The hash is only recalculated if the file's modification time or size changed.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            bytes: The SHA-256 digest of the file.
+        """
+        key = os.path.realpath(path)
+        stat = self._stat(key)
+        cached = self._hashes.get(key)
+        if cached and cached[0] == stat:
+            return cached[1]
+        ret = file_hash(key)
+        self._hashes[key] = (stat, ret)
+        return ret
+
+    def _lookup(self, table, key, path):
+        """
+        Looks up a cached entry and validates it against the current state of its file.
+
+        Args:
+            table (dict): The table to look up the entry in.
+            key: The key of the entry.
+            path (str): The path of the file the entry was created from.
+
+        Returns:
+            The cached value if the entry is valid, None otherwise.
+        """
+        entry = table.get(key)
+        if not entry:
+            debug.pdbg(f"Cache miss: {path}")
+            return None
+
+        stat = self._stat(path)
+        if entry.stat != stat:
+            if self.file_hash(path) != entry.hash:
+                debug.pdbg(f"Cache invalidated: {path}")
+                del table[key]
+                return None
+            entry.stat = stat
+
+        debug.pdbg(f"Cache hit: {path}")
+        return entry.value
+
+    def _store(self, table, key, path, value):
+        """
+        Stores a value in the cache.
+
+        Args:
+            table (dict): The table to store the entry in.
+            key: The key of the entry.
+            path (str): The path of the file the value was created from.
+            value: The value to store.
+        """
+        table[key] = _Entry(self._stat(path), self.file_hash(path), value)
+
+    def _lookup_content(self, key, path):
+        """
+        Looks up a value created from a file with identical content.
+
+        Args:
+            key (tuple): The key of the value, excluding the file's hash.
+            path (str): The path of the file.
+
+        Returns:
+            The cached value if a file with identical content has been parsed, None otherwise.
+        """
+        value = self._contents.get(key + (self.file_hash(path),))
+        if value is not None:
+            debug.pdbg(f"Cache hit (identical content): {path}")
+        return value
+
+    def _store_content(self, key, path, value):
+        """
+        Stores a value by the content of the file it was created from.
+
+        Args:
+            key (tuple): The key of the value, excluding the file's hash.
+            path (str): The path of the file.
+            value: The value to store.
+        """
+        self._contents[key + (self.file_hash(path),)] = value
+
+    def _cached_asm(self, path, options):
+        """
+        Looks up the summary data of an assembly file by its path or content.
+
+        Args:
+            path (str): The path of the assembly file.
+            options (Options): The options to parse the file with.
+
+        Returns:
+            dict: The summary data if the file has been parsed before, None otherwise.
+        """
+        key = (os.path.realpath(path), options.codeseg, options.constseg)
+
+        data = self._lookup(self._asm, key, path)
+        if data is None:
+            data = self._lookup_content(("asm", options.codeseg, options.constseg), path)
+            if data is not None:
+                self._store(self._asm, key, path, data)
+        return data
+
+    def _store_asm(self, path, options, data):
+        """
+        Stores the summary data of a parsed assembly file.
+
+        Args:
+            path (str): The path of the assembly file.
+            options (Options): The options the file was parsed with.
+            data (dict): The summary data of the file.
+        """
+        key = (os.path.realpath(path), options.codeseg, options.constseg)
+        self._store_content(("asm", options.codeseg, options.constseg), path, data)
+        self._store(self._asm, key, path, data)
+
+    def _cached_rel(self, path):
+        """
+        Looks up the modules of a .rel or .lib file by its path or content.
+
+        Args:
+            path (str): The path of the .rel or .lib file.
+
+        Returns:
+            list: The cached Module objects if the file has been parsed before, None otherwise.
+        """
+        key = os.path.realpath(path)
+
+        modules = self._lookup(self._rel, key, path)
+        if modules is None:
+            modules = self._lookup_content(("rel",), path)
+            if modules is not None:
+                self._store(self._rel, key, path, modules)
+        return modules
+
+    def _store_rel(self, path, modules):
+        """
+        Stores the modules of a parsed .rel or .lib file.
+
+        Args:
+            path (str): The path of the .rel or .lib file.
+            modules (list): The parsed Module objects.
+        """
+        self._store_content(("rel",), path, modules)
+        self._store(self._rel, os.path.realpath(path), path, modules)
+
+    def prefetch(self, asm_paths=(), rel_paths=(), options=None, jobs=None):
+        """
+        Parses all given files that aren't cached yet in parallel worker processes,
+        so that subsequent calls of asm_file and rel_modules are cache hits.
+
+        Args:
+            asm_paths (iterable of str): The paths of assembly files.
+            rel_paths (iterable of str): The paths of .rel and .lib files.
+            options (Options, optional): The options to parse the assembly files with (default: settings.DEFAULT).
+            jobs (JobSlots, optional): The job slots to parse the files with. Files are not prefetched if None.
+        """
+        if jobs is None:
+            return
+
+        options = options or settings.DEFAULT
+
+        # Files with identical content are only parsed once
+        missing = {}
+        for path in asm_paths:
+            if self._cached_asm(path, options) is None:
+                missing.setdefault(("asm", self.file_hash(path)), path)
+        for path in rel_paths:
+            if self._cached_rel(path) is None:
+                missing.setdefault(("rel", self.file_hash(path)), path)
+
+        if len(missing) <= 1:
+            return
+
+        debug.pdbg(f"Parsing {len(missing)} files with up to {jobs.jobs} jobs")
+
+        parse_jobs = [(kind, path, options) for (kind, _), path in missing.items()]
+        results = jobs.map(_parse, parse_jobs, processes=True)
+
+        for (kind, path, _), value in zip(parse_jobs, results):
+            if kind == "asm":
+                self._store_asm(path, options, value)
+            else:
+                self._store_rel(path, value)
+
+    def asm_file(self, path, options=None):
+        """
+        Returns the globals, interrupts, functions, constants, initializers and variables
+        of an assembly file, parsing it only if necessary.
+
+        Args:
+            path (str): The path of the assembly file.
+            options (Options, optional): The options to parse the file with (default: settings.DEFAULT).
+
+        Returns:
+            ASMSummary: The summary of the file, providing the same attributes as ASMParser.
+        """
+        options = options or settings.DEFAULT
+
+        data = self._cached_asm(path, options)
+        if data is None:
+            data = asm_summary.summary_data(ASMParser(path, options), path)
+            self._store_asm(path, options, data)
+
+        return ASMSummary.from_data(data, path)
+
+    def rel_modules(self, path):
+        """
+        Returns the modules of a .rel or .lib file, parsing it only if necessary.
+
+        Args:
+            path (str): The path of the .rel or .lib file.
+
+        Returns:
+            list: A list of Module objects.
+        """
+        modules = self._cached_rel(path)
+        if modules is None:
+            modules = RELParser(path).modules
+            self._store_rel(path, modules)
+
+        return [module.copy(path) for module in modules]
+
+    def index(self, path):
+        """
+        Returns a loaded .dceidx index, loading it only if necessary.
+
+        Args:
+            path (str): The path of the index file.
+
+        Returns:
+            RELIndex: The loaded index.
+        """
+        key = os.path.realpath(path)
+
+        index = self._lookup(self._indexes, key, path)
+        if index is None:
+            index = RELIndex(path)
+            self._store(self._indexes, key, path, index)
+
+        ret = copy.copy(index)
+        ret.modules = [module.copy() for module in index.modules]
+        return ret
+
+
+############################################
+# Worker functions
+############################################
+
+
+def _parse(job):
+    """
+    Parses a single file. Runs in a worker process (See ParseCache.prefetch).
+
+    Args:
+        job (tuple): The kind of the file ("asm" or "rel"), its path and the options to parse it with.
+
+    Returns:
+        The summary data of an assembly file, or the modules of a .rel or .lib file.
+    """
+    kind, path, options = job
+    with settings.use(options):
+        if kind == "asm":
+            return asm_summary.summary_data(ASMParser(path, options), path)
+        return RELParser(path).modules
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,260 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module builds the control flow graph of a function to find unreachable code.
+
+A function is split into basic blocks, which start at the function's entry, at every
+local label (ex. 00102$) and after every jump or return. A block continues with the
+next block unless it ends with an unconditional instruction (See Instruction.is_unconditional),
+and jumps to the block of its jump target if the target is a local label.
+
+Local labels referenced in any other way (ex. the jump tables of switch statements,
+ldw x, #00115$ followed by jp (x)) may be jumped to indirectly, so their blocks are
+treated as reachable. Building the graph and finding the reachable blocks takes a single
+pass over the function each, so it is cheap enough to run for every function.
+
+The same graph is used to track the stack allocated by the function (See
+Instruction.stack_delta) along its control flow, which gives the function's frame
+size and the stack in use at each of its direct calls and jumps to other functions.
+"""
+
+import re
+import collections
+
+from . import sizes
+from .asm_matchers import Instruction, Label, LOCAL_LABEL
+
+############################################
+# Constants
+############################################
+
+# Bytes of the return address pushed by calls
+_RETURN_ADDRESS_SIZES = {"call": 2, "callr": 2, "callf": 3, "jp": 0, "jpf": 0}
+
+# Direct call or jump targets
+_TARGET = re.compile(r"[A-Za-z_]\w*")
+
+############################################
+# Control flow graph
+############################################
+
+
+def basic_blocks(body):
+    """
+    Splits the lines of a function into basic blocks.
+
+    Args:
+        body (list): The matched lines of the function (See asm_matchers.match_asm_line),
+                     excluding the function's label.
+
+    Returns:
+        tuple: A list of blocks, each a list of matched lines, and a dict mapping
+               the local labels of the function to the index of their block.
+    """
+    blocks = []
+    labels = {}
+    current = []
+
+    for eval in body:
+        if isinstance(eval, Label):
+            if current:
+                blocks.append(current)
+                current = []
+            labels[eval.name] = len(blocks)
+            current.append(eval)
+            continue
+
+        current.append(eval)
+        if isinstance(eval, Instruction) and (
+            eval.is_jump() or eval.is_unconditional()
+        ):
+            blocks.append(current)
+            current = []
+
+    if current:
+        blocks.append(current)
+
+    return blocks, labels
+
+
+def control_flow(blocks, labels):
+    """
+    Finds the successors of each basic block.
+
+    Args:
+        blocks (list): The basic blocks of the function (See basic_blocks).
+        labels (dict): Maps the local labels of the function to the index of their block.
+
+    Returns:
+        tuple: Two lists holding the indexes of the blocks each block continues with or
+               jumps to, and of the blocks whose local labels each block references
+               other than by jumps (and which may be jumped to indirectly).
+    """
+    successors = []
+    indirect = []
+
+    for index, block in enumerate(blocks):
+        targets = []
+        references = []
+        last = block[-1]
+
+        for eval in block:
+            if isinstance(eval, Label):
+                continue
+            jump = eval.is_jump() if isinstance(eval, Instruction) else None
+            for label in LOCAL_LABEL.findall(eval.line):
+                if label not in labels:
+                    continue
+                if label == jump:
+                    targets.append(labels[label])
+                else:
+                    references.append(labels[label])
+
+        if not (isinstance(last, Instruction) and last.is_unconditional()):
+            targets.append(index + 1)
+
+        successors.append([target for target in targets if target < len(blocks)])
+        indirect.append(references)
+
+    return successors, indirect
+
+
+def reachable_blocks(blocks, labels):
+    """
+    Finds the basic blocks that are reachable from the entry of a function
+    (the first block) or through local labels referenced other than by jumps.
+
+    Args:
+        blocks (list): The basic blocks of the function (See basic_blocks).
+        labels (dict): Maps the local labels of the function to the index of their block.
+
+    Returns:
+        set: The indexes of the reachable blocks.
+    """
+    successors, indirect = control_flow(blocks, labels)
+    roots = ([0] if blocks else []) + [
+        target for references in indirect for target in references
+    ]
+
+    reachable = set(roots)
+    queue = collections.deque(roots)
+    while queue:
+        for target in successors[queue.popleft()]:
+            if target not in reachable:
+                reachable.add(target)
+                queue.append(target)
+
+    return reachable
+
+
+def unreachable_blocks(body):
+    """
+    Finds the code of a function that is unreachable from its entry
+    (ex. dead tails after an unconditional jump or return).
+
+    Args:
+        body (list): The matched lines of the function (See asm_matchers.match_asm_line),
+                     excluding the function's label.
+
+    Returns:
+        list: Tuples of the first and last line number and the estimated size in bytes
+              of each run of consecutive unreachable blocks.
+    """
+    blocks, labels = basic_blocks(body)
+    reachable = reachable_blocks(blocks, labels)
+
+    ret = []
+    for index, block in enumerate(blocks):
+        if index in reachable:
+            continue
+        size = sum(sizes.size(eval) for eval in block)
+        if ret and index - 1 not in reachable:
+            first, _, previous_size = ret[-1]
+            ret[-1] = (first, block[-1].line_number, previous_size + size)
+        else:
+            ret.append((block[0].line_number, block[-1].line_number, size))
+
+    return ret
+
+
+def stack_usage(body):
+    """
+    Tracks the stack allocated by a function along its control flow, starting
+    with an empty frame at its entry. Blocks jumped to indirectly are entered with
+    the stack of the block referencing their label. Each block is visited once,
+    assuming the stack is balanced where control flow merges, as it is in SDCC's output.
+
+    Args:
+        body (list): The matched lines of the function (See asm_matchers.match_asm_line),
+                     excluding the function's label.
+
+    Returns:
+        tuple: The frame size, which is the largest number of bytes the function allocates
+               on the stack (excluding its own return address), and a list of tuples of the
+               label and stack usage of each direct call or jump to another function. The
+               stack usage is the number of bytes allocated at the call, plus the pushed
+               return address (See _RETURN_ADDRESS_SIZES).
+    """
+    blocks, labels = basic_blocks(body)
+    successors, indirect = control_flow(blocks, labels)
+
+    frame = 0
+    calls = {}
+    heights = {0: 0} if blocks else {}
+    queue = collections.deque(heights)
+    while queue:
+        index = queue.popleft()
+        height = heights[index]
+        for eval in blocks[index]:
+            if not isinstance(eval, Instruction):
+                continue
+            if (
+                eval.mnemonic in _RETURN_ADDRESS_SIZES
+                and len(eval.args) == 1
+                and _TARGET.fullmatch(eval.args[0])
+            ):
+                usage = height + _RETURN_ADDRESS_SIZES[eval.mnemonic]
+                calls[eval.args[0]] = max(calls.get(eval.args[0], 0), usage)
+            height += eval.stack_delta()
+            frame = max(frame, height)
+
+        for target in successors[index] + indirect[index]:
+            if target not in heights:
+                heights[target] = height
+                queue.append(target)
+
+    return frame, list(calls.items())
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,2168 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides the dead code analysis of the tool as a side-effect-free API.
+
+Example:
+    import stm8dce
+
+    result = stm8dce.analyze(
+        ["main.asm", "stm8s_it.asm", "stm8.lib"],
+        stm8dce.Options(entry_label="_main", opt_irq=True),
+    )
+    for function in result.remove_functions:
+        print(function.name, function.path)
+
+    stm8dce.apply(result, "build/dce")     # Write the processed files
+    contents = stm8dce.rewrite(result)     # Or get them as strings
+
+The analysis only reads its input files. Files are only written by apply.
+"""
+
+import os
+import io
+import re
+import copy
+import collections
+import shutil
+import hashlib
+import filecmp
+
+from . import debug
+from . import asm_analysis
+from . import rel_analysis
+from . import rel_index
+from . import asm_summary
+from . import settings
+from . import dominators
+from . import stack as stack_depth
+
+from .asm_parser import ASMParser
+from .asm_summary import ASMSummary
+from .rel_parser import RELParser
+from .cache import ParseCache
+from .exclusions import ExclusionList
+from .settings import Options
+
+############################################
+# Classes
+############################################
+
+
+class Analysis:
+    """
+    Class to store the results of the dead code analysis.
+
+    The analyzed objects refer to the paths of the assembly files they
+    belong to, which are either their source paths or their output paths (See resolve).
+
+    Attributes:
+        options (Options): The options of the analysis.
+        asm_files (dict): Maps the paths the analyzed objects refer to, to the source paths of the assembly files.
+        sources (dict): Contents of input files that aren't read from the filesystem, by source path (See resolve).
+        modules (list): All modules of the rel and lib files.
+        globals (list): All global definitions.
+        interrupts (list): All interrupt definitions.
+        functions (list): All functions.
+        constants (list): All constants.
+        initializers (list): All initializers.
+        variables (list): All variables.
+        references (list): Tuples of the path and label of labels referenced outside of functions.
+        keep_functions (list): Functions to keep.
+        keep_constants (list): Constants to keep.
+        keep_variables (list): Variables to keep.
+        keep_initializers (list): Initializers to keep (of kept variables, or without a variable).
+        remove_functions (list): Functions to remove.
+        remove_constants (list): Constants to remove.
+        remove_variables (list): Variables to remove.
+        remove_initializers (list): Initializers to remove (of removed variables).
+        remove_globals (list): Global definitions to remove.
+        remove_interrupts (list): Interrupt definitions to remove.
+        folded_functions (dict): Maps kept functions that are folded into an identical function
+                                 to the function they are folded into (See Options.opt_fold).
+        pooled_constants (dict): Maps kept constants that are pooled with an identical constant
+                                 to the constant they are pooled into (See Options.opt_pool).
+        remove_blocks (list): Tuples of each kept function and the first and last line number and size
+                              of its code that is unreachable from its entry (See Options.opt_blocks).
+        collapsed_trampolines (dict): Maps removed trampolines to the label their references
+                                      are redirected to (See Options.opt_trampolines).
+        retargets (dict): Maps tuples of a kept function and a trampoline it references to the label
+                          the function's references are redirected to (See Options.opt_trampolines).
+        remove_calls (list): Tuples of each kept function and the line number and size of its calls
+                             to removed stubs, along with the called stub (See Options.opt_calls).
+        remove_stubs (list): Kept functions that only return, removed along with all calls to them
+                             (See Options.opt_calls).
+        roots (list): Tuples of the objects the evaluation started from and why (ex. "entry").
+        diagnostics (list): Warnings raised during the analysis.
+    """
+
+    # Kinds of references between functions, constants, variables, initializers and modules
+    EDGE_KINDS = (
+        "call",
+        "jp",
+        "long-read pointer",
+        "long read",
+        "variable access",
+        "initial value",
+        "external reference",
+        "constant .dw",
+        "initializer .dw",
+        "module reference",
+    )
+
+    # Cycles of a call instruction and the ret of the called function (4 cycles each)
+    CALL_CYCLES = 8
+
+    # Bytes pushed onto the stack when an interrupt is entered (PC, X, Y, A and CC)
+    INTERRUPT_CONTEXT = 9
+
+    def __init__(self, options):
+        self.options = options
+        self.asm_files = {}
+        self.sources = {}
+        self.modules = []
+        self.globals = []
+        self.interrupts = []
+        self.functions = []
+        self.constants = []
+        self.initializers = []
+        self.variables = []
+        self.references = []
+        self.keep_functions = []
+        self.keep_constants = []
+        self.keep_variables = []
+        self.keep_initializers = []
+        self.remove_functions = []
+        self.remove_constants = []
+        self.remove_variables = []
+        self.remove_initializers = []
+        self.remove_globals = []
+        self.remove_interrupts = []
+        self.folded_functions = {}
+        self.pooled_constants = {}
+        self.remove_blocks = []
+        self.collapsed_trampolines = {}
+        self.retargets = {}
+        self.remove_calls = []
+        self.remove_stubs = []
+        self.roots = []
+        self.diagnostics = []
+        self._parents = None
+        self._dominators = None
+
+    def graph(self):
+        """
+        Returns the reference graph of all functions.
+
+        Returns:
+            dict: Maps each function to the list of functions and constants it references.
+        """
+        return {
+            function: list(function.function_references) + list(function.constants)
+            for function in self.functions
+        }
+
+    def _edges(self):
+        """
+        Returns the outgoing references of every function, constant, variable, initializer and module.
+
+        References to rel and lib modules are matched by symbol name, regardless of
+        whether the modules are used. Static variables are only matched within their own file.
+
+        Returns:
+            dict: Maps each object to a list of (referenced object, kind) tuples (See EDGE_KINDS).
+        """
+        modules_by_symbol = {}
+        for module in self.modules:
+            for symbol in module.defined_symbols:
+                modules_by_symbol.setdefault(symbol.name, []).append(module)
+
+        # Modules can only reference global variables
+        objects_by_name = asm_analysis.index_by_name(
+            self.functions
+            + self.constants
+            + [variable for variable in self.variables if variable.global_defs]
+        )
+        variables_by_name = asm_analysis.index_by_name(self.variables)
+
+        def external(names, kind):
+            return [
+                (module, kind)
+                for name in names
+                for module in modules_by_symbol.get(name, [])
+            ]
+
+        def variables(obj, names, kind):
+            return [
+                (variable, kind)
+                for name in names
+                for variable in variables_by_name.get(name, [])
+                if variable.global_defs or variable.path == obj.path
+            ]
+
+        ret = {}
+        for function in self.functions:
+            ret[function] = (
+                [
+                    (
+                        reference,
+                        (
+                            "jp"
+                            if reference.name in function.jumps_str
+                            else (
+                                "call"
+                                if reference.name in function.calls_str
+                                else "long-read pointer"
+                            )
+                        ),
+                    )
+                    for reference in function.function_references
+                ]
+                + [(constant, "long read") for constant in function.constants]
+                + variables(
+                    function,
+                    function.long_read_labels_str + function.long_write_labels_str,
+                    "variable access",
+                )
+                + external(
+                    function.external_calls + function.external_constants,
+                    "external reference",
+                )
+            )
+        for constant in self.constants:
+            ret[constant] = variables(
+                constant, constant.data_labels_str, "constant .dw"
+            )
+        for variable in self.variables:
+            if variable.initializer:
+                ret[variable] = [(variable.initializer, "initial value")]
+        for initializer in self.initializers:
+            ret[initializer] = (
+                [
+                    (pointer, "initializer .dw")
+                    for pointer in initializer.function_pointers
+                    + initializer.constant_pointers
+                ]
+                + variables(
+                    initializer, initializer.data_labels_str, "initializer .dw"
+                )
+                + external(initializer.unresolved_pointers, "initializer .dw")
+            )
+        for module in self.modules:
+            ret[module] = [
+                (obj, "module reference")
+                for symbol in module.referenced_symbols
+                for obj in objects_by_name.get(symbol.name, [])
+            ]
+
+        return ret
+
+    def explain(self, name):
+        """
+        Explains why functions, constants or variables are kept, by returning the shortest
+        chain of references from a root of the evaluation (See roots) to them.
+
+        The chains are recorded once, by a breadth-first propagation from all roots
+        over the references between kept objects, so repeated queries are cheap.
+
+        Args:
+            name (str): The name of the function, constant or variable, optionally with its
+                        filename (ex. file.asm:_name).
+
+        Returns:
+            list: Tuples of each matching function, constant or variable and its chain. A chain is a list of
+                  (object, kind) tuples, starting with the root and the reason it is a root, followed
+                  by each referenced object and the kind of the reference (See EDGE_KINDS).
+                  The chain is None if the object is removed.
+
+        Raises:
+            ValueError: If no function, constant or variable matches the name.
+        """
+        filename, name = eval_flabel(name)
+        matches = [
+            obj
+            for obj in self.functions + self.constants + self.variables
+            if obj.name == name
+            and (filename is None or os.path.basename(obj.path) == filename)
+        ]
+        if not matches:
+            raise ValueError(
+                f"Error: Function, constant or variable not found: {name}"
+            )
+
+        if self._parents is None:
+            self._parents = self._propagate()
+
+        ret = []
+        for obj in matches:
+            if obj not in self._parents:
+                ret.append((obj, None))
+                continue
+
+            chain = []
+            node = obj
+            while node is not None:
+                parent, kind = self._parents[node]
+                chain.append((node, kind))
+                node = parent
+            ret.append((obj, chain[::-1]))
+
+        return ret
+
+    def _propagate(self):
+        """
+        Propagates liveness breadth-first from the roots of the evaluation
+        and records the parent of every reached object.
+
+        Returns:
+            dict: Maps each reached object to a tuple of its parent (None for roots) and
+                  the kind of the reference (the reason for roots).
+        """
+        edges = self._live_edges()
+
+        parents = {}
+        queue = collections.deque()
+        for root, reason in self.roots:
+            if root not in parents:
+                parents[root] = (None, reason)
+                queue.append(root)
+
+        while queue:
+            node = queue.popleft()
+            for target, kind in edges.get(node, []):
+                if target not in parents:
+                    parents[target] = (node, kind)
+                    queue.append(target)
+
+        return parents
+
+    def _live_edges(self):
+        """
+        Returns the references that keep objects, which are all references
+        to kept functions, constants, variables and initializers, and to modules.
+
+        References to merged objects count as references to the objects they are merged
+        into, and references to collapsed trampolines as references to their targets.
+
+        Returns:
+            dict: Maps each object to a list of (referenced object, kind) tuples (See _edges).
+        """
+        kept = (
+            set(self.keep_functions)
+            | set(self.keep_constants)
+            | set(self.keep_variables)
+            | set(self.keep_initializers)
+        )
+        merged = {**self.folded_functions, **self.pooled_constants}
+        edges = self._edges()
+
+        def live(targets):
+            ret = []
+            for target, kind in targets:
+                target = merged.get(target, target)
+                if target in self.collapsed_trampolines:
+                    ret += [(obj, kind) for obj, _ in live(edges.get(target, []))]
+                elif isinstance(target, rel_analysis.Module) or target in kept:
+                    ret.append((target, kind))
+            return ret
+
+        return {obj: live(targets) for obj, targets in edges.items()}
+
+    def _escaping_functions(self, function_pointers=True):
+        """
+        Returns the functions whose address escapes, which are all functions referenced
+        other than by calls and jumps of functions (ex. function pointers, tables, initializers,
+        modules, code outside of functions and interrupt vectors), as well as the roots of
+        the evaluation. Such functions must keep their own label and address.
+
+        References are matched by name, regardless of whether the names resolve to the functions.
+
+        Args:
+            function_pointers (bool): Whether function pointers loaded by functions count
+                                      as escaping (default: True).
+
+        Returns:
+            set: The escaping functions.
+        """
+        names = {label for _, label in self.references}
+        if function_pointers:
+            for function in self.functions:
+                names.update(function.long_read_labels_str)
+        for obj in self.constants + self.initializers:
+            names.update(obj.data_labels_str)
+        for module in self.modules:
+            names.update(symbol.name for symbol in module.referenced_symbols)
+
+        roots = {root for root, _ in self.roots}
+        return {
+            function
+            for function in self.functions
+            if function.name in names
+            or function.isr_def
+            or getattr(function, "isr", False)
+            or function in roots
+        }
+
+    def _escaping_constants(self):
+        """
+        Returns the constants whose address escapes, which are all constants referenced
+        other than by functions or plain pointers of initializers (ex. tables, modules
+        and code outside of functions), as well as the roots of the evaluation.
+
+        References are matched by name, regardless of whether the names resolve to the constants.
+
+        Returns:
+            set: The escaping constants.
+        """
+        names = {label for _, label in self.references}
+        for constant in self.constants:
+            names.update(constant.data_labels_str)
+        for initializer in self.initializers:
+            names.update(
+                label
+                for label in initializer.data_labels_str
+                if label not in initializer.pointers_str
+            )
+        for module in self.modules:
+            names.update(symbol.name for symbol in module.referenced_symbols)
+
+        roots = {root for root, _ in self.roots}
+        return {
+            constant
+            for constant in self.constants
+            if constant.name in names or constant in roots
+        }
+
+    def _referrers(self):
+        """
+        Returns the kept functions and initializers referencing each function and constant,
+        which are the objects whose references are renamed if a function or constant is
+        merged into an identical one (See folded_functions and pooled_constants).
+        References to objects that are already merged count as references to the objects
+        they are merged into.
+
+        Returns:
+            dict: Maps each referenced function and constant to a list of its kept referrers.
+        """
+        merged = {**self.folded_functions, **self.pooled_constants}
+        ret = {}
+        for referrer in self.keep_functions + self.keep_initializers:
+            for reference in dict.fromkeys(_references(referrer)):
+                referrers = ret.setdefault(merged.get(reference, reference), [])
+                if referrer not in referrers:
+                    referrers.append(referrer)
+        return ret
+
+    def _redirect(self, referrer, obj):
+        """
+        Returns the label a kept function or initializer must use to reference a function
+        or constant, after merging identical objects and collapsing trampolines.
+
+        Args:
+            referrer: The kept function or initializer.
+            obj: The referenced function or constant.
+
+        Returns:
+            str: The label to reference the object by.
+        """
+        obj = self.folded_functions.get(obj, self.pooled_constants.get(obj, obj))
+        return self.retargets.get((referrer, obj), obj.name)
+
+    def dominators(self):
+        """
+        Returns the immediate dominator of every object kept by the roots of the
+        evaluation (See roots). Everything an object dominates is only kept through
+        it, and would be removed along with it.
+
+        Returns:
+            dict: Maps each object to its immediate dominator, or None if it is only
+                  dominated by the roots as a whole.
+        """
+        return self._dominator_tree()[0]
+
+    def retained_sizes(self):
+        """
+        Returns the retained size of every kept function and constant, which is the
+        estimated size of the function or constant and everything it dominates (See dominators).
+
+        Returns:
+            dict: Maps each kept function and constant to its retained size in bytes.
+        """
+        idoms, order = self._dominator_tree()
+        retained = dominators.retained_sizes(
+            idoms, order, lambda obj: getattr(obj, "size", 0)
+        )
+        return {
+            obj: size
+            for obj, size in retained.items()
+            if isinstance(obj, (asm_analysis.Function, asm_analysis.Constant))
+        }
+
+    def stack_depths(self):
+        """
+        Returns the worst-case stack depth of every kept function, which is the largest
+        number of bytes the function and the functions it calls allocate on the stack,
+        excluding the function's own return address (See stack.worst_case_depths).
+
+        Only direct calls and jumps are followed. Calls through function pointers and
+        calls to rel and lib modules, whose code isn't analyzed, don't add to the depth.
+        Removed calls to stubs are skipped, and calls to folded functions and collapsed
+        trampolines follow the calls of the code that remains.
+
+        Returns:
+            tuple: A dict mapping each kept function (and collapsed trampoline) to its
+                   worst-case stack depth in bytes (None if unbounded by recursion), and
+                   a dict mapping each function to the function it calls on its deepest path.
+        """
+        nodes = sorted(
+            self.keep_functions + list(self.collapsed_trampolines), key=_position
+        )
+        kept = set(nodes)
+
+        def calls(function):
+            targets = {
+                reference.name: self.folded_functions.get(reference, reference)
+                for reference in function.function_references
+            }
+            return [
+                (targets[label], usage)
+                for label, usage in function.stack_calls
+                if targets.get(label) in kept
+            ]
+
+        return stack_depth.worst_case_depths(
+            nodes, calls, lambda function: function.stack_frame
+        )
+
+    def stack_usage(self):
+        """
+        Returns the worst-case stack usage of the program, which is the deepest stack of
+        the entry and excluded functions, plus the deepest stack of the interrupt handlers
+        including the context pushed on interrupt entry (See INTERRUPT_CONTEXT).
+        Interrupts are assumed not to nest.
+
+        Returns:
+            tuple: The worst-case stack depth of the main path, of the interrupt handlers,
+                   and of both combined in bytes, each None if unbounded by recursion.
+        """
+        depths, _ = self.stack_depths()
+
+        def deepest(functions):
+            ret = 0
+            for function in functions:
+                if depths[function] is None:
+                    return None
+                ret = max(ret, depths[function])
+            return ret
+
+        roots = [
+            (root, reason)
+            for root, reason in self.roots
+            if isinstance(root, asm_analysis.Function)
+        ]
+        handlers = [root for root, reason in roots if reason == "interrupt handler"]
+        main = deepest(root for root, reason in roots if reason != "interrupt handler")
+        interrupts = deepest(handlers)
+        if handlers and interrupts is not None:
+            interrupts += self.INTERRUPT_CONTEXT
+
+        total = None if main is None or interrupts is None else main + interrupts
+        return main, interrupts, total
+
+    def _dominator_tree(self):
+        """
+        Computes the dominators over the references that keep objects,
+        starting from a virtual root referencing all roots of the evaluation.
+
+        Returns:
+            tuple: The immediate dominators and all kept objects in depth-first preorder
+                   (See dominators.immediate_dominators).
+        """
+        if self._dominators is None:
+            edges = self._live_edges()
+            roots = list(dict.fromkeys(root for root, _ in self.roots))
+
+            def successors(obj):
+                if obj is None:
+                    return roots
+                return [target for target, _ in edges.get(obj, [])]
+
+            self._dominators = dominators.immediate_dominators(
+                None, successors
+            )
+        return self._dominators
+
+    def dependencies(self):
+        """
+        Returns the input files each assembly file's removals depend on.
+
+        An assembly file depends on its own source, on the files of all symbols
+        it references and on the files of everything that references its functions
+        and constants, directly or through other functions, initializers and modules.
+        References to rel and lib modules are matched by symbol name, regardless of
+        whether the modules are used, so that a reference becoming used doesn't
+        go unnoticed.
+
+        Returns:
+            dict: Maps the paths of the assembly files (See asm_files) to sets of input file paths.
+        """
+        references = {
+            obj: [target for target, _ in edges] for obj, edges in self._edges().items()
+        }
+
+        referrers = {}
+        for obj, referenced in references.items():
+            for reference in referenced:
+                referrers.setdefault(reference, []).append(obj)
+
+        def input_file(obj):
+            return self.asm_files.get(obj.path, obj.path)
+
+        ret = {path: {source_path} for path, source_path in self.asm_files.items()}
+
+        objects_by_path = {}
+        for obj in self.functions + self.constants + self.variables:
+            objects_by_path.setdefault(obj.path, []).append(obj)
+
+        for path, objects in objects_by_path.items():
+            deps = ret[path]
+            for obj in objects:
+                deps.update(
+                    input_file(reference) for reference in references.get(obj, [])
+                )
+
+            # Everything that may (indirectly) keep the file's functions and constants
+            visited = set(objects)
+            stack = list(objects)
+            while stack:
+                for referrer in referrers.get(stack.pop(), []):
+                    if referrer not in visited:
+                        visited.add(referrer)
+                        deps.add(input_file(referrer))
+                        stack.append(referrer)
+
+        # Functions and constants may be merged into identical ones of other files,
+        # which their referrers are redirected to (See Options.opt_fold and opt_pool)
+        mergeable = []
+        if self.options.opt_fold:
+            mergeable += self.functions
+        if self.options.opt_pool:
+            mergeable += self.constants
+        identical = {}
+        for obj in mergeable:
+            if obj.body_hash is not None:
+                identical.setdefault((type(obj), obj.body_hash), []).append(obj)
+        for group in identical.values():
+            if len(group) < 2:
+                continue
+            files = {input_file(obj) for obj in group}
+            for obj in group:
+                for dependent in [obj] + referrers.get(obj, []):
+                    if dependent.path in ret:
+                        ret[dependent.path].update(files)
+
+        # References to trampolines may be redirected to the end of their chain
+        # (See Options.opt_trampolines)
+        if self.options.opt_trampolines:
+            for trampoline in self.functions:
+                if trampoline.trampoline is None:
+                    continue
+                files = set()
+                visited = {trampoline}
+                stack = [trampoline]
+                while stack:
+                    for reference in references.get(stack.pop(), []):
+                        files.add(input_file(reference))
+                        if (
+                            getattr(reference, "trampoline", None)
+                            and reference not in visited
+                        ):
+                            visited.add(reference)
+                            stack.append(reference)
+                for dependent in referrers.get(trampoline, []):
+                    if dependent.path in ret:
+                        ret[dependent.path].update(files)
+
+        return ret
+
+    def sizes(self):
+        """
+        Returns the estimated flash size of the kept and removed functions, constants
+        and initializers. Folded functions, pooled constants, collapsed trampolines, stubs,
+        and unreachable code and calls to stubs of kept functions count as removed.
+
+        Only the functions, constants and initializers of the assembly files are counted,
+        the sizes of rel and lib modules are unknown.
+
+        Returns:
+            tuple: The kept and removed sizes in bytes.
+        """
+        kept = sum(
+            obj.size
+            for obj in self.keep_functions
+            + self.keep_constants
+            + self.keep_initializers
+        )
+        removed = sum(
+            obj.size
+            for obj in self.remove_functions
+            + self.remove_constants
+            + self.remove_initializers
+            + list(self.folded_functions)
+            + list(self.pooled_constants)
+            + list(self.collapsed_trampolines)
+            + self.remove_stubs
+        )
+        unreachable = sum(size for _, _, _, size in self.remove_blocks)
+        unreachable += sum(size for _, _, size, _ in self.remove_calls)
+        return kept - unreachable, removed + unreachable
+
+    def ram_sizes(self):
+        """
+        Returns the RAM size of the kept and removed variables.
+
+        Returns:
+            tuple: The kept and removed sizes in bytes.
+        """
+        kept = sum(variable.size for variable in self.keep_variables)
+        removed = sum(variable.size for variable in self.remove_variables)
+        return kept, removed
+
+    def edits(self):
+        """
+        Returns the line edits required to remove the dead code, grouped by file.
+
+        Unused functions, constants, variables (along with their initializers),
+        global definitions and unreachable code of kept functions are commented out.
+        Interrupt definitions of removed IRQ handlers must be set to 0x000000 instead
+        of being commented out, else remaining IRQ handlers will be moved to a different
+        VTABLE entry!
+        Folded functions and pooled constants are commented out as well, and their labels
+        are renamed to the functions and constants they are merged into within the
+        referencing functions and initializers and the global definitions of other files.
+        Collapsed trampolines are commented out along with their global definitions,
+        and the references of kept functions to trampolines are renamed to their targets.
+        Removed stubs are commented out along with their global definitions and all calls to them.
+
+        Returns:
+            dict: Maps the paths of the files (See asm_files) to a tuple of (line numbers to comment out, line numbers of interrupt definitions to clear, (line number, label, new label) tuples of labels to rename).
+        """
+        ret = {}
+
+        def file_edits(path):
+            if path not in ret:
+                ret[path] = (set(), set(), set())
+            return ret[path]
+
+        for removed in (
+            self.remove_functions
+            + self.remove_constants
+            + self.remove_variables
+            + self.remove_initializers
+        ):
+            file_edits(removed.path)[0].update(
+                range(removed.start_line_number, removed.end_line_number + 1)
+            )
+
+        for function, first, last, _ in self.remove_blocks:
+            file_edits(function.path)[0].update(range(first, last + 1))
+
+        for removed_global in self.remove_globals:
+            file_edits(removed_global.path)[0].add(removed_global.line_number)
+
+        for removed_interrupt in self.remove_interrupts:
+            file_edits(removed_interrupt.path)[1].add(removed_interrupt.line_number)
+
+        merged = {**self.folded_functions, **self.pooled_constants}
+        for obj, kept in merged.items():
+            file_edits(obj.path)[0].update(
+                range(obj.start_line_number, obj.end_line_number + 1)
+            )
+            if _is_exported(obj):
+                for global_def in obj.global_defs:
+                    if (
+                        global_def.path == obj.path
+                        or kept in self.collapsed_trampolines
+                    ):
+                        file_edits(global_def.path)[0].add(global_def.line_number)
+                    else:
+                        file_edits(global_def.path)[2].add(
+                            (global_def.line_number, obj.name, kept.name)
+                        )
+
+        for removed in list(self.collapsed_trampolines) + self.remove_stubs:
+            file_edits(removed.path)[0].update(
+                range(removed.start_line_number, removed.end_line_number + 1)
+            )
+            for global_def in removed.global_defs:
+                file_edits(global_def.path)[0].add(global_def.line_number)
+
+        for function, line_number, _, _ in self.remove_calls:
+            file_edits(function.path)[0].add(line_number)
+
+        if merged or self.retargets:
+            for referrer in self.keep_functions + self.keep_initializers:
+                for reference in dict.fromkeys(_references(referrer)):
+                    name = self._redirect(referrer, reference)
+                    if name == reference.name:
+                        continue
+                    file_edits(referrer.path)[2].update(
+                        (line_number, reference.name, name)
+                        for line_number in range(
+                            referrer.start_line_number, referrer.end_line_number + 1
+                        )
+                    )
+
+        return ret
+
+
+############################################
+# Helper functions
+############################################
+
+
+def eval_flabel(flabel):
+    """
+    Evaluates a function label for exclusion.
+
+    Users can specify a function label either as is (e.g., _hello) or with its filename (e.g., file.asm:_hello)
+    to allow exclusion for cases where multiple functions have the same name.
+
+    Args:
+        flabel (str): The function label to evaluate.
+
+    Returns:
+        tuple: A tuple of filename and name. If the filename is not specified, filename is None.
+    """
+    if ":" in flabel:
+        filename, name = flabel.split(":")
+        return filename, name
+    return None, flabel
+
+
+def _read_lines(analysis, source_path):
+    """
+    Reads the lines of an assembly file, either from the filesystem or from the sources of the analysis.
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        source_path (str): The source path of the file.
+
+    Returns:
+        list: The lines of the file.
+    """
+    if source_path in analysis.sources:
+        return io.StringIO(analysis.sources[source_path], newline=None).readlines()
+    with open(source_path, "r") as file:
+        return file.readlines()
+
+
+def _edit_lines(lines, edits):
+    """
+    Applies line edits (See Analysis.edits) to the lines of an assembly file.
+
+    Args:
+        lines (list of str): The lines of the file.
+        edits (tuple): Line numbers to comment out, line numbers of interrupt definitions to clear
+                       and labels to rename.
+
+    Returns:
+        list of str: The edited lines.
+    """
+    commented, cleared, renamed = edits
+    ret = list(lines)
+    for line_number, label, new_label in renamed:
+        ret[line_number - 1] = re.sub(
+            rf"(?<![\w$]){re.escape(label)}(?![\w$])",
+            new_label,
+            ret[line_number - 1],
+        )
+    for line_number in commented:
+        ret[line_number - 1] = ";" + ret[line_number - 1]
+    for line_number in cleared:
+        ret[line_number - 1] = "    int 0x000000\n"
+    return ret
+
+
+############################################
+# Analysis
+############################################
+
+
+def resolve(
+    input_files, output_dir=None, cache=None, options=None, jobs=None, sources=None
+):
+    """
+    Parses the input files and resolves all references between them.
+    Does not write any files.
+
+    Args:
+        input_files (list of str): List of input file paths (ASM, dcesum, rel, lib and dceidx files).
+        output_dir (str, optional): If provided, the analyzed objects refer to the output paths of their
+                                    files in this directory instead of their source paths.
+        cache (ParseCache, optional): Cache of parsed input files.
+        options (Options, optional): The options to parse the files with (default: settings.DEFAULT).
+        jobs (JobSlots, optional): If provided, files are parsed in parallel using these job slots.
+        sources (dict, optional): Maps input files to their contents. These files are read from memory
+                                  instead of the filesystem (ex. archive members, see archive.read_archive).
+
+    Returns:
+        Analysis: The parsed and resolved input files, not yet evaluated (See evaluate).
+    """
+    if cache is None:
+        cache = ParseCache()
+    if options is None:
+        options = settings.DEFAULT
+
+    analysis = Analysis(options)
+    analysis.sources = dict(sources or {})
+
+    # ==========================================
+    # rel and lib Parsing
+    # ==========================================
+
+    # Load prebuilt indexes first, so that the files
+    # they were generated from don't have to be parsed
+    indexes = {}
+    rel_files = []
+    for input_file in input_files:
+        if input_file.endswith(rel_index.INDEX_EXTENSION):
+            index = cache.index(input_file)
+            if index.is_stale(cache.file_hash):
+                analysis.diagnostics.append(
+                    f"Warning: Index {input_file} is out of date, parsing {index.source_path} instead"
+                )
+                rel_files.append(index.source_path)
+                continue
+            indexes[os.path.realpath(index.source_path)] = index
+        elif input_file.endswith(".rel") or input_file.endswith(".lib"):
+            rel_files.append(input_file)
+
+    # Skip files covered by an index and duplicates
+    parsed = set()
+    for rel_file in rel_files[:]:
+        real_path = os.path.realpath(rel_file)
+        if real_path in indexes or real_path in parsed:
+            rel_files.remove(rel_file)
+        parsed.add(real_path)
+
+    # ==========================================
+    # ASM Parsing
+    # ==========================================
+
+    # Gather all asm files and their summaries (if provided)
+    asm_files = {}
+    for input_file in input_files:
+        if input_file.endswith(".asm"):
+            asm_files.setdefault(os.path.realpath(input_file), (input_file, None))
+        elif input_file.endswith(asm_summary.SUMMARY_EXTENSION):
+            summary = ASMSummary(input_file)
+            source_path = summary.source_path
+            if summary.is_stale(cache.file_hash, options):
+                analysis.diagnostics.append(
+                    f"Warning: Summary {input_file} is out of date, parsing {source_path} instead"
+                )
+                summary = None
+            asm_files[os.path.realpath(source_path)] = (source_path, summary)
+
+    # Parse all files that aren't cached yet in parallel
+    cache.prefetch(
+        [
+            source_path
+            for source_path, summary in asm_files.values()
+            if summary is None and source_path not in analysis.sources
+        ],
+        [rel_file for rel_file in rel_files if rel_file not in analysis.sources],
+        options,
+        jobs,
+    )
+
+    # Gather all modules from rel and lib files
+    modules = []
+
+    for index in indexes.values():
+        modules += index.modules
+
+    for rel_file in rel_files:
+        if rel_file in analysis.sources:
+            modules += RELParser(rel_file, analysis.sources[rel_file]).modules
+        else:
+            modules += cache.rel_modules(rel_file)
+
+    # Parse all asm files for globals, interrupts, functions and constants
+    # Files are parsed from their source, but the parsed objects may refer to
+    # their output files instead, since these are the files that get edited
+    globals = []
+    interrupts = []
+    functions = []
+    constants = []
+    initializers = []
+    variables = []
+    references = []
+
+    filenames = set()
+    for source_path, summary in asm_files.values():
+        filename = os.path.basename(source_path)
+        if filename in filenames:
+            raise ValueError(f"Error: Multiple input files named {filename}")
+        filenames.add(filename)
+
+        path = source_path
+        if output_dir is not None:
+            path = os.path.join(output_dir, filename)
+        analysis.asm_files[path] = source_path
+
+        if summary:
+            asmparser = summary
+        elif source_path in analysis.sources:
+            content = analysis.sources[source_path]
+            asmparser = ASMSummary.from_data(
+                asm_summary.summary_data(
+                    ASMParser(source_path, options, content),
+                    source_path,
+                    hashlib.sha256(content.encode("utf-8", "surrogateescape")).digest(),
+                ),
+                source_path,
+            )
+        else:
+            asmparser = cache.asm_file(source_path, options)
+        asmparser.relocate(path)
+
+        globals += asmparser.globals
+        interrupts += asmparser.interrupts
+        constants += asmparser.constants
+        functions += asmparser.functions
+        initializers += asmparser.initializers
+        variables += asmparser.variables
+        references += [(path, label) for label in asmparser.references]
+
+    # ==========================================
+    # Reference Resolution
+    # ==========================================
+
+    # Resolve globals assigned to functions
+    debug.pdbg()
+    debug.pdbg("Resolving globals assigned to functions")
+    debug.pseperator()
+
+    for function in functions:
+        function.resolve_globals(globals)
+
+    # Resolve interrupts
+    debug.pdbg()
+    debug.pdbg("Resolving interrupts")
+    debug.pseperator()
+
+    for function in functions:
+        function.resolve_isr(interrupts)
+
+    # Resolve function calls
+    debug.pdbg()
+    debug.pdbg("Resolving function calls")
+    debug.pseperator()
+
+    for function in functions:
+        function.resolve_calls(functions)
+
+    # Resolve function pointers
+    debug.pdbg()
+    debug.pdbg("Resolving function pointers")
+    debug.pseperator()
+
+    for function in functions:
+        function.resolve_fptrs(functions)
+
+    # Resolve globals assigned to constants
+    debug.pdbg()
+    debug.pdbg("Resolving globals assigned to constants")
+    debug.pseperator()
+
+    for constant in constants:
+        constant.resolve_globals(globals)
+
+    # Resolve constants loaded by functions
+    debug.pdbg()
+    debug.pdbg("Resolving constants loaded by functions")
+    debug.pseperator()
+
+    for function in functions:
+        function.resolve_constants(constants)
+
+    # Resolve functions and constants accessed by initializers
+    debug.pdbg()
+    debug.pdbg("Resolving functions and constants accessed by initializers")
+    debug.pseperator()
+
+    for initializer in initializers:
+        initializer.resolve_pointers(functions, constants)
+
+    # Resolve globals and initializers of variables
+    debug.pdbg()
+    debug.pdbg("Resolving globals and initializers of variables")
+    debug.pseperator()
+
+    asm_analysis.resolve_variables(variables, globals, initializers)
+
+    analysis.modules = modules
+    analysis.globals = globals
+    analysis.interrupts = interrupts
+    analysis.functions = functions
+    analysis.constants = constants
+    analysis.initializers = initializers
+    analysis.variables = variables
+    analysis.references = references
+
+    return analysis
+
+
+def evaluate(analysis, options=None):
+    """
+    Evaluates which functions, constants and variables of a resolved analysis are unused.
+
+    The resolved functions, constants and initializers are left untouched, allowing
+    the same analysis to be evaluated multiple times (ex. for different entry labels).
+
+    Args:
+        analysis (Analysis): The resolved analysis (See resolve).
+        options (Options, optional): The options providing the entry label, exclusions and IRQ optimization
+                                     (default: the options the analysis was resolved with).
+
+    Returns:
+        Analysis: A copy of the analysis with the evaluation results.
+    """
+    if options is None:
+        options = analysis.options
+
+    entry_label = options.entry_label
+    exclude_functions = options.exclude_functions
+    exclude_constants = options.exclude_constants
+
+    ret = copy.copy(analysis)
+    ret.options = options
+    ret.diagnostics = list(analysis.diagnostics)
+    ret.roots = []
+    ret.folded_functions = {}
+    ret.pooled_constants = {}
+    ret.remove_blocks = []
+    ret.collapsed_trampolines = {}
+    ret.retargets = {}
+    ret.remove_calls = []
+    ret.remove_stubs = []
+    ret._parents = None
+    ret._dominators = None
+
+    # Modules record which functions reference them, so each evaluation needs its own
+    modules = [module.copy() for module in analysis.modules]
+    functions = analysis.functions
+    constants = analysis.constants
+    initializers = analysis.initializers
+
+    # ==========================================
+    # Dead Code Evaluation
+    # ==========================================
+
+    keep_functions = []
+    keep_constants = []
+    keep_variables = []
+
+    # Get entry function object
+    entry_function = asm_analysis.functions_by_name(functions, entry_label)
+
+    if entry_function:
+        if len(entry_function) > 1:
+            raise ValueError(
+                f"Error: Multiple definitions for entry label: {entry_label}"
+            )
+
+        entry_function = entry_function[0]
+        ret.roots.append((entry_function, "entry"))
+
+        # Keep entry function and all of its traversed functions
+        debug.pdbg()
+        debug.pdbg(f"Traversing entry function: {entry_label}")
+        debug.pseperator()
+        keep_functions += [entry_function] + asm_analysis.traverse_functions(
+            functions, entry_function
+        )
+    elif modules:
+        # If it's not provided in the asm files, try to look for it in rel and lib files
+        debug.pdbg()
+        debug.pdbg("Entry label not found in ASM files, looking in rel and lib files")
+
+        entry_module = rel_analysis.modules_by_defined_symbol(modules, entry_label)
+        if not entry_module:
+            raise ValueError(f"Error: Entry label not found: {entry_label}")
+        if len(entry_module) > 1:
+            raise ValueError(
+                f"Error: Multiple definitions for entry label: {entry_label}"
+            )
+
+        entry_module = entry_module[0]
+        ret.roots.append((entry_module, "entry"))
+
+        debug.pdbg(
+            f"Entry label found in {entry_module.path}:{entry_module.line_number} in module {entry_module.name}"
+        )
+
+        entry_module.resolve_outgoing_references(functions, constants)
+        for function in entry_module.references:
+            debug.pdbg()
+            debug.pdbg(
+                f"Traversing function {function.name} referenced by module {entry_module.name}"
+            )
+            debug.pseperator()
+            keep_functions += [function] + asm_analysis.traverse_functions(
+                functions, function
+            )
+    else:
+        raise ValueError(f"Error: Entry label not found: {entry_label}")
+
+    # Keep interrupt handlers and all of their traversed functions
+    # but exclude unused IRQ handlers if opted by the user
+    interrupt_handlers = asm_analysis.interrupt_handlers(functions)
+    for handler in interrupt_handlers:
+        if options.opt_irq and handler.empty:
+            continue
+        ret.roots.append((handler, "interrupt handler"))
+        debug.pdbg()
+        debug.pdbg(f"Traversing IRQ handler: {handler.name}")
+        debug.pseperator()
+        keep_functions += [handler] + asm_analysis.traverse_functions(
+            functions, handler
+        )
+
+    # Keep functions excluded by the user and all of their traversed functions
+    if exclude_functions:
+        for exclude_name in exclude_functions:
+            filename, name = eval_flabel(exclude_name)
+            if filename:
+                excluded_function = asm_analysis.function_by_filename_name(
+                    functions, filename, name
+                )
+            else:
+                excluded_function = asm_analysis.functions_by_name(functions, name)
+                if len(excluded_function) > 1:
+                    raise ValueError(
+                        f"Error: Multiple possible definitions for excluded function: {name}"
+                    )
+
+                excluded_function = excluded_function[0] if excluded_function else None
+
+            if not excluded_function:
+                ret.diagnostics.append(f"Warning: Excluded function not found: {name}")
+                continue
+
+            ret.roots.append((excluded_function, "excluded"))
+
+            if excluded_function not in keep_functions:
+                debug.pdbg()
+                debug.pdbg(f"Traversing excluded function: {name}")
+                debug.pseperator()
+                keep_functions += [excluded_function] + asm_analysis.traverse_functions(
+                    functions, excluded_function
+                )
+
+    # Keep functions, constants and variables matched by exclusion patterns
+    if options.exclude_patterns:
+        exclusions = ExclusionList(options.exclude_patterns)
+        matched, unmatched = exclusions.match(
+            list(functions) + list(constants) + list(analysis.variables)
+        )
+
+        for pattern in unmatched:
+            ret.diagnostics.append(
+                f"Warning: Exclusion pattern matched nothing: {pattern}"
+            )
+
+        kept = set(keep_functions)
+        for symbol in matched:
+            ret.roots.append((symbol, "excluded"))
+            if isinstance(symbol, asm_analysis.Constant):
+                keep_constants.append(symbol)
+            elif isinstance(symbol, asm_analysis.Variable):
+                keep_variables.append(symbol)
+            elif symbol not in kept:
+                debug.pdbg()
+                debug.pdbg(f"Traversing function {symbol.name} matched by exclusions")
+                debug.pseperator()
+                traversed = [symbol] + asm_analysis.traverse_functions(
+                    functions, symbol
+                )
+                keep_functions += traversed
+                kept.update(traversed)
+
+    # Keep excluded constants
+    if exclude_constants:
+        for excluded_const_name in exclude_constants:
+            filename, name = eval_flabel(excluded_const_name)
+            if filename:
+                excluded_constant = asm_analysis.constant_by_filename_name(
+                    constants, filename, name
+                )
+            else:
+                excluded_constant = asm_analysis.constants_by_name(constants, name)
+                if len(excluded_constant) > 1:
+                    raise ValueError(
+                        f"Error: Multiple possible definitions for excluded constant: {name}"
+                    )
+
+                excluded_constant = excluded_constant[0] if excluded_constant else None
+
+            if not excluded_constant:
+                ret.diagnostics.append(f"Warning: Excluded constant not found: {name}")
+                continue
+
+            ret.roots.append((excluded_constant, "excluded"))
+
+            if excluded_constant and (excluded_constant not in keep_constants):
+                keep_constants.append(excluded_constant)
+
+    # Keep variables referenced outside of functions (ex. in GSINIT)
+    variables_by_name = asm_analysis.index_by_name(analysis.variables)
+    for path, label in analysis.references:
+        for variable in variables_by_name.get(label, []):
+            if variable.global_defs or variable.path == path:
+                ret.roots.append((variable, "referenced outside of functions"))
+                keep_variables.append(variable)
+
+    # INITIALIZED variables can only be removed along with their initializer,
+    # else the initial values would be copied to the wrong variables
+    for variable in analysis.variables:
+        if variable.area == "INITIALIZED" and not variable.initializer:
+            ret.roots.append((variable, "initializer not found"))
+            keep_variables.append(variable)
+
+    # Initializers of variables are only kept along with their variable,
+    # all other initializers are roots
+    keep_initializers = []
+    for initializer in initializers:
+        if not initializer.variable:
+            ret.roots.append((initializer, "initializer"))
+            keep_initializers.append(initializer)
+    for variable in keep_variables:
+        if variable.initializer and variable.initializer not in keep_initializers:
+            keep_initializers.append(variable.initializer)
+
+    # References of variables are resolved through the same
+    # name indexes as the reference graph (See Analysis._edges)
+    ret.modules = modules
+    edges = ret._edges()
+    scanned = set()
+
+    # Kept variables keep their initializers, which in turn may keep more
+    # functions and variables, so repeat until no more initializers are kept
+    while True:
+        # Keep functions accessed by initializers
+        for initializer in keep_initializers:
+            for function_pointer in initializer.function_pointers:
+                if (
+                    isinstance(function_pointer, asm_analysis.Function)
+                    and function_pointer not in keep_functions
+                ):
+                    debug.pdbg()
+                    debug.pdbg(
+                        f"Traversing function {function_pointer.name} accessed by initializer"
+                    )
+                    debug.pseperator()
+                    keep_functions += [
+                        function_pointer
+                    ] + asm_analysis.traverse_functions(functions, function_pointer)
+
+        # Remove duplicates
+        keep_functions = list(set(keep_functions))
+
+        # Resolve external references of modules that aren't referenced yet
+        for module in modules:
+            if not module.referenced_by:
+                module.resolve_references(
+                    keep_functions, keep_initializers, functions, constants
+                )
+
+        # Keep functions and constants that are referenced by lib and rel files
+        for module in modules:
+            for ref in module.references:
+                if isinstance(ref, asm_analysis.Function) and ref not in keep_functions:
+                    debug.pdbg()
+                    debug.pdbg(
+                        f"Traversing function {ref.name} referenced by module {module.name}"
+                    )
+                    debug.pseperator()
+                    keep_functions += [ref] + asm_analysis.traverse_functions(
+                        functions, ref
+                    )
+                elif (
+                    isinstance(ref, asm_analysis.Constant)
+                    and ref not in keep_constants
+                ):
+                    keep_constants.append(ref)
+
+        # Once again, remove possible duplicates
+        keep_functions = list(set(keep_functions))
+
+        # Keep constants loaded by kept functions
+        for kept_function in keep_functions:
+            keep_constants += kept_function.constants
+
+        # Keep constants accessed by initializers
+        for initializer in keep_initializers:
+            for constant in initializer.constant_pointers:
+                if constant not in keep_constants:
+                    keep_constants.append(constant)
+
+        # Remove duplicates
+        keep_constants = list(set(keep_constants))
+
+        # Keep variables referenced by kept functions, constants and
+        # initializers, and by used modules
+        live = (
+            keep_functions
+            + keep_constants
+            + keep_initializers
+            + [
+                module
+                for module in modules
+                if module.referenced_by or (module, "entry") in ret.roots
+            ]
+        )
+        for obj in live:
+            if obj in scanned:
+                continue
+            scanned.add(obj)
+            for target, _ in edges.get(obj, []):
+                if isinstance(target, asm_analysis.Variable):
+                    keep_variables.append(target)
+
+        keep_variables = list(set(keep_variables))
+
+        # Keep the initializers of kept variables
+        pending = [
+            variable.initializer
+            for variable in keep_variables
+            if variable.initializer and variable.initializer not in keep_initializers
+        ]
+        if not pending:
+            break
+        keep_initializers += pending
+
+    # Remove functions that are not in keep_functions
+    remove_functions = [func for func in functions if func not in keep_functions]
+
+    # Remove global labels assigned to removed functions
+    remove_globals = []
+    for removed_function in remove_functions:
+        remove_globals += removed_function.global_defs
+
+    # Remove interrupt definitions assigned to removed IRQ handlers
+    remove_interrupts = []
+    for removed_function in remove_functions:
+        if removed_function.isr_def:
+            remove_interrupts.append(removed_function.isr_def)
+
+    # Remove constants that are not in keep_constants
+    remove_constants = [const for const in constants if const not in keep_constants]
+
+    # Remove global labels assigned to removed constants
+    remove_globals += [
+        glob_def for const in remove_constants for glob_def in const.global_defs
+    ]
+
+    # Remove variables that are not in keep_variables
+    kept = set(keep_variables)
+    remove_variables = [
+        variable for variable in analysis.variables if variable not in kept
+    ]
+
+    # Remove global labels assigned to removed variables
+    remove_globals += [
+        glob_def for variable in remove_variables for glob_def in variable.global_defs
+    ]
+
+    # Remove initializers that are not in keep_initializers,
+    # which are the initializers of the removed variables
+    kept = set(keep_initializers)
+    remove_initializers = [
+        initializer for initializer in initializers if initializer not in kept
+    ]
+
+    ret.keep_functions = keep_functions
+    ret.keep_constants = keep_constants
+    ret.keep_variables = keep_variables
+    ret.keep_initializers = keep_initializers
+    ret.remove_functions = remove_functions
+    ret.remove_constants = remove_constants
+    ret.remove_variables = remove_variables
+    ret.remove_initializers = remove_initializers
+    ret.remove_globals = remove_globals
+    ret.remove_interrupts = remove_interrupts
+
+    if options.opt_pool:
+        _pool_constants(ret)
+    if options.opt_fold:
+        _fold_functions(ret)
+    if options.opt_calls:
+        _eliminate_calls(ret)
+    if options.opt_trampolines:
+        _collapse_trampolines(ret)
+
+    # Remove code of kept functions that is unreachable from their entry
+    if options.opt_blocks:
+        ret.remove_blocks = [
+            (function, first, last, size)
+            for function in sorted(ret.keep_functions, key=_position)
+            for first, last, size in function.unreachable_blocks
+        ]
+
+    return ret
+
+
+def _fold_functions(analysis):
+    """
+    Folds kept functions with identical code into a single copy (See Options.opt_fold).
+
+    Functions are grouped by the hash of their normalized instructions (See asm_parser)
+    along with the objects their references resolve to, so that functions referencing
+    different static symbols of the same name are never folded. Grouping is a single
+    pass over the kept functions (See _merge_identical).
+
+    Only functions that are exclusively called or jumped to by functions are folded
+    (See Analysis._escaping_functions), as other references may rely on the function
+    having its own address (ex. comparing function pointers).
+
+    Args:
+        analysis (Analysis): The evaluated analysis, updated in place.
+    """
+    edges = analysis._edges()
+    escaping = analysis._escaping_functions()
+
+    groups = {}
+    for function in sorted(analysis.keep_functions, key=_position):
+        if function.body_hash is None or function in escaping:
+            continue
+        targets = tuple(
+            sorted(
+                _position(target)
+                for target, _ in edges[function]
+                if not isinstance(target, rel_analysis.Module)
+            )
+        )
+        groups.setdefault((function.body_hash, targets), []).append(function)
+
+    _merge_identical(analysis, groups.values(), analysis.folded_functions)
+
+    analysis.keep_functions = [
+        function
+        for function in analysis.keep_functions
+        if function not in analysis.folded_functions
+    ]
+
+
+def _pool_constants(analysis):
+    """
+    Pools kept constants with identical data into a single definition (See Options.opt_pool).
+
+    Constants are grouped by the hash of their normalized data directives (See asm_parser).
+    The data of constants referencing labels (ex. tables of pointers) may refer to
+    static symbols, so these are only pooled within their own file. Grouping is a single
+    pass over the kept constants (See _merge_identical).
+
+    Only constants that are exclusively read by functions or pointed to by initializers
+    are pooled (See Analysis._escaping_constants).
+
+    Args:
+        analysis (Analysis): The evaluated analysis, updated in place.
+    """
+    escaping = analysis._escaping_constants()
+
+    groups = {}
+    for constant in sorted(analysis.keep_constants, key=_position):
+        if constant.body_hash is None or constant in escaping:
+            continue
+        key = (constant.body_hash, constant.path if constant.data_labels_str else None)
+        groups.setdefault(key, []).append(constant)
+
+    _merge_identical(analysis, groups.values(), analysis.pooled_constants)
+
+    analysis.keep_constants = [
+        constant
+        for constant in analysis.keep_constants
+        if constant not in analysis.pooled_constants
+    ]
+
+
+def _merge_identical(analysis, groups, merged):
+    """
+    Merges groups of identical functions or constants into a single object each.
+
+    The first object of each group (preferring global objects) is kept, and the references
+    to the other objects are redirected to it (See Analysis.edits). Objects referenced from
+    other files are only merged if these files can reach the kept object by its name, which
+    requires a global kept object and no static symbol of the same name in these files.
+
+    Args:
+        analysis (Analysis): The evaluated analysis.
+        groups (iterable): Lists of identical objects, ordered by their position.
+        merged (dict): Maps each merged object to the object it is merged into, updated in place.
+    """
+    referrers = analysis._referrers()
+
+    # Static symbols of each file, which would shadow the label of a global object
+    names_by_path = _names_by_path(analysis)
+
+    for group in groups:
+        if len(group) < 2:
+            continue
+
+        exported = [obj for obj in group if _is_exported(obj)]
+        kept = exported[0] if exported else group[0]
+
+        for obj in group:
+            if obj is kept:
+                continue
+
+            paths = {referrer.path for referrer in referrers.get(obj, [])} - {
+                kept.path
+            }
+            if paths and (
+                kept not in exported
+                or any(kept.name in names_by_path.get(path, ()) for path in paths)
+            ):
+                continue
+
+            debug.pdbg(
+                f"Merging {obj.name} in {obj.path}:{obj.start_line_number} into {kept.name} in {kept.path}:{kept.start_line_number}"
+            )
+            merged[obj] = kept
+
+
+def _eliminate_calls(analysis):
+    """
+    Removes the calls of kept functions to stubs, which are functions that only return
+    (ex. stubbed hooks or disabled logging), along with the stubs (See Options.opt_calls).
+
+    Only stubs that are exclusively called by kept functions are removed. Stubs that
+    are jumped to (ex. tail calls), or whose address escapes (See Analysis._escaping_functions)
+    are kept along with all calls to them.
+
+    Args:
+        analysis (Analysis): The evaluated analysis, updated in place.
+    """
+    referrers = analysis._referrers()
+    escaping = analysis._escaping_functions()
+
+    for stub in sorted(analysis.keep_functions, key=_position):
+        if not stub.stub or stub in escaping:
+            continue
+
+        # Labels each caller calls the stub by, including functions folded into it
+        callers = {
+            caller: {
+                reference.name
+                for reference in caller.function_references
+                if analysis.folded_functions.get(reference, reference) is stub
+            }
+            for caller in referrers.get(stub, [])
+        }
+        if any(
+            caller is stub or names & set(caller.jumps_str)
+            for caller, names in callers.items()
+        ):
+            continue
+
+        debug.pdbg(
+            f"Removing stub {stub.name} in {stub.path}:{stub.start_line_number} and the calls to it"
+        )
+        analysis.remove_stubs.append(stub)
+        for caller, names in callers.items():
+            analysis.remove_calls += [
+                (caller, line_number, size, stub)
+                for line_number, label, size in caller.call_sites
+                if label in names
+            ]
+
+    removed = set(analysis.remove_stubs)
+    analysis.keep_functions = [
+        function for function in analysis.keep_functions if function not in removed
+    ]
+
+
+def _collapse_trampolines(analysis):
+    """
+    Redirects the references of kept functions to trampolines, which are functions that only
+    jump to another function (ex. wrappers), to the end of the trampoline's chain
+    (See Options.opt_trampolines).
+
+    References are redirected to the last function of the chain the referencing function
+    can reach by its name (See _merge_identical). Function pointers are only redirected
+    if all references to the trampoline are, so that pointers to it remain comparable.
+    Trampolines whose references are all redirected are removed, unless their address
+    escapes otherwise (See Analysis._escaping_functions).
+
+    Args:
+        analysis (Analysis): The evaluated analysis, updated in place.
+    """
+    referrers = analysis._referrers()
+    escaping = analysis._escaping_functions(function_pointers=False)
+    names_by_path = _names_by_path(analysis)
+
+    for trampoline in sorted(analysis.keep_functions, key=_position):
+        if trampoline.trampoline is None:
+            continue
+
+        # Labels and objects (None for modules) along the chain of trampolines
+        chain = []
+        node = trampoline
+        visited = {trampoline}
+        while node is not None and node.trampoline is not None:
+            target = next(
+                (
+                    function
+                    for function in node.function_references
+                    if function.name == node.trampoline
+                ),
+                None,
+            )
+            target = analysis.folded_functions.get(target, target)
+            if target in visited:
+                chain = []
+                break
+            chain.append((target.name if target else node.trampoline, target))
+            visited.add(target)
+            node = target
+        if not chain:
+            continue
+
+        others = [r for r in referrers.get(trampoline, []) if r is not trampoline]
+        retargets = {}
+        pointers = []
+        for referrer in others:
+            reachable = [
+                name
+                for name, target in chain
+                if _reachable_by_name(name, target, referrer.path, names_by_path)
+            ]
+            if reachable:
+                retargets[referrer] = reachable[-1]
+            if trampoline.name in referrer.long_read_labels_str:
+                pointers.append(referrer)
+
+        collapse = trampoline not in escaping and len(retargets) == len(others)
+        if not collapse:
+            for referrer in pointers:
+                retargets.pop(referrer, None)
+
+        for referrer, name in retargets.items():
+            analysis.retargets[(referrer, trampoline)] = name
+        if collapse:
+            debug.pdbg(
+                f"Collapsing trampoline {trampoline.name} in {trampoline.path}:{trampoline.start_line_number} into {chain[-1][0]}"
+            )
+            analysis.collapsed_trampolines[trampoline] = chain[-1][0]
+
+    analysis.keep_functions = [
+        function
+        for function in analysis.keep_functions
+        if function not in analysis.collapsed_trampolines
+    ]
+
+
+def _names_by_path(analysis):
+    """
+    Returns the labels of the functions, constants and variables of each file,
+    which would shadow global labels of the same name in that file.
+
+    Args:
+        analysis (Analysis): The analysis.
+
+    Returns:
+        dict: Maps the paths of the files to sets of labels.
+    """
+    ret = {}
+    for obj in analysis.functions + analysis.constants + analysis.variables:
+        ret.setdefault(obj.path, set()).add(obj.name)
+    return ret
+
+
+def _reachable_by_name(name, obj, path, names_by_path):
+    """
+    Checks if code of a file can reach a function or constant by its label.
+
+    Args:
+        name (str): The label.
+        obj: The function or constant, or None if it is a symbol of a rel or lib module.
+        path (str): The path of the file.
+        names_by_path (dict): The labels defined by each file (See _names_by_path).
+
+    Returns:
+        bool: True if the label resolves to the object within the file, False otherwise.
+    """
+    if obj is not None and obj.path == path:
+        return True
+    if obj is not None and not _is_exported(obj):
+        return False
+    return name not in names_by_path.get(path, ())
+
+
+def _references(referrer):
+    """
+    Returns the functions and constants a kept function or initializer references by label.
+
+    Args:
+        referrer: The function or initializer.
+
+    Returns:
+        list: The referenced functions and constants.
+    """
+    if isinstance(referrer, asm_analysis.Function):
+        return referrer.function_references + referrer.constants
+    return referrer.constant_pointers
+
+
+def _position(obj):
+    """
+    Returns the position of a function, constant or variable, used to order them.
+
+    Args:
+        obj: The function, constant or variable.
+
+    Returns:
+        tuple: The path and start line number.
+    """
+    return obj.path, obj.start_line_number
+
+
+def _is_exported(obj):
+    """
+    Checks if a function or constant is exported by a global definition in its own file.
+
+    Args:
+        obj: The function or constant.
+
+    Returns:
+        bool: True if the object is exported, False otherwise.
+    """
+    return any(global_def.path == obj.path for global_def in obj.global_defs)
+
+
+def analyze(
+    input_files, options=None, cache=None, output_dir=None, jobs=None, sources=None
+):
+    """
+    Parses the input files, resolves all references and evaluates which functions and constants are unused.
+    Does not write any files and doesn't print anything apart from debug output (if enabled in the options).
+    Warnings are collected in the diagnostics of the result.
+
+    Args:
+        input_files (list of str): List of input file paths (ASM, dcesum, rel, lib and dceidx files).
+        options (Options, optional): The options of the analysis (default: Options()).
+        cache (ParseCache, optional): Cache of parsed input files, allowing consecutive analyses
+                                      to skip parsing unchanged files.
+        output_dir (str, optional): If provided, the analyzed objects refer to the output paths of their
+                                    files in this directory instead of their source paths.
+        jobs (JobSlots, optional): If provided, files are parsed in parallel using these job slots.
+        sources (dict, optional): Maps input files to their contents. These files are read from memory
+                                  instead of the filesystem (ex. archive members, see archive.read_archive).
+
+    Returns:
+        Analysis: The results of the analysis.
+
+    Raises:
+        ValueError: If the input files can't be analyzed (ex. conflicting definitions or a missing entry label).
+    """
+    if options is None:
+        options = Options()
+
+    with settings.use(options):
+        return evaluate(
+            resolve(input_files, output_dir, cache, options, jobs, sources), options
+        )
+
+
+############################################
+# Output
+############################################
+
+
+def _output_path(analysis, path, output_dir):
+    """
+    Returns the output path of an analyzed assembly file.
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        path (str): The path of the file (See Analysis.asm_files).
+        output_dir (str): The output directory, or None to write to the path itself.
+
+    Returns:
+        str: The output path.
+
+    Raises:
+        ValueError: If the file would overwrite its source.
+    """
+    if output_dir is not None:
+        return os.path.join(output_dir, os.path.basename(path))
+    # Output files may be symlinks to their sources (See OUTPUT_STRATEGIES)
+    real_path = os.path.join(
+        os.path.realpath(os.path.dirname(path)), os.path.basename(path)
+    )
+    if real_path == os.path.realpath(analysis.asm_files[path]):
+        raise ValueError(f"Error: Refusing to overwrite input file: {path}")
+    return path
+
+
+def rewrite(analysis):
+    """
+    Returns the processed contents of all assembly files, without writing any files.
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+
+    Returns:
+        dict: Maps the file names of the assembly files to their processed contents.
+    """
+    edits = analysis.edits()
+
+    ret = {}
+    for path, source_path in analysis.asm_files.items():
+        lines = _read_lines(analysis, source_path)
+        if path in edits:
+            lines = _edit_lines(lines, edits[path])
+        ret[os.path.basename(path)] = "".join(lines)
+
+    return ret
+
+
+# Ways to create output files that are identical to their source (See apply)
+OUTPUT_STRATEGIES = ("copy", "hardlink", "reflink", "symlink")
+
+# ioctl to clone a file's extents on Linux (copy-on-write filesystems, ex. Btrfs and XFS)
+_FICLONE = 0x40049409
+
+
+def _reflink(source_path, target):
+    """
+    Creates a copy-on-write clone of a file.
+
+    Args:
+        source_path (str): The path of the file to clone.
+        target (str): The path of the clone.
+
+    Raises:
+        OSError: If the platform or filesystem doesn't support cloning.
+    """
+    import fcntl
+
+    with open(source_path, "rb") as source, open(target, "wb") as clone:
+        try:
+            fcntl.ioctl(clone.fileno(), _FICLONE, source.fileno())
+        except OSError:
+            clone.close()
+            os.unlink(target)
+            raise
+    shutil.copymode(source_path, target)
+
+
+def _link(source_path, target, strategy):
+    """
+    Creates an output file that is identical to its source.
+    Falls back to copying the file if the strategy isn't supported.
+
+    Args:
+        source_path (str): The path of the source file.
+        target (str): The path of the output file, which must not exist.
+        strategy (str): One of OUTPUT_STRATEGIES.
+    """
+    try:
+        if strategy == "hardlink":
+            os.link(source_path, target)
+            return
+        if strategy == "symlink":
+            os.symlink(os.path.abspath(source_path), target)
+            return
+        if strategy == "reflink":
+            _reflink(source_path, target)
+            return
+    except (OSError, ImportError) as e:
+        debug.pdbg(f"Cannot {strategy} {source_path} ({e}), copying instead")
+
+    shutil.copy(source_path, target)
+
+
+def _remove(path):
+    """
+    Removes a file (or link) if it exists.
+    Output files are always replaced instead of overwritten in place, as
+    they may be links to their source files (See OUTPUT_STRATEGIES).
+
+    Args:
+        path (str): The path of the file.
+    """
+    if os.path.lexists(path):
+        os.unlink(path)
+
+
+def _has_content(path, content):
+    """
+    Checks whether a file exists and has the given content.
+
+    Args:
+        path (str): The path of the file.
+        content (str): The expected content.
+
+    Returns:
+        bool: True if the file exists and has the given content, False otherwise.
+    """
+    try:
+        with open(path, "r", errors="surrogateescape") as file:
+            return file.read() == content
+    except (FileNotFoundError, UnicodeDecodeError):
+        return False
+
+
+def _make_escape(path):
+    """
+    Escapes a path for use in a Makefile rule.
+
+    Args:
+        path (str): The path to escape.
+
+    Returns:
+        str: The escaped path.
+    """
+    return path.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+def write_depfile(analysis, depfile, output_dir=None):
+    """
+    Writes a Makefile dependency file listing the input files
+    each output file depends on (See Analysis.dependencies).
+
+    A phony rule is added for every input file, so that make doesn't
+    fail if an input file is removed (Same as gcc's -MP).
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        depfile (str): The path of the dependency file.
+        output_dir (str, optional): The directory the files are written to (See apply).
+
+    Raises:
+        ValueError: If no output directory is provided and the analysis refers to the source files.
+    """
+    dependencies = analysis.dependencies()
+
+    rules = []
+    inputs = set()
+    for path in analysis.asm_files:
+        target = _make_escape(_output_path(analysis, path, output_dir))
+        deps = sorted(dependencies[path])
+        inputs.update(deps)
+        rules.append(
+            f"{target}: " + " \\\n  ".join(_make_escape(dep) for dep in deps) + "\n"
+        )
+
+    rules += [f"\n{_make_escape(path)}:\n" for path in sorted(inputs)]
+
+    with open(depfile, "w") as file:
+        file.writelines(rules)
+
+
+def apply(analysis, output_dir=None, only=None, jobs=None, strategy="copy"):
+    """
+    Writes the processed assembly files.
+    Files without any dead code are copied (or linked, see strategy) as is,
+    files with dead code always get a private copy.
+
+    Output files whose content wouldn't change are left untouched, so that their
+    modification times are preserved and build tools don't process them again.
+
+    Args:
+        analysis (Analysis): The results of the analysis.
+        output_dir (str, optional): The directory to write the files to. Must be provided unless
+                                    the analysis was performed with an output directory.
+        only (set, optional): If provided, only the files with these paths (See Analysis.asm_files) are written.
+        jobs (JobSlots, optional): If provided, files are written in parallel using these job slots.
+        strategy (str, optional): How files without dead code are created, one of OUTPUT_STRATEGIES
+                                  (default: "copy"). Linked files must not be edited in place.
+
+    Returns:
+        list: The output paths of all files that were written, in the order of Analysis.asm_files.
+
+    Raises:
+        ValueError: If no output directory is provided and the analysis refers to the source files,
+                    or if the strategy is unknown.
+    """
+    if strategy not in OUTPUT_STRATEGIES:
+        raise ValueError(f"Error: Unknown output strategy: {strategy}")
+
+    edits = analysis.edits()
+
+    # Resolve all output paths first, so that nothing is written if any of them is invalid
+    targets = [
+        (path, source_path, _output_path(analysis, path, output_dir))
+        for path, source_path in analysis.asm_files.items()
+        if only is None or path in only
+    ]
+
+    def write(target):
+        path, source_path, target = target
+
+        if path not in edits and source_path not in analysis.sources:
+            if os.path.isfile(target) and filecmp.cmp(
+                source_path, target, shallow=False
+            ):
+                return False
+            _remove(target)
+            _link(source_path, target, strategy)
+            return True
+
+        lines = _read_lines(analysis, source_path)
+        if path in edits:
+            lines = _edit_lines(lines, edits[path])
+        content = "".join(lines)
+
+        if not os.path.islink(target) and _has_content(target, content):
+            return False
+
+        _remove(target)
+        with open(target, "w", errors="surrogateescape") as file:
+            file.write(content)
+        return True
+
+    if jobs is None:
+        written = [write(target) for target in targets]
+    else:
+        written = jobs.map(write, targets)
+
+    return [target for (_, _, target), changed in zip(targets, written) if changed]
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -22,18 +22,18 @@ from . import settings
 
 def pdbg(*args):
     """
-    Only prints if the debug setting is enabled.
+    Only prints if debug output is enabled in the options of the current run.
     """
-    if settings.debug:
+    if settings.current().debug:
         print(*args)
 
 
 def pseperator():
     """
     Prints a separator line for better debug output readability.
-    Only prints if the debug setting is enabled.
+    Only prints if debug output is enabled in the options of the current run.
     """
-    if settings.debug:
+    if settings.current().debug:
         print(
             "========================================================================================="
         )
@@ -0,0 +1,161 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module computes dominators of directed graphs.
+
+A node d dominates a node n if every path from the root to n passes through d.
+The immediate dominator of n is the closest of its dominators (apart from n itself),
+which makes the dominators a tree. Applied to the reference graph, everything in
+the subtree of a function is only reachable through that function, and would be
+removed along with it.
+
+Dominators are computed with the Lengauer-Tarjan algorithm (with path compression),
+which runs in O(E log V). All steps are iterative, so deep call chains don't
+exceed Python's recursion limit.
+"""
+
+############################################
+# Dominators
+############################################
+
+
+def immediate_dominators(root, successors):
+    """
+    Computes the immediate dominator of every node reachable from the root.
+
+    Args:
+        root: The root node.
+        successors (callable): Returns the successors of a node.
+
+    Returns:
+        tuple: A dict mapping every reachable node (apart from the root) to its immediate
+               dominator, and a list of all reachable nodes in depth-first preorder.
+               Dominators always precede the nodes they dominate in this order.
+    """
+    # Number the nodes in depth-first preorder
+    order = [root]
+    index = {root: 0}
+    parent = [0]
+    predecessors = [[]]
+
+    stack = [(0, iter(successors(root)))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if child not in index:
+                index[child] = len(order)
+                order.append(child)
+                parent.append(node)
+                predecessors.append([node])
+                stack.append((index[child], iter(successors(child))))
+                break
+            predecessors[index[child]].append(node)
+        else:
+            stack.pop()
+
+    count = len(order)
+    semi = list(range(count))
+    idom = [0] * count
+    ancestor = [-1] * count
+    label = list(range(count))
+    bucket = [[] for _ in range(count)]
+
+    def compress(v):
+        # Walk up to the root of the forest, then compress the path top-down
+        path = []
+        while ancestor[ancestor[v]] != -1:
+            path.append(v)
+            v = ancestor[v]
+        for u in reversed(path):
+            a = ancestor[u]
+            if semi[label[a]] < semi[label[u]]:
+                label[u] = label[a]
+            ancestor[u] = ancestor[a]
+
+    def evaluate(v):
+        if ancestor[v] == -1:
+            return v
+        compress(v)
+        return label[v]
+
+    for w in range(count - 1, 0, -1):
+        # Semidominator
+        for v in predecessors[w]:
+            u = evaluate(v)
+            if semi[u] < semi[w]:
+                semi[w] = semi[u]
+        bucket[semi[w]].append(w)
+
+        p = parent[w]
+        ancestor[w] = p
+
+        # Implicitly define the immediate dominators of the bucket of the parent
+        for v in bucket[p]:
+            u = evaluate(v)
+            idom[v] = u if semi[u] < semi[v] else p
+        bucket[p] = []
+
+    for w in range(1, count):
+        if idom[w] != semi[w]:
+            idom[w] = idom[idom[w]]
+
+    return {order[w]: order[idom[w]] for w in range(1, count)}, order
+
+
+def retained_sizes(dominators, order, size):
+    """
+    Computes the retained size of every node, which is the total size of
+    the node and all nodes it dominates.
+
+    Args:
+        dominators (dict): The immediate dominators (See immediate_dominators).
+        order (list): The reachable nodes in depth-first preorder (See immediate_dominators).
+        size (callable): Returns the size of a node.
+
+    Returns:
+        dict: Maps every reachable node (apart from the root) to its retained size.
+    """
+    ret = {node: size(node) for node in order[1:]}
+    root = order[0] if order else None
+
+    # Dominated nodes always come after their dominators
+    for node in reversed(order[1:]):
+        dominator = dominators[node]
+        if dominator is not root:
+            ret[dominator] += ret[node]
+
+    return ret
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
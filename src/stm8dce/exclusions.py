@@ -0,0 +1,321 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides pattern based exclusion lists.
+
+An exclusion file contains one pattern per line, matching the functions and
+constants to exclude from dead code elimination. Empty lines and lines starting
+with '#' are ignored. Patterns are either:
+    _name               Exact symbol name
+    file.asm:_name      Exact symbol name in a specific file
+    _UART1_*            Glob (*, ? and [...]), optionally with a file part (stm8s_*.asm:_*_Init)
+    re:_TIM[1-4]_.*     Regular expression, matched against the whole symbol name
+
+All patterns are compiled once. Exact patterns are looked up in dictionaries
+and all glob and regex patterns are combined into a single regular expression,
+whose matching alternative identifies the pattern, so every symbol is matched in
+a single pass regardless of the number of patterns. A symbol matched by multiple
+glob or regex patterns is attributed to the first of them, later ones have no
+effect on it. To be combined, the leading inline flags of regular expressions
+(ex. (?i)) are scoped to them and their groups are renamed. Only expressions
+which can't be rewritten (verbose or conditional expressions, or inline flags
+that don't lead the expression) are matched one by one.
+"""
+
+import os
+import re
+import fnmatch
+
+############################################
+# Constants
+############################################
+
+REGEX_PREFIX = "re:"
+
+# Separates the file name from the symbol name in the matched keys
+_SEPARATOR = "\x00"
+
+# Inline flags applying to a whole regular expression
+_GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+
+# Backreference by number (\1 to \99), unless it is a three digit octal escape
+_NUMBERED_REFERENCE = re.compile(r"\\(?![0-7]{3})([1-9][0-9]?)")
+
+############################################
+# Classes
+############################################
+
+
+class ExclusionList:
+    """
+    Class to match functions and constants against a list of exclusion patterns.
+
+    Attributes:
+        patterns (tuple of str): The patterns of the list.
+    """
+
+    def __init__(self, patterns):
+        """
+        Initializes the ExclusionList and compiles its patterns.
+
+        Args:
+            patterns (iterable of str): The exclusion patterns.
+
+        Raises:
+            ValueError: If a regular expression is invalid.
+        """
+        self.patterns = tuple(patterns)
+        self._names = {}
+        self._qualified = {}
+        self._wildcards = []
+        self._separate = {}
+
+        for index, pattern in enumerate(self.patterns):
+            if pattern.startswith(REGEX_PREFIX):
+                regex = pattern[len(REGEX_PREFIX) :]
+                try:
+                    compiled = re.compile(regex)
+                except re.error as e:
+                    raise ValueError(
+                        f"Error: Invalid exclusion pattern {pattern}: {e}"
+                    ) from e
+                isolated = _isolate(regex, f"_{index}_")
+                if isolated is None:
+                    self._separate[index] = compiled
+                    continue
+                self._wildcards.append(
+                    (index, f"[^{_SEPARATOR}]*{_SEPARATOR}(?:{isolated})")
+                )
+                continue
+
+            filename, _, name = pattern.rpartition(":")
+
+            if any(char in pattern for char in "*?["):
+                file_regex = _glob(filename) if filename else f"[^{_SEPARATOR}]*"
+                self._wildcards.append(
+                    (index, f"{file_regex}{_SEPARATOR}{_glob(name)}")
+                )
+            elif filename:
+                self._qualified.setdefault((filename, name), []).append(index)
+            else:
+                self._names.setdefault(name, []).append(index)
+
+        # Each pattern is wrapped in a group, which maps back to the pattern's index
+        self._combined = None
+        self._groups = {}
+        if self._wildcards:
+            group = 1
+            try:
+                for index, regex in self._wildcards:
+                    self._groups[group] = index
+                    group += 1 + re.compile(regex).groups
+                self._combined = re.compile(
+                    "|".join(f"({regex})" for _, regex in self._wildcards)
+                )
+            except re.error as e:
+                raise ValueError(
+                    f"Error: Exclusion patterns can't be combined: {e}"
+                ) from e
+
+    def match(self, symbols):
+        """
+        Matches symbols against the patterns in a single pass.
+
+        Args:
+            symbols (iterable): Functions and/or constants to match.
+
+        Returns:
+            tuple: A list of the matching symbols and a list of the patterns that matched no symbol.
+        """
+        matched_patterns = set()
+        ret = []
+
+        for symbol in symbols:
+            filename = os.path.basename(symbol.path)
+            indexes = self._names.get(symbol.name, []) + self._qualified.get(
+                (filename, symbol.name), []
+            )
+
+            key = f"{filename}{_SEPARATOR}{symbol.name}"
+            wildcard = self._combined is not None and self._combined.fullmatch(key)
+            if wildcard:
+                # The group of the matching pattern is the last one to be closed
+                indexes.append(self._groups[wildcard.lastindex])
+
+            # Regexes that can't be combined only match the symbol name
+            separate = [
+                index
+                for index, regex in self._separate.items()
+                if regex.fullmatch(symbol.name)
+            ]
+
+            if indexes or separate:
+                matched_patterns.update(indexes + separate)
+                ret.append(symbol)
+
+        unmatched = [
+            pattern
+            for index, pattern in enumerate(self.patterns)
+            if index not in matched_patterns
+        ]
+
+        return ret, unmatched
+
+
+############################################
+# Helper functions
+############################################
+
+
+def _glob(pattern):
+    """
+    Translates a glob pattern into a regular expression (without anchors).
+
+    Args:
+        pattern (str): The glob pattern.
+
+    Returns:
+        str: The regular expression.
+    """
+    regex = fnmatch.translate(pattern)
+    return regex[: -len(r"\Z")] if regex.endswith(r"\Z") else regex
+
+
+def _isolate(regex, prefix):
+    """
+    Rewrites a regular expression so it can be combined with other ones. Leading
+    inline flags are scoped to the expression, and its groups are given names
+    starting with a unique prefix, which its backreferences refer to.
+
+    Args:
+        regex (str): The regular expression.
+        prefix (str): The prefix of the group names.
+
+    Returns:
+        str: The rewritten regular expression, or None if it can't be rewritten.
+    """
+    flags = ""
+    match = _GLOBAL_FLAGS.match(regex)
+    while match:
+        flags += match.group(1)
+        regex = regex[match.end() :]
+        match = _GLOBAL_FLAGS.match(regex)
+
+    # Comments of verbose expressions may contain anything
+    if "x" in flags:
+        return None
+
+    ret = []
+    names = {}
+    i = 0
+    while i < len(regex):
+        if regex[i] == "\\":
+            match = _NUMBERED_REFERENCE.match(regex, i)
+            if match:
+                number = int(match.group(1))
+                if number not in names:
+                    return None
+                ret.append(f"(?P={names[number]})")
+                i = match.end()
+            else:
+                ret.append(regex[i : i + 2])
+                i += 2
+        elif regex[i] == "[":
+            # Copy sets as is, a leading ] is part of the set
+            end = i + 1
+            if regex.startswith("^", end):
+                end += 1
+            if regex.startswith("]", end):
+                end += 1
+            while end < len(regex) and regex[end] != "]":
+                end += 2 if regex[end] == "\\" else 1
+            ret.append(regex[i : end + 1])
+            i = end + 1
+        elif regex.startswith("(?P<", i):
+            end = regex.index(">", i)
+            names[len(names) + 1] = prefix + regex[i + 4 : end]
+            ret.append(f"(?P<{names[len(names)]}>")
+            i = end + 1
+        elif regex.startswith("(?P=", i):
+            end = regex.index(")", i)
+            ret.append(f"(?P={prefix}{regex[i + 4 : end]})")
+            i = end + 1
+        elif _GLOBAL_FLAGS.match(regex, i):
+            # Inline flags that don't lead the expression would apply to all patterns
+            return None
+        elif regex.startswith("(?#", i):
+            end = regex.index(")", i)
+            ret.append(regex[i : end + 1])
+            i = end + 1
+        elif regex.startswith("(?(", i):
+            # Conditional on a group
+            return None
+        elif regex.startswith("(", i) and not regex.startswith("(?", i):
+            names[len(names) + 1] = f"{prefix}{len(names) + 1}"
+            ret.append(f"(?P<{names[len(names)]}>")
+            i += 1
+        else:
+            ret.append(regex[i])
+            i += 1
+
+    regex = "".join(ret)
+    return f"(?{flags}:{regex})" if flags else regex
+
+
+def load_exclude_file(path):
+    """
+    Loads the patterns of an exclusion file.
+
+    Args:
+        path (str): The path of the exclusion file.
+
+    Returns:
+        list: The patterns of the file.
+
+    Raises:
+        ValueError: If the file can't be read.
+    """
+    ret = []
+    try:
+        with open(path, "r") as file_obj:
+            for line in file_obj:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    ret.append(line)
+    except OSError as e:
+        raise ValueError(f"Error: Cannot read exclusion file {path}: {e}")
+    return ret
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,335 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module limits the number of parallel jobs of the tool.
+
+When run from a parallel GNU make build (ex. make -j8), the tool acts as a
+client of make's jobserver: Every job beyond the first one must acquire a
+token from the jobserver before it is started, and returns the token once
+it is done. This way, the tool never runs more jobs than make allows, even
+while other recipes are running at the same time.
+
+Both jobserver styles are supported:
+    --jobserver-auth=fifo:PATH  Named pipe (GNU make 4.4+)
+    --jobserver-auth=R,W        Inherited pipe file descriptors (older versions,
+                                also --jobserver-fds=R,W). Make only passes these
+                                to recipes marked as recursive (prefixed with '+').
+
+Tokens are read without blocking, so a token taken by another client between
+waiting for the pipe to become readable and reading it never blocks the tool.
+
+Outside of make, the number of jobs is limited by the --jobs option or
+the number of CPUs.
+"""
+
+import os
+import re
+import queue
+import select
+import threading
+import concurrent.futures
+
+############################################
+# Jobserver client
+############################################
+
+
+class JobServer:
+    """
+    Class to acquire and release tokens of a GNU make jobserver.
+
+    Attributes:
+        read_fd (int): The file descriptor to read tokens from.
+        write_fd (int): The file descriptor to write tokens to.
+        jobs (int): The job limit passed to make (-jN), None if unknown.
+    """
+
+    def __init__(self, read_fd, write_fd, jobs=None, owned=False):
+        """
+        Initializes the JobServer.
+
+        Args:
+            read_fd (int): The file descriptor to read tokens from.
+            write_fd (int): The file descriptor to write tokens to.
+            jobs (int, optional): The job limit passed to make (-jN).
+            owned (bool, optional): Whether the file descriptors were opened by
+                                    this object and are closed by close().
+        """
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.jobs = jobs
+        self._owned = owned
+
+    @staticmethod
+    def from_makeflags(makeflags=None):
+        """
+        Connects to the jobserver described by make's MAKEFLAGS.
+
+        Args:
+            makeflags (str, optional): The flags to parse (default: $MAKEFLAGS).
+
+        Returns:
+            JobServer: The connected jobserver, or None if no usable jobserver is available.
+        """
+        if makeflags is None:
+            makeflags = os.environ.get("MAKEFLAGS", "")
+
+        # Make passes its job limit along with the jobserver (ex. "-j8 --jobserver-auth=3,4")
+        jobs = None
+        match = re.search(r"(?:^|\s)-j(\d+)(?:\s|$)", makeflags)
+        if match:
+            jobs = int(match.group(1))
+
+        # If multiple are given, the last one is authoritative
+        auths = re.findall(r"--jobserver-(?:auth|fds)=(\S+)", makeflags)
+        if not auths:
+            return None
+        auth = auths[-1]
+
+        if auth.startswith("fifo:"):
+            path = auth[len("fifo:") :]
+            try:
+                read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                write_fd = os.open(path, os.O_WRONLY)
+            except OSError:
+                return None
+            return JobServer(read_fd, write_fd, jobs, owned=True)
+
+        match = re.fullmatch(r"(-?\d+),(-?\d+)", auth)
+        if not match:
+            return None
+        read_fd, write_fd = int(match.group(1)), int(match.group(2))
+
+        # Make closes the pipe for recipes that aren't marked as recursive
+        try:
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+        except OSError:
+            return None
+
+        # Reading a token another client took after select would block. The inherited
+        # descriptors are shared with make, so instead of making them non-blocking,
+        # the pipe is opened again (Linux only, elsewhere such reads wait for a token)
+        try:
+            own_read_fd = os.open(
+                f"/proc/self/fd/{read_fd}", os.O_RDONLY | os.O_NONBLOCK
+            )
+        except OSError:
+            return JobServer(read_fd, write_fd, jobs)
+        try:
+            own_write_fd = os.open(f"/proc/self/fd/{write_fd}", os.O_WRONLY)
+        except OSError:
+            os.close(own_read_fd)
+            return JobServer(read_fd, write_fd, jobs)
+        return JobServer(own_read_fd, own_write_fd, jobs, owned=True)
+
+    def acquire(self, timeout=None):
+        """
+        Acquires a token from the jobserver.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a token (default: wait forever).
+
+        Returns:
+            bytes: The acquired token, or None if no token became available in time.
+        """
+        readable, _, _ = select.select([self.read_fd], [], [], timeout)
+        if not readable:
+            return None
+        try:
+            token = os.read(self.read_fd, 1)
+        except BlockingIOError:
+            # Another client was faster
+            return None
+        return token or None
+
+    def release(self, token):
+        """
+        Returns a token to the jobserver.
+
+        Args:
+            token (bytes): The token to return.
+        """
+        os.write(self.write_fd, token)
+
+    def close(self):
+        """
+        Closes the file descriptors if they were opened by this object.
+        """
+        if self._owned:
+            os.close(self.read_fd)
+            os.close(self.write_fd)
+            self._owned = False
+
+
+class _LocalTokens:
+    """
+    Class providing the same interface as JobServer for a fixed job limit.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self._tokens = queue.Queue()
+        for _ in range(jobs - 1):
+            self._tokens.put(b"+")
+
+    def acquire(self, timeout=None):
+        try:
+            return self._tokens.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, token):
+        self._tokens.put(token)
+
+    def close(self):
+        pass
+
+
+############################################
+# Job slots
+############################################
+
+
+class JobSlots:
+    """
+    Class to run jobs in parallel, limited by make's jobserver or a fixed job limit.
+
+    The process itself implicitly holds one job slot, so the first job never
+    has to wait for a token.
+
+    Attributes:
+        jobs (int): The maximum number of parallel jobs.
+        jobserver (JobServer): The connected jobserver, None outside of make.
+    """
+
+    def __init__(self, jobs=None, makeflags=None):
+        """
+        Initializes the JobSlots.
+
+        Args:
+            jobs (int, optional): The maximum number of parallel jobs. When run from make,
+                                  make's job limit applies as well (default: make's job
+                                  limit, or the number of CPUs outside of make).
+            makeflags (str, optional): The make flags to look for a jobserver in (default: $MAKEFLAGS).
+        """
+        self.jobserver = JobServer.from_makeflags(makeflags)
+
+        # Within make, make's job limit replaces the number of CPUs as the default
+        limits = [jobs] if jobs is not None else []
+        if self.jobserver and self.jobserver.jobs:
+            limits.append(self.jobserver.jobs)
+        self.jobs = max(1, min(limits or [os.cpu_count() or 1]))
+
+        self._tokens = self.jobserver or _LocalTokens(self.jobs)
+        self._lock = threading.Lock()
+        self._implicit_free = True
+
+    def _acquire(self):
+        """
+        Blocks until a job slot is free.
+
+        Returns:
+            bytes: The acquired token, or None if the implicit slot was acquired.
+        """
+        while True:
+            with self._lock:
+                if self._implicit_free:
+                    self._implicit_free = False
+                    return None
+            # Poll, as the implicit slot may become free while waiting for a token
+            token = self._tokens.acquire(timeout=0.05)
+            if token is not None:
+                return token
+
+    def _release(self, token):
+        """
+        Frees a job slot.
+
+        Args:
+            token (bytes): The token to release, or None to free the implicit slot.
+        """
+        if token is None:
+            with self._lock:
+                self._implicit_free = True
+        else:
+            self._tokens.release(token)
+
+    def map(self, function, items, processes=False):
+        """
+        Calls a function for every item in parallel, holding a job slot per call.
+
+        Args:
+            function (callable): The function to call. Must be picklable if processes is True.
+            items (iterable): The items to call the function with.
+            processes (bool, optional): Run the calls in worker processes instead of threads.
+
+        Returns:
+            list: The results of the calls, in the order of the items.
+
+        Raises:
+            Exception: The first exception raised by any of the calls.
+        """
+        items = list(items)
+        if self.jobs <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+
+        executor_class = (
+            concurrent.futures.ProcessPoolExecutor
+            if processes
+            else concurrent.futures.ThreadPoolExecutor
+        )
+
+        futures = []
+        with executor_class(max_workers=min(self.jobs, len(items))) as executor:
+            for item in items:
+                token = self._acquire()
+                try:
+                    future = executor.submit(function, item)
+                except BaseException:
+                    self._release(token)
+                    raise
+                future.add_done_callback(lambda _, token=token: self._release(token))
+                futures.append(future)
+
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Disconnects from the jobserver.
+        """
+        self._tokens.close()
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,122 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides helper functions to load and validate JSON and TOML
+manifests (See variants and batch).
+"""
+
+import json
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+############################################
+# Helper functions
+############################################
+
+
+def load_manifest(manifest_path, key):
+    """
+    Loads a JSON or TOML (Python 3.11+) manifest holding a list of entries.
+
+    Args:
+        manifest_path (str): The path to the manifest. Files ending in .toml are loaded as TOML.
+        key (str): The key of the list of entries (ex. "variants").
+
+    Returns:
+        list: The entries (dicts) of the manifest.
+
+    Raises:
+        ValueError: If the manifest can't be read or is malformed.
+    """
+    if manifest_path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError(
+                f"Error: TOML manifests require Python 3.11 or newer: {manifest_path}"
+            )
+        try:
+            with open(manifest_path, "rb") as file_obj:
+                data = tomllib.load(file_obj)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"Error: Malformed manifest {manifest_path}: {e}")
+        except OSError as e:
+            raise ValueError(f"Error: Cannot read manifest {manifest_path}: {e}")
+    else:
+        try:
+            with open(manifest_path, "r") as file_obj:
+                data = json.load(file_obj)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error: Malformed manifest {manifest_path}: {e}")
+        except OSError as e:
+            raise ValueError(f"Error: Cannot read manifest {manifest_path}: {e}")
+
+    if not isinstance(data, dict) or not isinstance(data.get(key), list):
+        raise ValueError(f"Error: Manifest has no list of {key}: {manifest_path}")
+
+    for entry in data[key]:
+        if not isinstance(entry, dict):
+            raise ValueError(f"Error: Malformed entry in {key} of {manifest_path}")
+
+    return data[key]
+
+
+def string_list(entry, key, name):
+    """
+    Returns an optional list of strings of a manifest entry.
+
+    Args:
+        entry (dict): The manifest entry.
+        key (str): The key of the list.
+        name (str): The name of the entry (for error messages).
+
+    Returns:
+        list: The list of strings, or None if the entry has no such key.
+
+    Raises:
+        ValueError: If the value is not a list of strings.
+    """
+    value = entry.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"Error: '{key}' of {name} must be a list of strings")
+    return value
+
+
+def check_unique_names(entries, manifest_path, required):
+    """
+    Checks that all manifest entries provide the required keys and have unique names.
+
+    Args:
+        entries (list): The manifest entries.
+        manifest_path (str): The path to the manifest (for error messages).
+        required (list of str): The required keys, including "name".
+
+    Raises:
+        ValueError: If a required key is missing or a name is used more than once.
+    """
+    names = set()
+    for entry in entries:
+        for key in required:
+            if key not in entry:
+                raise ValueError(
+                    f"Error: Entry without '{key}' in manifest {manifest_path}"
+                )
+        if entry["name"] in names:
+            raise ValueError(f"Error: Duplicate name in manifest: {entry['name']}")
+        names.add(entry["name"])
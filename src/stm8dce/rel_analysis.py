@@ -80,6 +80,23 @@ class Module:
         for ref in self.references:
             print(f"\t{ref}")
 
+    def copy(self, path=None):
+        """
+        Returns a copy of the module with the same name and symbols,
+        but without any resolved references.
+
+        Args:
+            path (str, optional): The file path of the copy (default: path of this module).
+
+        Returns:
+            Module: The copied module.
+        """
+        ret = Module(path or self.path, self.line_number)
+        ret.name = self.name
+        ret.referenced_symbols = list(self.referenced_symbols)
+        ret.defined_symbols = list(self.defined_symbols)
+        return ret
+
     def set_name(self, name):
         """
         Sets the name of the module.
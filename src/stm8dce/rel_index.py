@@ -0,0 +1,306 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides functions to create and load prebuilt symbol indexes
+(.dceidx files) of .rel and .lib files.
+
+An index stores the modules of a .rel or .lib file along with their defined and
+referenced symbols, so that libraries which rarely change (ex. SDCC's stm8.lib)
+don't have to be parsed again on every run.
+
+Index file layout (all integers are little endian):
+    magic       6 bytes "DCEIDX"
+    version     u16
+    source_hash 32 bytes (SHA-256 of the indexed file)
+    source      str (path of the indexed file, relative to the index file)
+    strings     u32 count, followed by count strs
+    modules     u32 count, followed by count modules
+
+    str         u16 length, followed by length bytes of UTF-8
+    module      u32 line number, u32 name string,
+                u32 defined symbol count, followed by count symbols,
+                u32 referenced symbol count, followed by count symbols
+    symbol      u32 name string, u32 offset, u32 line number
+
+Strings are stored once in the string table and referenced by their index.
+"""
+
+import os
+import struct
+import hashlib
+
+from . import debug
+from . import rel_analysis
+from .rel_matchers import SymbolLine
+from .rel_parser import RELParser
+
+############################################
+# Constants
+############################################
+
+INDEX_EXTENSION = ".dceidx"
+INDEX_MAGIC = b"DCEIDX"
+INDEX_VERSION = 1
+
+############################################
+# Helper functions
+############################################
+
+
+def file_hash(file_path):
+    """
+    Calculates the SHA-256 hash of a file.
+
+    Args:
+        file_path (str): The path of the file to hash.
+
+    Returns:
+        bytes: The SHA-256 digest of the file.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(1 << 16), b""):
+            sha.update(chunk)
+    return sha.digest()
+
+
+class _Reader:
+    """
+    Helper class to sequentially unpack values from an index buffer.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def u32(self):
+        return self.unpack("<I")[0]
+
+    def bytes(self, length):
+        if self.pos + length > len(self.data):
+            raise ValueError("Unexpected end of index data")
+        ret = self.data[self.pos : self.pos + length]
+        self.pos += length
+        return ret
+
+    def str(self):
+        (length,) = self.unpack("<H")
+        return self.bytes(length).decode("utf-8")
+
+
+def _pack_str(string):
+    encoded = string.encode("utf-8")
+    return struct.pack("<H", len(encoded)) + encoded
+
+
+############################################
+# Classes
+############################################
+
+
+class RELIndex:
+    """
+    Class to load a prebuilt .dceidx index of a .rel or .lib file.
+
+    Attributes:
+        index_path (str): The path to the index file.
+        source_path (str): The path to the indexed .rel or .lib file.
+        source_hash (bytes): The SHA-256 hash of the indexed file at the time of indexing.
+        modules (list): A list of Module objects stored in the index.
+    """
+
+    def __init__(self, index_path):
+        """
+        Initializes the RELIndex with a file path and loads the index.
+
+        Args:
+            index_path (str): The path to the .dceidx file to be loaded.
+
+        Raises:
+            ValueError: If the file is not a valid index or has an unsupported version.
+        """
+        self.index_path = index_path
+        self.source_path = None
+        self.source_hash = None
+        self.modules = []
+
+        debug.pdbg()
+        debug.pdbg(f"Loading index: {index_path}")
+        debug.pseperator()
+
+        with open(index_path, "rb") as file_obj:
+            self._load(file_obj.read())
+
+    def _load(self, data):
+        """
+        Unpacks the index data and rebuilds its modules.
+
+        Args:
+            data (bytes): The raw contents of the index file.
+        """
+        reader = _Reader(data)
+
+        try:
+            if reader.bytes(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"Error: Not a stm8dce index file: {self.index_path}")
+
+            (version,) = reader.unpack("<H")
+            if version != INDEX_VERSION:
+                raise ValueError(
+                    f"Error: Unsupported index version {version} in {self.index_path} (expected {INDEX_VERSION})"
+                )
+
+            self.source_hash = reader.bytes(32)
+            self.source_path = os.path.join(
+                os.path.dirname(self.index_path), reader.str()
+            )
+
+            strings = [reader.str() for _ in range(reader.u32())]
+
+            for _ in range(reader.u32()):
+                line_number = reader.u32()
+                module = rel_analysis.Module(self.source_path, line_number)
+                module.set_name(strings[reader.u32()])
+
+                for _ in range(reader.u32()):
+                    module.add_defined_symbol(self._symbol(reader, strings, "Def"))
+                for _ in range(reader.u32()):
+                    module.add_referenced_symbol(self._symbol(reader, strings, "Ref"))
+
+                debug.pdbg(
+                    f"Module {module.name}: {len(module.defined_symbols)} defined, {len(module.referenced_symbols)} referenced symbols"
+                )
+                self.modules.append(module)
+        except (struct.error, IndexError, UnicodeDecodeError):
+            raise ValueError(f"Error: Corrupt index file: {self.index_path}")
+
+    def _symbol(self, reader, strings, type_):
+        """
+        Unpacks a symbol and recreates its SymbolLine.
+
+        Args:
+            reader (_Reader): The reader positioned at the symbol.
+            strings (list): The string table of the index.
+            type_ (str): The symbol type ("Def" or "Ref").
+
+        Returns:
+            SymbolLine: The recreated symbol line.
+        """
+        name, offset, line_number = reader.unpack("<III")
+        return SymbolLine(
+            self.source_path,
+            line_number,
+            f"S {strings[name]} {type_}{offset:06X}",
+        )
+
+    def is_stale(self, hash_function=file_hash):
+        """
+        Checks if the indexed file has changed since the index was created.
+        An index whose source file no longer exists is not considered stale,
+        allowing indexes to be used in place of their source files.
+
+        Args:
+            hash_function (callable, optional): Function used to hash the indexed file (See file_hash).
+
+        Returns:
+            bool: True if the indexed file exists and its hash differs, False otherwise.
+        """
+        if not os.path.exists(self.source_path):
+            return False
+        return hash_function(self.source_path) != self.source_hash
+
+
+############################################
+# Index creation
+############################################
+
+
+def write_index(file_path, index_path):
+    """
+    Parses a .rel or .lib file and writes its modules into an index file.
+
+    Args:
+        file_path (str): The path to the .rel or .lib file to be indexed.
+        index_path (str): The path of the index file to be written.
+
+    Returns:
+        list: The indexed Module objects.
+    """
+    modules = RELParser(file_path).modules
+
+    strings = []
+    string_ids = {}
+
+    def string_id(string):
+        if string not in string_ids:
+            string_ids[string] = len(strings)
+            strings.append(string)
+        return string_ids[string]
+
+    def pack_symbols(symbols):
+        return struct.pack("<I", len(symbols)) + b"".join(
+            struct.pack(
+                "<III", string_id(symbol.name), symbol.offset, symbol.line_number
+            )
+            for symbol in symbols
+        )
+
+    body = struct.pack("<I", len(modules))
+    for module in modules:
+        body += struct.pack("<II", module.line_number, string_id(module.name))
+        body += pack_symbols(module.defined_symbols)
+        body += pack_symbols(module.referenced_symbols)
+
+    source = os.path.relpath(
+        os.path.abspath(file_path), os.path.dirname(os.path.abspath(index_path))
+    )
+
+    with open(index_path, "wb") as file_obj:
+        file_obj.write(INDEX_MAGIC)
+        file_obj.write(struct.pack("<H", INDEX_VERSION))
+        file_obj.write(file_hash(file_path))
+        file_obj.write(_pack_str(source))
+        file_obj.write(struct.pack("<I", len(strings)))
+        file_obj.write(b"".join(_pack_str(string) for string in strings))
+        file_obj.write(body)
+
+    return modules
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -17,6 +17,8 @@
 This module provides functions to parse .rel and .lib files.
 """
 
+import io
+
 from . import rel_analysis
 from . import debug
 from .rel_matchers import *
@@ -34,12 +36,14 @@ class RELParser:
         modules (list): A list of Module objects parsed from the file.
     """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, content=None):
         """
         Initializes the RELParser with a file path and parses the file.
 
         Args:
             file_path (str): The path to the .rel or .lib file to be parsed.
+            content (str, optional): The content of the file. If provided, the file isn't read
+                                     and file_path is only used to refer to it (ex. archive members).
         """
         self.modules = []
 
@@ -47,8 +51,11 @@ class RELParser:
         debug.pdbg(f"Parsing file: {file_path}")
         debug.pseperator()
 
-        with open(file_path, "r", errors="replace") as file_obj:
-            self._parse(file_obj, file_path)
+        if content is None:
+            with open(file_path, "r", errors="replace") as file_obj:
+                self._parse(file_obj, file_path)
+        else:
+            self._parse(io.StringIO(content, newline=None), file_path)
 
     def _parse(self, file_obj, file_path):
         """
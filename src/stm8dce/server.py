@@ -0,0 +1,300 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides a long-running DCE server and a client to send requests to it.
+
+The server listens on a Unix domain socket and keeps parsed input files in memory
+(See cache.ParseCache), so that consecutive builds only pay for parsing the files
+that changed since the last request.
+
+Protocol:
+    The client sends a single JSON object terminated by a newline:
+        {"argv": [...], "cwd": "..."}   Run DCE with the given command-line arguments
+                                        (same as the main command) in the given directory
+        {"command": "shutdown"}         Stop the server
+    The server answers with a single JSON object terminated by a newline and closes the connection:
+        {"status": <exit status>, "output": "<captured stdout and stderr>"}
+    Requests are limited to MAX_REQUEST_SIZE bytes.
+"""
+
+import os
+import io
+import json
+import socket
+import asyncio
+import tempfile
+import contextlib
+
+from .cache import ParseCache
+
+############################################
+# Constants
+############################################
+
+# Maximum size of a request, which must fit the input paths of large projects
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+############################################
+# Helper functions
+############################################
+
+
+def _is_listening(socket_path):
+    """
+    Checks if a server is listening on a Unix domain socket.
+
+    Args:
+        socket_path (str): The path of the socket.
+
+    Returns:
+        bool: True if a connection to the socket succeeds, False otherwise.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def default_socket_path():
+    """
+    Returns the default socket path of the server.
+
+    Returns:
+        str: The default socket path (unique per user).
+    """
+    return os.path.join(tempfile.gettempdir(), f"stm8dce-{os.getuid()}.sock")
+
+
+############################################
+# Server
+############################################
+
+
+class DCEServer:
+    """
+    Class to serve DCE requests on a Unix domain socket.
+
+    Attributes:
+        socket_path (str): The path of the Unix domain socket.
+        handler (callable): Function called as handler(argv, cache) to process a request.
+        cache (ParseCache): The cache of parsed input files shared by all requests.
+    """
+
+    def __init__(self, socket_path, handler):
+        """
+        Initializes the DCEServer.
+
+        Args:
+            socket_path (str): The path of the Unix domain socket.
+            handler (callable): Function called as handler(argv, cache) to process a request.
+                                Its output is captured and returned to the client.
+        """
+        self.socket_path = socket_path
+        self.handler = handler
+        self.cache = ParseCache()
+        self._lock = None
+        self._stop = None
+
+    def _process(self, request):
+        """
+        Processes a single DCE request.
+        Runs in a worker thread, but never concurrently with another request.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The response.
+        """
+        output = io.StringIO()
+        status = 0
+        cwd = os.getcwd()
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                os.chdir(request.get("cwd", cwd))
+                self.handler(request["argv"], self.cache)
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 1
+                if isinstance(e.code, str):
+                    print(e.code)
+            except Exception as e:
+                status = 1
+                print(e)
+            finally:
+                os.chdir(cwd)
+
+        return {"status": status, "output": output.getvalue()}
+
+    async def _handle(self, reader, writer):
+        """
+        Handles a client connection.
+
+        Args:
+            reader (asyncio.StreamReader): The stream to read the request from.
+            writer (asyncio.StreamWriter): The stream to write the response to.
+        """
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # Raised by the stream if the request exceeds its limit
+            line = None
+
+        # Connections closed without a request (ex. by _is_listening) need no response
+        if line == b"":
+            writer.close()
+            return
+
+        try:
+            request = json.loads(line) if line is not None else None
+        except ValueError:
+            request = None
+
+        if line is None:
+            response = {
+                "status": 1,
+                "output": f"Error: Request too large (limit: {MAX_REQUEST_SIZE} bytes)\n",
+            }
+        elif not isinstance(request, dict):
+            response = {"status": 1, "output": "Error: Malformed request\n"}
+        elif request.get("command") == "shutdown":
+            response = {"status": 0, "output": "Server stopped\n"}
+            self._stop.set()
+        else:
+            async with self._lock:
+                response = await asyncio.get_event_loop().run_in_executor(
+                    None, self._process, request
+                )
+
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+
+    async def serve(self):
+        """
+        Serves requests until a shutdown request is received.
+
+        Raises:
+            ValueError: If another server is already listening on the socket.
+        """
+        self._lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+
+        # Only replace stale sockets, never the socket of a running server
+        if os.path.exists(self.socket_path):
+            if _is_listening(self.socket_path):
+                raise ValueError(
+                    f"Error: An stm8dce server is already listening on {self.socket_path}"
+                )
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(
+            self._handle, path=self.socket_path, limit=MAX_REQUEST_SIZE
+        )
+        inode = os.stat(self.socket_path).st_ino
+        print(f"Listening on {self.socket_path}")
+
+        try:
+            await self._stop.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            # The socket may have been replaced by another server in the meantime
+            with contextlib.suppress(OSError):
+                if os.stat(self.socket_path).st_ino == inode:
+                    os.unlink(self.socket_path)
+
+
+def serve(socket_path, handler):
+    """
+    Runs a DCE server until it is shut down or interrupted.
+
+    Args:
+        socket_path (str): The path of the Unix domain socket.
+        handler (callable): Function called as handler(argv, cache) to process a request.
+    """
+    server = DCEServer(socket_path, handler)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+############################################
+# Client
+############################################
+
+
+def request(socket_path, request):
+    """
+    Sends a request to a running DCE server and waits for its response.
+
+    Args:
+        socket_path (str): The path of the server's Unix domain socket.
+        request (dict): The request to send.
+
+    Returns:
+        dict: The response of the server.
+
+    Raises:
+        ConnectionError: If no server is listening on the socket, or it closed the
+                         connection without responding.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(f"No stm8dce server listening on {socket_path}") from e
+
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The server stopped reading (ex. request too large), its response tells why
+            pass
+
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(1 << 16)
+            if not chunk:
+                break
+            data += chunk
+
+    if not data:
+        raise ConnectionError(f"stm8dce server on {socket_path} closed the connection")
+    return json.loads(data)
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
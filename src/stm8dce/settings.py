@@ -14,11 +14,192 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 """
-This module contains global settings for the STM8DCE tool
+This module contains the settings of the STM8DCE tool.
+
+Settings are stored in immutable Options objects, which are passed explicitly
+to the parsers, resolvers and the rewrite stage. This allows multiple analyses
+with different settings to run concurrently within the same process.
+
+Debug output is the only exception: Instead of passing the options to every
+debug print, the options of the current run are stored in a context variable
+(See use), which is local to each thread and asyncio task.
 """
 
-verbose = False
-debug = False
-opt_irq = False
-codeseg = "CODE"
-constseg = "CONST"
+import contextlib
+import contextvars
+
+############################################
+# Classes
+############################################
+
+
+class Options:
+    """
+    Class to store the options of a dead code analysis. Options are immutable,
+    use replace() to derive options with different values.
+
+    Attributes:
+        entry_label (str): Entry label (default: "_main").
+        exclude_functions (tuple of str): Function labels to exclude from dead code elimination.
+        exclude_constants (tuple of str): Constant labels to exclude from dead code elimination.
+        codeseg (str): Name of the code segment (default: "CODE").
+        constseg (str): Name of the constant segment (default: "CONST").
+        opt_irq (bool): Remove unused IRQ handlers (Caution: Removes iret's for unused interrupts!).
+        verbose (bool): Enable verbose output.
+        debug (bool): Enable debug output.
+        exclude_patterns (tuple of str): Patterns matching functions and constants to exclude
+                                         from dead code elimination (See exclusions).
+        opt_fold (bool): Fold kept functions with identical code into a single copy.
+        opt_pool (bool): Pool kept constants with identical data into a single definition.
+        opt_blocks (bool): Remove code of kept functions that is unreachable from their entry.
+        opt_trampolines (bool): Redirect references to functions that only jump to another function.
+        opt_calls (bool): Remove calls to functions that only return, along with these functions.
+    """
+
+    __slots__ = (
+        "entry_label",
+        "exclude_functions",
+        "exclude_constants",
+        "codeseg",
+        "constseg",
+        "opt_irq",
+        "verbose",
+        "debug",
+        "exclude_patterns",
+        "opt_fold",
+        "opt_pool",
+        "opt_blocks",
+        "opt_trampolines",
+        "opt_calls",
+    )
+
+    def __init__(
+        self,
+        entry_label="_main",
+        exclude_functions=None,
+        exclude_constants=None,
+        codeseg="CODE",
+        constseg="CONST",
+        opt_irq=False,
+        verbose=False,
+        debug=False,
+        exclude_patterns=None,
+        opt_fold=False,
+        opt_pool=False,
+        opt_blocks=False,
+        opt_trampolines=False,
+        opt_calls=False,
+    ):
+        values = {
+            "entry_label": entry_label,
+            "exclude_functions": tuple(exclude_functions or ()),
+            "exclude_constants": tuple(exclude_constants or ()),
+            "codeseg": codeseg,
+            "constseg": constseg,
+            "opt_irq": opt_irq,
+            "verbose": verbose or debug,
+            "debug": debug,
+            "exclude_patterns": tuple(exclude_patterns or ()),
+            "opt_fold": opt_fold,
+            "opt_pool": opt_pool,
+            "opt_blocks": opt_blocks,
+            "opt_trampolines": opt_trampolines,
+            "opt_calls": opt_calls,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Options are immutable, use replace() to change {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Options are immutable, cannot delete {name}")
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, Options) and self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __reduce__(self):
+        # Allows passing options to worker processes
+        return (Options, self._values())
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"Options({values})"
+
+    def replace(self, **changes):
+        """
+        Returns a copy of the options with the given values replaced.
+
+        Args:
+            **changes: The values to replace.
+
+        Returns:
+            Options: The new options.
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return Options(**values)
+
+
+############################################
+# Current options
+############################################
+
+DEFAULT = Options()
+
+_current = contextvars.ContextVar("stm8dce_options", default=DEFAULT)
+
+
+def current():
+    """
+    Returns the options of the current run (See use).
+
+    Returns:
+        Options: The current options, or the default options outside of a run.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use(options):
+    """
+    Context manager to set the options of the current run within
+    the current thread or asyncio task.
+
+    Args:
+        options (Options): The options of the run.
+    """
+    token = _current.set(options)
+    try:
+        yield options
+    finally:
+        _current.reset(token)
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
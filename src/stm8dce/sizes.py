@@ -0,0 +1,361 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module estimates the flash size of STM8 instructions and data directives.
+
+An instruction consists of an optional prefix byte, the opcode and the bytes of its
+operand. The prefix selects the Y register instead of X (0x90), short pointer
+indirect addressing (0x92, or 0x91 when indexed by Y) and long pointer indirect
+addressing (0x72), which is also used by some long addressing modes.
+
+Addresses of relocatable symbols are unknown at this point, so memory operands
+referring to labels are assumed to use long (16-bit) addressing, which is what
+the assembler does for relocatable symbols. Numeric addresses up to 0xFF use
+short addressing.
+"""
+
+from .asm_matchers import Directive, Instruction
+
+############################################
+# Constants
+############################################
+
+# Instructions whose size doesn't depend on their operands
+_FIXED_SIZES = {
+    "btjt": 5,  # 72 op longmem rel
+    "btjf": 5,
+    "bset": 4,  # 72 op longmem
+    "bres": 4,
+    "bcpl": 4,  # 90 op longmem
+    "bccm": 4,
+    "int": 4,  # 82 extmem
+    "callf": 4,  # op extmem, 92 op [longptr.e]
+    "jpf": 4,
+    "callr": 2,
+    "wfe": 2,  # 72 8F
+}
+
+# Relative jumps requiring a 0x90 prefix
+_PREFIXED_JUMPS = {"jrh", "jrnh", "jril", "jrih", "jrm", "jrnm"}
+
+# Register only instructions that operate on Y without a prefix
+_UNPREFIXED_REGISTER_FORMS = {
+    ("ldw", ("x", "y")),
+    ("exgw", ("x", "y")),
+    ("exg", ("a", "yl")),
+    ("divw", ("x", "y")),
+}
+
+# Instructions with 16-bit immediate operands
+_WORD_IMMEDIATE = {"ldw", "addw", "subw", "cpw"}
+
+# Read-modify-write instructions, which require a 0x72 prefix for long addressing
+_READ_MODIFY_WRITE = {
+    "clr",
+    "inc",
+    "dec",
+    "neg",
+    "cpl",
+    "tnz",
+    "sll",
+    "sla",
+    "sra",
+    "srl",
+    "rlc",
+    "rrc",
+    "swap",
+}
+
+_Y_REGISTERS = ("y", "yl", "yh")
+
+_BYTE_DIRECTIVES = (".db", ".byte", ".fcb")
+_WORD_DIRECTIVES = (".dw", ".word", ".fdb")
+_STRING_DIRECTIVES = {".ascii": 0, ".str": 0, ".fcc": 0, ".asciz": 1, ".strz": 1}
+_SPACE_DIRECTIVES = {".ds": 1, ".blkb": 1, ".rmb": 1, ".blkw": 2}
+
+############################################
+# Helper functions
+############################################
+
+
+def _value(expr):
+    """
+    Evaluates a numeric expression.
+
+    Args:
+        expr (str): The expression (ex. 0x10).
+
+    Returns:
+        int: The value, or None if the expression isn't a plain number (ex. a label).
+    """
+    try:
+        return int(expr, 0)
+    except ValueError:
+        return None
+
+
+def _short(expr):
+    """
+    Checks if an address or offset fits into a single byte.
+
+    Args:
+        expr (str): The address or offset expression.
+
+    Returns:
+        bool: True if the expression is a number up to 0xFF, False otherwise.
+    """
+    if expr.endswith((".w", ".e")):
+        expr = expr[:-2]
+    value = _value(expr)
+    return value is not None and 0 <= value <= 0xFF
+
+
+def _operand(arg, word):
+    """
+    Returns the encoding of a memory or immediate operand.
+
+    Args:
+        arg (str): The operand, without whitespace.
+        word (bool): Whether immediate operands are 16-bit wide.
+
+    Returns:
+        tuple: The number of prefix bytes the addressing mode requires, the number
+               of operand bytes and the index register (None if not indexed).
+    """
+    if arg.startswith("#"):
+        # Low or high byte of an address
+        if arg[1:2] in ("<", ">"):
+            return 0, 1, None
+        return 0, 2 if word else 1, None
+
+    # ([ptr],X) and ([ptr],Y)
+    if arg.startswith("(["):
+        pointer, _, index = arg[2:].rstrip(")").partition("],")
+        return 1, 1 if _short(pointer) else 2, index or None
+
+    # [ptr]
+    if arg.startswith("["):
+        return 1, 1 if _short(arg[1:].rstrip("]")) else 2, None
+
+    if arg.startswith("(") and arg.endswith(")"):
+        inner = arg[1:-1]
+        if inner in ("x", "y"):
+            return 0, 0, inner
+        if "," in inner:
+            offset, _, index = inner.rpartition(",")
+            if index == "sp":
+                return 0, 1, index
+            return 0, 1 if _short(offset) else 2, index
+        arg = inner
+
+    return 0, 1 if _short(arg) else 2, None
+
+
+def _items(value):
+    """
+    Splits the operands of a data directive on commas outside of quotes.
+
+    Args:
+        value (str): The operands of the directive.
+
+    Returns:
+        list: The stripped operands.
+    """
+    ret = []
+    current = ""
+    quote = None
+    for char in value:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ",":
+            ret.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        ret.append(current.strip())
+    return ret
+
+
+def _string_length(value):
+    """
+    Returns the number of bytes of a delimited string (ex. "Hello").
+
+    Args:
+        value (str): The delimited string.
+
+    Returns:
+        int: The number of bytes, counting escape sequences as one byte.
+    """
+    value = value.strip()
+    if len(value) < 2:
+        return 0
+    end = value.rfind(value[0])
+    string = value[1:end] if end > 0 else ""
+
+    ret = 0
+    i = 0
+    while i < len(string):
+        # Escape sequences (ex. \n) are a single byte
+        i += 2 if string[i] == "\\" else 1
+        ret += 1
+    return ret
+
+
+############################################
+# Size estimation
+############################################
+
+
+def instruction_size(instruction):
+    """
+    Estimates the size of an instruction.
+
+    Args:
+        instruction (Instruction): The instruction.
+
+    Returns:
+        int: The size of the instruction in bytes.
+    """
+    mnemonic = instruction.mnemonic.lower()
+    args = [arg.replace(" ", "").replace("\t", "").lower() for arg in instruction.args]
+
+    if mnemonic in _FIXED_SIZES:
+        return _FIXED_SIZES[mnemonic]
+
+    if mnemonic.startswith("jr"):
+        return 3 if mnemonic in _PREFIXED_JUMPS else 2
+
+    if mnemonic == "mov":
+        # mov longmem,#byte / mov shortmem,shortmem / mov longmem,longmem
+        if len(args) == 2 and args[1].startswith("#"):
+            return 4
+        if len(args) == 2 and _short(args[0]) and _short(args[1]):
+            return 3
+        return 5
+
+    if mnemonic == "ldf":
+        # 0x90 prefix for (extoff,Y), else opcode and 24-bit address or 16-bit pointer
+        indexed_y = any(
+            arg.endswith(",y)") and not arg.startswith("([") for arg in args
+        )
+        return 5 if indexed_y else 4
+
+    if (mnemonic, tuple(args)) in _UNPREFIXED_REGISTER_FORMS:
+        return 1
+
+    registers = [arg for arg in args if arg in Instruction._REGISTER_ARGS]
+    memory = [arg for arg in args if arg not in registers]
+    uses_y = any(register in _Y_REGISTERS for register in registers)
+
+    # Inherent and register only addressing
+    if not memory:
+        return 2 if uses_y else 1
+
+    prefix, length, index = _operand(memory[0], mnemonic in _WORD_IMMEDIATE)
+
+    if mnemonic in ("addw", "subw"):
+        # addw sp,#byte / addw x,#word / 72 op for everything else
+        if "sp" in registers:
+            return 2
+        if memory[0].startswith("#") and not uses_y:
+            return 3
+        return 2 + length
+
+    if not prefix:
+        if index == "y":
+            prefix = 1
+        elif index is None and uses_y:
+            prefix = 1
+        elif (
+            mnemonic in _READ_MODIFY_WRITE and length == 2 and index in (None, "x")
+        ):
+            prefix = 1
+
+    return prefix + 1 + length
+
+
+def directive_size(directive):
+    """
+    Estimates the size of the data emitted by a directive.
+
+    Args:
+        directive (Directive): The directive.
+
+    Returns:
+        int: The size of the data in bytes (0 for directives that emit no data).
+    """
+    split = directive.line.split(None, 1)
+    name = split[0].lower()
+    value = split[1] if len(split) == 2 else ""
+
+    if name in _BYTE_DIRECTIVES:
+        return sum(
+            _string_length(item) if item[:1] in "\"'" else 1 for item in _items(value)
+        )
+
+    if name in _WORD_DIRECTIVES:
+        return 2 * len(_items(value))
+
+    if name in _STRING_DIRECTIVES:
+        return _string_length(value) + _STRING_DIRECTIVES[name]
+
+    if name in _SPACE_DIRECTIVES:
+        count = _value(value.strip().lstrip("#")) or 0
+        return count * _SPACE_DIRECTIVES[name]
+
+    return 0
+
+
+def size(eval):
+    """
+    Estimates the size of a matched assembly line (See asm_matchers.match_asm_line).
+
+    Args:
+        eval: The matched Directive, Label or Instruction.
+
+    Returns:
+        int: The size in bytes (0 for labels).
+    """
+    if isinstance(eval, Instruction):
+        return instruction_size(eval)
+    if isinstance(eval, Directive):
+        return directive_size(eval)
+    return 0
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,156 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module computes the worst-case stack depth over call graphs.
+
+The stack depth of a function is the largest of its own frame and the stack in
+use at each of its calls plus the depth of the called function. Functions that
+are part of a cycle (recursion) or that can reach one have an unbounded depth.
+
+Cycles are found with Tarjan's algorithm, which yields the strongly connected
+components of the graph in reverse topological order. The depths are then computed
+over this condensation of the graph in a single pass, visiting every function and
+call once. All steps are iterative, so deep call chains don't exceed Python's
+recursion limit.
+"""
+
+############################################
+# Strongly connected components
+############################################
+
+
+def strongly_connected_components(nodes, successors):
+    """
+    Computes the strongly connected components of a directed graph.
+
+    Args:
+        nodes (iterable): The nodes of the graph.
+        successors (callable): Returns the successors of a node.
+
+    Returns:
+        list: The components as lists of nodes, in reverse topological order
+              (components only reach components that precede them).
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    ret = []
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    ret.append(component)
+
+    return ret
+
+
+############################################
+# Stack depth
+############################################
+
+
+def worst_case_depths(nodes, calls, frame):
+    """
+    Computes the worst-case stack depth of every node of a call graph.
+
+    Args:
+        nodes (iterable): The nodes (functions) of the graph.
+        calls (callable): Returns (node, stack usage) tuples of the calls of a node to other
+                          nodes of the graph, where the stack usage is the stack in use
+                          when the called node is entered.
+        frame (callable): Returns the frame size of a node.
+
+    Returns:
+        tuple: A dict mapping each node to its worst-case stack depth (None if unbounded),
+               and a dict mapping each node to the node it calls on its deepest path
+               (None if the deepest path doesn't call any node).
+    """
+    depths = {}
+    deepest = {}
+
+    def successors(node):
+        return [target for target, _ in calls(node)]
+
+    for component in strongly_connected_components(nodes, successors):
+        # Every function of a cycle calls another function of it (or itself)
+        members = set(component)
+
+        for node in component:
+            depth = frame(node)
+            deepest[node] = None
+            for target, usage in calls(node):
+                if target in members or depths[target] is None:
+                    depth = None
+                    deepest[node] = target
+                    break
+                if usage + depths[target] > depth:
+                    depth = usage + depths[target]
+                    deepest[node] = target
+            depths[node] = depth
+
+    return depths, deepest
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,145 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides functions to load variant manifests.
+
+A variant manifest describes multiple DCE configurations (variants) of the same
+input files, allowing the input files to be parsed and resolved only once for
+all variants. Manifests are either JSON or TOML (Python 3.11+) files:
+
+JSON:
+    {
+        "variants": [
+            {
+                "name": "board_a",
+                "output": "build/board_a/dce",
+                "entry": "_main",
+                "exclude_functions": ["_keep_me"],
+                "exclude_constants": ["file.asm:_TABLE"],
+                "opt_irq": true
+            }
+        ]
+    }
+
+TOML:
+    [[variants]]
+    name = "board_a"
+    output = "build/board_a/dce"
+    opt_irq = true
+
+Only "name" and "output" are required. Output directories are relative to the manifest.
+"""
+
+import os
+
+from .manifest import load_manifest, string_list, check_unique_names
+
+############################################
+# Classes
+############################################
+
+
+class Variant:
+    """
+    Class to store the configuration of a single variant.
+
+    Attributes:
+        name (str): The name of the variant.
+        output_dir (str): The output directory of the variant.
+        entry_label (str): The entry label of the variant.
+        exclude_functions (list): Function labels to exclude from dead code elimination.
+        exclude_constants (list): Constant labels to exclude from dead code elimination.
+        opt_irq (bool): Whether unused IRQ handlers are removed.
+    """
+
+    def __init__(
+        self,
+        name,
+        output_dir,
+        entry_label="_main",
+        exclude_functions=None,
+        exclude_constants=None,
+        opt_irq=False,
+    ):
+        self.name = name
+        self.output_dir = output_dir
+        self.entry_label = entry_label
+        self.exclude_functions = exclude_functions
+        self.exclude_constants = exclude_constants
+        self.opt_irq = opt_irq
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+
+############################################
+# Manifest loading
+############################################
+
+
+def load_variants(manifest_path):
+    """
+    Loads the variants of a variant manifest.
+
+    Args:
+        manifest_path (str): The path to the JSON or TOML manifest.
+
+    Returns:
+        list: A list of Variant objects.
+
+    Raises:
+        ValueError: If the manifest is malformed.
+    """
+    entries = load_manifest(manifest_path, "variants")
+    check_unique_names(entries, manifest_path, ["name", "output"])
+
+    base_dir = os.path.dirname(manifest_path)
+
+    return [
+        Variant(
+            entry["name"],
+            os.path.join(base_dir, entry["output"]),
+            entry.get("entry", "_main"),
+            string_list(entry, "exclude_functions", f"variant {entry['name']}"),
+            string_list(entry, "exclude_constants", f"variant {entry['name']}"),
+            bool(entry.get("opt_irq", False)),
+        )
+        for entry in entries
+    ]
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,153 @@
+# Copyright (C) 2024 Patrick Pedersen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides a file watcher used by the watch mode of the tool.
+
+Files are polled for changes of their modification time and size. Whether a
+changed file actually needs to be parsed again is decided by the parse cache
+(See cache.ParseCache), which also compares file contents.
+"""
+
+import os
+import time
+
+############################################
+# Classes
+############################################
+
+
+class FileWatcher:
+    """
+    Class to detect changes of a set of files by polling their state.
+
+    Attributes:
+        paths (set): The paths of the watched files.
+        interval (float): The polling interval in seconds.
+    """
+
+    def __init__(self, paths, interval=0.5):
+        """
+        Initializes the FileWatcher and records the current state of the files.
+
+        Args:
+            paths (iterable of str): The paths of the files to watch.
+            interval (float, optional): The polling interval in seconds.
+        """
+        self.interval = interval
+        self.paths = set()
+        self._states = {}
+        self.set_paths(paths)
+
+    @staticmethod
+    def _state(path):
+        """
+        Returns the state of a file.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            tuple: Modification time (ns) and size of the file, or None if it doesn't exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def set_paths(self, paths):
+        """
+        Sets the watched files. The state of files that are already
+        watched is kept, newly watched files are recorded as is.
+
+        Args:
+            paths (iterable of str): The paths of the files to watch.
+        """
+        self.paths = set(paths)
+        self._states = {
+            path: (self._states[path] if path in self._states else self._state(path))
+            for path in self.paths
+        }
+
+    def poll(self):
+        """
+        Checks the watched files for changes since the last poll.
+
+        Returns:
+            set: The paths of all files that have been modified, created or deleted.
+        """
+        ret = set()
+        for path in self.paths:
+            state = self._state(path)
+            if state != self._states[path]:
+                self._states[path] = state
+                ret.add(path)
+        return ret
+
+    def wait(self):
+        """
+        Blocks until at least one of the watched files changed.
+
+        Returns:
+            set: The paths of all changed files.
+        """
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            time.sleep(self.interval)
+
+
+class WatchState:
+    """
+    Class to hold the results of the previous run of the watch mode.
+
+    Attributes:
+        signatures (dict): Maps output paths to the signatures of their written content.
+        kept (set): (name, output path) tuples of the functions kept by the previous run,
+                    None before the first run.
+        removed (set): (name, output path) tuples of the functions removed by the previous
+                       run, None before the first run.
+    """
+
+    def __init__(self):
+        """
+        Initializes the WatchState for a first run.
+        """
+        self.signatures = {}
+        self.kept = None
+        self.removed = None
+
+
+############################################
+# Documentation
+############################################
+
+# Include private members in documentation
+__pdoc__ = {
+    name: True
+    for name, _class in globals().items()
+    if name.startswith("_") and isinstance(_class, type)
+}
+__pdoc__.update(
+    {
+        f"{name}.{member}": True
+        for name, _class in globals().items()
+        if isinstance(_class, type)
+        for member in _class.__dict__.keys()
+        if member not in {"__module__", "__dict__", "__weakref__", "__doc__"}
+    }
+)
@@ -0,0 +1,21 @@
+#include <stdint.h>
+
+uint8_t counter;
+
+uint8_t get_counter(void) {
+    return counter + 1;
+}
+
+uint8_t get_counter_copy(void) {
+    return counter + 1;
+}
+
+uint8_t get_counter_by_ptr(void) {
+    return counter + 1;
+}
+
+uint8_t (*counter_getter)(void) = &get_counter_by_ptr;
+
+void use_folding(void) {
+    counter = get_counter() + get_counter_copy() + counter_getter();
+}
@@ -0,0 +1,12 @@
+#include <stdint.h>
+
+const uint8_t table[] = {1, 2, 3, 4};
+const uint8_t table_copy[] = {1, 2, 3, 4};
+const uint8_t reversed_table[] = {4, 3, 2, 1};
+
+uint8_t pooling_index;
+
+uint8_t use_pooling(void) {
+    return table[pooling_index] + table_copy[pooling_index] +
+           reversed_table[pooling_index];
+}
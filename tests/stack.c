@@ -0,0 +1,23 @@
+#include <stdint.h>
+
+uint8_t stack_leaf(uint8_t a) {
+    volatile uint8_t buffer[4];
+    buffer[0] = a;
+    return buffer[0];
+}
+
+uint8_t stack_branch(uint8_t a) {
+    return stack_leaf(a) + 1;
+}
+
+uint8_t stack_recursive(uint8_t n) {
+    return n ? stack_recursive(n - 1) + 1 : 0;
+}
+
+void use_stack(void) {
+    stack_branch(1);
+}
+
+void use_recursion(void) {
+    stack_recursive(3);
+}
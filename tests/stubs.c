@@ -0,0 +1,19 @@
+#include <stdint.h>
+
+uint8_t samples;
+
+void log_sample(void) {
+}
+
+void on_sample(void) {
+}
+
+void (*sample_hook)(void) = &on_sample;
+
+void use_stubs(void) {
+    log_sample();
+    samples++;
+    log_sample();
+    on_sample();
+    sample_hook();
+}
@@ -22,13 +22,29 @@ import subprocess
 import os
 import sys
 import shutil
+import io
+import json
+import tarfile
+import threading
+import asyncio
 import colour_runner
 import colour_runner.runner
-from contextlib import contextmanager
+from contextlib import contextmanager, redirect_stdout
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from stm8dce.__main__ import run
+import stm8dce
+from stm8dce.__main__ import run, run_variants, run_batch, dce_main, watch_iteration
+from stm8dce import rel_index
+from stm8dce import asm_summary
+from stm8dce import variants
+from stm8dce import batch
+from stm8dce import sizes
+from stm8dce import asm_matchers
+from stm8dce import server
+from stm8dce.exclusions import load_exclude_file
+from stm8dce.watch import WatchState
+from stm8dce.cache import ParseCache
 
 build_dir = "build"
 
@@ -967,17 +983,116 @@ class TestDeadCodeElimination(unittest.TestCase):
             f"{self.build_dir}/{self._testMethodName}.elf",
         )
 
-    def test_custom_codeconstseg(self):
-        input_files = c2asm(
+    def test_lib_index(self):
+        rels = c2rel(
+            [
+                "main.c",
+                "rel.c",
+            ],
+            self.rel_output_dir,
+        )
+
+        lib = f"{self.lib_output_dir}/lib.lib"
+        rel2lib(
+            rels,
+            lib,
+        )
+
+        index = lib + rel_index.INDEX_EXTENSION
+        rel_index.write_index(lib, index)
+
+        asm_files = c2asm(
+            [
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+            args=["-DEXT"],
+        )
+
+        expected_kept_functions = create_asmsyms(
+            [
+                "_main",
+                "used_function",
+                "used_function_sub",
+                "local_function_sub",
+                "local_function",
+                "function_used_by_ptr",
+                "function_used_by_ptr_sub",
+                "recursive_function",
+                "function_expected_by_module",
+                "function_expected_by_module_sub",
+            ],
+            "_main.c",
+            self.dce_output_dir,
+        ) + create_asmsyms(
+            [
+                "external_function",
+                "external_function_sub",
+            ],
+            "extra.c",
+            self.dce_output_dir,
+        )
+
+        expected_kept_constants = create_asmsyms(
+            [
+                "USED_CONSTANT",
+                "CONSTANT_EXPECTED_BY_MODULE",
+                "LOCAL_CONSTANT",
+            ],
+            "_main.c",
+            self.dce_output_dir,
+        ) + create_asmsyms(
+            ["EXTERNAL_CONST_ARRAY"],
+            "extra.c",
+            self.dce_output_dir,
+        )
+
+        # The index must yield the same result whether it
+        # replaces the lib or is provided alongside it
+        for input_files in (asm_files + [index], asm_files + [lib, index]):
+            with suppress_output():
+                (
+                    remove_functions,
+                    remove_constants,
+                    keep_functions,
+                    keep_constants,
+                ) = run(
+                    input_files=input_files,
+                    output_dir=self.dce_output_dir,
+                    entry_label="_main",
+                    exclude_functions=None,
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                )
+
+            received_kept_functions = stm8dce_obj_to_asmsym(keep_functions)
+            assert_eq_elements(expected_kept_functions, received_kept_functions)
+
+            received_kept_constants = stm8dce_obj_to_asmsym(keep_constants)
+            assert_eq_elements(expected_kept_constants, received_kept_constants)
+
+    def test_summary_link(self):
+        asm_files = c2asm(
             [
                 "main.c",
                 "_main.c",
                 "extra.c",
             ],
             self.dce_input_dir,
-            args=["--codeseg", "XDDCODE", "--constseg", "XDDCONST"],
         )
 
+        input_files = []
+        for asm_file in asm_files:
+            summary = asm_file.replace(".asm", asm_summary.SUMMARY_EXTENSION)
+            with suppress_output():
+                asm_summary.write_summary(asm_file, summary)
+            input_files.append(summary)
+
         expected_kept_functions = (
             create_asmsyms(
                 [
@@ -1038,8 +1153,8 @@ class TestDeadCodeElimination(unittest.TestCase):
                 entry_label="_main",
                 exclude_functions=None,
                 exclude_constants=None,
-                codeseg="XDDCODE",
-                constseg="XDDCONST",
+                codeseg="CODE",
+                constseg="CONST",
                 verbose=False,
                 debug_flag=False,
                 opt_irq=False,
@@ -1069,6 +1184,1481 @@ class TestDeadCodeElimination(unittest.TestCase):
             f"{self.build_dir}/{self._testMethodName}.elf",
         )
 
+    def test_variants(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        manifest = f"{self.build_dir}/variants.json"
+        with open(manifest, "w") as file:
+            json.dump(
+                {
+                    "variants": [
+                        {"name": "default", "output": "variants/default"},
+                        {
+                            "name": "alternative",
+                            "output": "variants/alternative",
+                            "entry": "_alternative_main",
+                            "exclude_functions": ["_excluded_function"],
+                            "exclude_constants": ["_EXCLUDED_CONSTANT"],
+                            "opt_irq": True,
+                        },
+                    ]
+                },
+                file,
+            )
+
+        loaded_variants = variants.load_variants(manifest)
+
+        # Missing manifests are reported as errors
+        with self.assertRaises(ValueError):
+            variants.load_variants(f"{self.build_dir}/does_not_exist.json")
+
+        with suppress_output():
+            results = run_variants(
+                input_files=input_files,
+                variants=loaded_variants,
+                codeseg="CODE",
+                constseg="CONST",
+                verbose=False,
+                debug_flag=False,
+            )
+
+        # Each variant must match a separate run with the same configuration
+        for variant in loaded_variants:
+            output_dir = f"{self.build_dir}/{variant.name}"
+            os.makedirs(output_dir)
+
+            with suppress_output():
+                expected = run(
+                    input_files=input_files,
+                    output_dir=output_dir,
+                    entry_label=variant.entry_label,
+                    exclude_functions=variant.exclude_functions,
+                    exclude_constants=variant.exclude_constants,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=variant.opt_irq,
+                )
+
+            for expected_objs, received_objs in zip(expected, results[variant.name]):
+                assert_eq_elements(
+                    [(obj.name, os.path.basename(obj.path)) for obj in expected_objs],
+                    [(obj.name, os.path.basename(obj.path)) for obj in received_objs],
+                )
+
+            for filename in ["main.asm", "_main.asm", "extra.asm"]:
+                with open(f"{output_dir}/{filename}") as file:
+                    expected_content = file.read()
+                with open(f"{variant.output_dir}/{filename}") as file:
+                    self.assertEqual(expected_content, file.read())
+
+            os.makedirs(f"{self.rel_output_dir}/{variant.name}")
+            rels = asm2rel(
+                [
+                    f"{variant.output_dir}/main.asm",
+                    f"{variant.output_dir}/_main.asm",
+                    f"{variant.output_dir}/extra.asm",
+                ],
+                f"{self.rel_output_dir}/{variant.name}",
+            )
+
+            create_elf(
+                rels,
+                f"{self.build_dir}/{self._testMethodName}_{variant.name}.elf",
+            )
+
+    def test_batch(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        # Two projects with identical copies of the same files
+        projects = []
+        for name in ["project_a", "project_b"]:
+            project_dir = f"{self.build_dir}/{name}"
+            os.makedirs(project_dir)
+            for input_file in input_files:
+                shutil.copy(input_file, project_dir)
+            projects.append(
+                {
+                    "name": name,
+                    "inputs": [
+                        f"{name}/{os.path.basename(input_file)}"
+                        for input_file in input_files
+                    ],
+                    "output": f"{name}/dce",
+                    "opt_irq": name == "project_b",
+                }
+            )
+
+        manifest = f"{self.build_dir}/batch.json"
+        with open(manifest, "w") as file:
+            json.dump({"projects": projects}, file)
+
+        loaded_projects = batch.load_projects(manifest)
+
+        # Missing manifests are reported as errors
+        with self.assertRaises(ValueError):
+            batch.load_projects(f"{self.build_dir}/does_not_exist.json")
+
+        with suppress_output():
+            results = run_batch(
+                projects=loaded_projects, jobs=2, verbose=False, debug_flag=False
+            )
+
+        self.assertEqual(results, {"project_a": 0, "project_b": 0})
+
+        # Each project must match a separate run with the same configuration
+        for project in loaded_projects:
+            output_dir = f"{self.build_dir}/{project.name}_expected"
+            os.makedirs(output_dir)
+
+            with suppress_output():
+                run(
+                    input_files=input_files,
+                    output_dir=output_dir,
+                    entry_label="_main",
+                    exclude_functions=None,
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=project.opt_irq,
+                )
+
+            for filename in ["main.asm", "_main.asm", "extra.asm"]:
+                with open(f"{output_dir}/{filename}") as file:
+                    expected_content = file.read()
+                with open(f"{project.output_dir}/{filename}") as file:
+                    self.assertEqual(expected_content, file.read())
+
+    def test_api(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=["_does_not_exist"],
+            ),
+        )
+
+        # Analyzing must not write any files
+        self.assertEqual(os.listdir(self.dce_output_dir), [])
+
+        # The analyzed objects refer to the source files
+        expected_kept_functions = (
+            create_asmsyms(
+                [
+                    "main",
+                    "NON_EMPTY_IRQ_HANDLER_sub",
+                    "NON_EMPTY_IRQ_HANDLER",
+                    "EMPTY_IRQ_HANDLER",
+                ],
+                "main.c",
+                self.dce_input_dir,
+            )
+            + create_asmsyms(
+                [
+                    "_main",
+                    "used_function",
+                    "used_function_sub",
+                    "local_function_sub",
+                    "local_function",
+                    "function_used_by_ptr",
+                    "function_used_by_ptr_sub",
+                    "recursive_function",
+                ],
+                "_main.c",
+                self.dce_input_dir,
+            )
+            + create_asmsyms(
+                [
+                    "external_function",
+                    "external_function_sub",
+                ],
+                "extra.c",
+                self.dce_input_dir,
+            )
+        )
+
+        expected_kept_constants = create_asmsyms(
+            [
+                "USED_CONSTANT",
+                "LOCAL_CONSTANT",
+            ],
+            "_main.c",
+            self.dce_input_dir,
+        ) + create_asmsyms(
+            ["EXTERNAL_CONST_ARRAY"],
+            "extra.c",
+            self.dce_input_dir,
+        )
+
+        assert_dce(
+            expected_kept_functions,
+            expected_kept_constants,
+            result.keep_functions,
+            result.keep_constants,
+            result.remove_functions,
+            result.remove_constants,
+            self.dce_input_dir,
+        )
+
+        self.assertEqual(
+            result.diagnostics, ["Warning: Excluded function not found: _does_not_exist"]
+        )
+
+        # Applying must produce the same contents as rewriting in memory
+        contents = stm8dce.rewrite(result)
+        stm8dce.apply(result, self.dce_output_dir)
+
+        self.assertEqual(sorted(contents), ["_main.asm", "extra.asm", "main.asm"])
+        for filename, content in contents.items():
+            with open(f"{self.dce_output_dir}/{filename}") as file:
+                self.assertEqual(content, file.read())
+
+        rels = asm2rel(
+            [
+                f"{self.dce_output_dir}/main.asm",
+                f"{self.dce_output_dir}/_main.asm",
+                f"{self.dce_output_dir}/extra.asm",
+            ],
+            self.rel_output_dir,
+        )
+
+        create_elf(
+            rels,
+            f"{self.build_dir}/{self._testMethodName}.elf",
+        )
+
+    def test_custom_codeconstseg(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+            args=["--codeseg", "XDDCODE", "--constseg", "XDDCONST"],
+        )
+
+        expected_kept_functions = (
+            create_asmsyms(
+                [
+                    "main",
+                    "NON_EMPTY_IRQ_HANDLER_sub",
+                    "NON_EMPTY_IRQ_HANDLER",
+                    "EMPTY_IRQ_HANDLER",
+                ],
+                "main.c",
+                self.dce_output_dir,
+            )
+            + create_asmsyms(
+                [
+                    "_main",
+                    "used_function",
+                    "used_function_sub",
+                    "local_function_sub",
+                    "local_function",
+                    "function_used_by_ptr",
+                    "function_used_by_ptr_sub",
+                    "recursive_function",
+                ],
+                "_main.c",
+                self.dce_output_dir,
+            )
+            + create_asmsyms(
+                [
+                    "external_function",
+                    "external_function_sub",
+                ],
+                "extra.c",
+                self.dce_output_dir,
+            )
+        )
+
+        expected_kept_constants = create_asmsyms(
+            [
+                "USED_CONSTANT",
+                "LOCAL_CONSTANT",
+            ],
+            "_main.c",
+            self.dce_output_dir,
+        ) + create_asmsyms(
+            ["EXTERNAL_CONST_ARRAY"],
+            "extra.c",
+            self.dce_output_dir,
+        )
+
+        with suppress_output():
+            (
+                remove_functions,
+                remove_constants,
+                keep_functions,
+                keep_constants,
+            ) = run(
+                input_files=input_files,
+                output_dir=self.dce_output_dir,
+                entry_label="_main",
+                exclude_functions=None,
+                exclude_constants=None,
+                codeseg="XDDCODE",
+                constseg="XDDCONST",
+                verbose=False,
+                debug_flag=False,
+                opt_irq=False,
+            )
+
+        assert_dce(
+            expected_kept_functions,
+            expected_kept_constants,
+            keep_functions,
+            keep_constants,
+            remove_functions,
+            remove_constants,
+            self.dce_output_dir,
+        )
+
+        rels = asm2rel(
+            [
+                f"{self.dce_output_dir}/main.asm",
+                f"{self.dce_output_dir}/_main.asm",
+                f"{self.dce_output_dir}/extra.asm",
+            ],
+            self.rel_output_dir,
+        )
+
+        create_elf(
+            rels,
+            f"{self.build_dir}/{self._testMethodName}.elf",
+        )
+
+    def test_concurrent_options(self):
+        default_dir = f"{self.dce_input_dir}/default"
+        custom_dir = f"{self.dce_input_dir}/custom"
+        os.makedirs(default_dir)
+        os.makedirs(custom_dir)
+
+        default_files = c2asm(["main.c", "_main.c", "extra.c"], default_dir)
+        custom_files = c2asm(
+            ["main.c", "_main.c", "extra.c"],
+            custom_dir,
+            args=["--codeseg", "XDDCODE", "--constseg", "XDDCONST"],
+        )
+
+        configs = [
+            (default_files, stm8dce.Options()),
+            (
+                custom_files,
+                stm8dce.Options(codeseg="XDDCODE", constseg="XDDCONST", opt_irq=True),
+            ),
+        ]
+
+        def removed_names(input_files, options):
+            result = stm8dce.analyze(input_files, options)
+            return sorted(
+                (obj.name, os.path.basename(obj.path))
+                for obj in result.remove_functions + result.remove_constants
+            )
+
+        expected = [removed_names(*config) for config in configs]
+
+        # Analyses with different options must not affect each other
+        received = [[] for _ in configs]
+
+        def worker(index):
+            for _ in range(5):
+                received[index].append(removed_names(*configs[index]))
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(len(configs))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index in range(len(configs)):
+            self.assertEqual(received[index], [expected[index]] * 5)
+
+        with self.assertRaises(AttributeError):
+            configs[0][1].codeseg = "XDDCODE"
+
+    def test_jobserver(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        # Simulate a make jobserver with a single token besides the implicit one
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b"+")
+        jobs = stm8dce.JobSlots(makeflags=f" -j2 --jobserver-auth={read_fd},{write_fd}")
+        self.assertIsNotNone(jobs.jobserver)
+        self.assertEqual(jobs.jobs, 2)
+
+        # Tokens are read without blocking, without changing make's descriptors
+        self.assertFalse(os.get_blocking(jobs.jobserver.read_fd))
+        self.assertTrue(os.get_blocking(read_fd))
+
+        options = stm8dce.Options(opt_irq=True)
+        expected = stm8dce.rewrite(stm8dce.analyze(input_files, options))
+        received = stm8dce.rewrite(stm8dce.analyze(input_files, options, jobs=jobs))
+        self.assertEqual(expected, received)
+
+        # All tokens must have been returned
+        os.set_blocking(read_fd, False)
+        self.assertEqual(os.read(read_fd, 16), b"+")
+        os.close(read_fd)
+        os.close(write_fd)
+
+        # Outside of make, the number of jobs is used
+        self.assertIsNone(stm8dce.JobSlots(3, makeflags="").jobserver)
+        self.assertEqual(stm8dce.JobSlots(3, makeflags="").jobs, 3)
+
+    def test_unchanged_outputs(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        analysis = stm8dce.analyze(input_files, output_dir=self.dce_output_dir)
+        written = stm8dce.apply(analysis)
+        self.assertEqual(len(written), 3)
+
+        # Backdate all outputs to detect rewrites
+        for output_file in written:
+            os.utime(output_file, (0, 0))
+
+        # A second run must not touch any output
+        self.assertEqual(stm8dce.apply(analysis), [])
+        for output_file in written:
+            self.assertEqual(os.stat(output_file).st_mtime, 0)
+
+        # Modified outputs are restored
+        modified = f"{self.dce_output_dir}/extra.asm"
+        with open(modified, "a") as file:
+            file.write("; modified\n")
+        self.assertEqual(stm8dce.apply(analysis), [modified])
+        with open(modified) as file:
+            self.assertEqual(stm8dce.rewrite(analysis)["extra.asm"], file.read())
+
+    def test_output_strategy(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        # A module without any dead code
+        unmodified = f"{self.dce_input_dir}/empty.asm"
+        with open(unmodified, "w") as file:
+            file.write("\t.module empty\n\t.area CODE\n")
+        input_files.append(unmodified)
+
+        analysis = stm8dce.analyze(input_files)
+        expected = stm8dce.rewrite(analysis)
+
+        for strategy in ["hardlink", "symlink", "reflink", "copy"]:
+            output_dir = f"{self.build_dir}/{strategy}"
+            os.makedirs(output_dir)
+
+            stm8dce.apply(analysis, output_dir, strategy=strategy)
+            # Applying twice must neither fail nor touch any file
+            self.assertEqual(stm8dce.apply(analysis, output_dir, strategy=strategy), [])
+
+            for filename, content in expected.items():
+                with open(f"{output_dir}/{filename}") as file:
+                    self.assertEqual(content, file.read())
+
+            if strategy == "hardlink":
+                self.assertTrue(os.path.samefile(f"{output_dir}/empty.asm", unmodified))
+            if strategy == "symlink":
+                self.assertTrue(os.path.islink(f"{output_dir}/empty.asm"))
+
+            # Modified files always get a private copy
+            self.assertFalse(os.path.islink(f"{output_dir}/main.asm"))
+            self.assertFalse(
+                os.path.samefile(f"{output_dir}/main.asm", input_files[0])
+            )
+
+        with self.assertRaises(ValueError):
+            stm8dce.apply(analysis, self.dce_output_dir, strategy="move")
+
+    def test_depfile(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        depfile = f"{self.build_dir}/dce.d"
+        with suppress_output():
+            run(
+                input_files=input_files,
+                output_dir=self.dce_output_dir,
+                entry_label="_main",
+                exclude_functions=None,
+                exclude_constants=None,
+                codeseg="CODE",
+                constseg="CONST",
+                verbose=False,
+                debug_flag=False,
+                opt_irq=False,
+                depfile=depfile,
+            )
+
+        with open(depfile) as file:
+            rules = file.read().replace("\\\n", "").splitlines()
+
+        dependencies = {}
+        for rule in rules:
+            if rule:
+                target, deps = rule.split(":", 1)
+                dependencies[target] = deps.split()
+
+        analysis = stm8dce.analyze(input_files, output_dir=self.dce_output_dir)
+        expected = analysis.dependencies()
+
+        for input_file in input_files:
+            output_file = f"{self.dce_output_dir}/{os.path.basename(input_file)}"
+            # Each output depends on its own source
+            self.assertIn(input_file, dependencies[output_file])
+            self.assertEqual(sorted(expected[output_file]), dependencies[output_file])
+            # Each input has a phony rule
+            self.assertEqual(dependencies[input_file], [])
+
+        # _main.c calls into extra.c
+        self.assertIn(
+            input_files[1], dependencies[f"{self.dce_output_dir}/extra.asm"]
+        )
+
+    def test_archive(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        input_archive = io.BytesIO()
+        with tarfile.open(fileobj=input_archive, mode="w") as tar:
+            for input_file in input_files:
+                tar.add(input_file, arcname=f"asm/{os.path.basename(input_file)}")
+            # Unsupported members are skipped
+            tar.add("main.c", arcname="main.c")
+        input_archive.seek(0)
+
+        output_archive = io.BytesIO()
+        with suppress_output():
+            run(
+                input_files=[],
+                output_dir=None,
+                entry_label="_main",
+                exclude_functions=None,
+                exclude_constants=None,
+                codeseg="CODE",
+                constseg="CONST",
+                verbose=False,
+                debug_flag=False,
+                opt_irq=True,
+                input_archive=input_archive,
+                output_archive=output_archive,
+            )
+
+            run(
+                input_files=input_files,
+                output_dir=self.dce_output_dir,
+                entry_label="_main",
+                exclude_functions=None,
+                exclude_constants=None,
+                codeseg="CODE",
+                constseg="CONST",
+                verbose=False,
+                debug_flag=False,
+                opt_irq=True,
+            )
+
+        output_archive.seek(0)
+        with tarfile.open(fileobj=output_archive, mode="r") as tar:
+            self.assertEqual(
+                sorted(tar.getnames()), ["_main.asm", "extra.asm", "main.asm"]
+            )
+            for member in tar.getmembers():
+                with open(f"{self.dce_output_dir}/{member.name}", "rb") as file:
+                    self.assertEqual(file.read(), tar.extractfile(member).read())
+
+    def test_exclude_patterns(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        exclude_file = f"{self.build_dir}/{self._testMethodName}.txt"
+        with open(exclude_file, "w") as file:
+            file.write(
+                "# Exclusions\n"
+                "_excluded_*\n"
+                "_main.asm:_local_excluded_function\n"
+                "\n"
+                "re:_EXCLUDED_CONST.*\n"
+                "_main.asm:_LOCAL_EXCLUDED_CONSTANT\n"
+                "_does_not_exist\n"
+            )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_patterns=load_exclude_file(exclude_file),
+            ),
+        )
+
+        expected_kept_functions = (
+            create_asmsyms(
+                [
+                    "main",
+                    "NON_EMPTY_IRQ_HANDLER_sub",
+                    "NON_EMPTY_IRQ_HANDLER",
+                    "EMPTY_IRQ_HANDLER",
+                ],
+                "main.c",
+                self.dce_input_dir,
+            )
+            + create_asmsyms(
+                [
+                    "_main",
+                    "used_function",
+                    "used_function_sub",
+                    "local_function_sub",
+                    "local_function",
+                    "function_used_by_ptr",
+                    "function_used_by_ptr_sub",
+                    "recursive_function",
+                    "excluded_function",
+                    "excluded_function_sub",
+                    "local_excluded_function",
+                    "local_excluded_function_sub",
+                ],
+                "_main.c",
+                self.dce_input_dir,
+            )
+            + create_asmsyms(
+                [
+                    "external_function",
+                    "external_function_sub",
+                ],
+                "extra.c",
+                self.dce_input_dir,
+            )
+        )
+
+        expected_kept_constants = create_asmsyms(
+            [
+                "USED_CONSTANT",
+                "EXCLUDED_CONSTANT",
+                "LOCAL_CONSTANT",
+                "LOCAL_EXCLUDED_CONSTANT",
+            ],
+            "_main.c",
+            self.dce_input_dir,
+        ) + create_asmsyms(
+            ["EXTERNAL_CONST_ARRAY"],
+            "extra.c",
+            self.dce_input_dir,
+        )
+
+        assert_dce(
+            expected_kept_functions,
+            expected_kept_constants,
+            result.keep_functions,
+            result.keep_constants,
+            result.remove_functions,
+            result.remove_constants,
+            self.dce_input_dir,
+        )
+
+        self.assertEqual(
+            result.diagnostics,
+            ["Warning: Exclusion pattern matched nothing: _does_not_exist"],
+        )
+
+        # Invalid regular expressions are rejected
+        with self.assertRaises(ValueError):
+            stm8dce.analyze(
+                input_files,
+                stm8dce.Options(entry_label="_main", exclude_patterns=["re:_("]),
+            )
+
+        # Inline flags, named groups, backreferences and verbose regexes are supported
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_patterns=[
+                    "re:(_excluded)_function",
+                    "re:(?i)_EXCLUDED_FUNCTION_SUB",
+                    "re:(?P<name>_local_excluded)_function",
+                    "re:(?P<name>_local_excluded_function)_sub",
+                    "re:_(E)XCLUD\\1D_CONSTANT",
+                    "re:(?x) _EXCLUDED _CONSTANT  # verbose",
+                ],
+            ),
+        )
+        kept = [obj.name for obj in result.keep_functions + result.keep_constants]
+        for name in (
+            "_excluded_function",
+            "_excluded_function_sub",
+            "_local_excluded_function",
+            "_local_excluded_function_sub",
+            "_EXCLUDED_CONSTANT",
+        ):
+            self.assertIn(name, kept)
+        self.assertEqual(result.diagnostics, [])
+
+    def test_explain(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(input_files, stm8dce.Options(entry_label="_main"))
+
+        # Shortest chain from the entry label
+        [(function, chain)] = result.explain("_used_function_sub")
+        self.assertEqual(function.name, "_used_function_sub")
+        self.assertEqual(
+            [node.name for node, _ in chain],
+            ["_main", "__main", "_used_function", "_used_function_sub"],
+        )
+        self.assertEqual(chain[0][1], "entry")
+        for _, kind in chain[1:]:
+            self.assertIn(kind, ("call", "jp"))
+
+        # Function pointers and constants
+        [(_, chain)] = result.explain("_function_used_by_ptr")
+        self.assertEqual(chain[-1][1], "long-read pointer")
+        [(_, chain)] = result.explain("_USED_CONSTANT")
+        self.assertEqual(chain[-1][1], "long read")
+
+        # Initializers are kept by their variables
+        [(_, chain)] = result.explain("_external_function")
+        self.assertEqual(
+            [kind for _, kind in chain[-3:]],
+            ["variable access", "initial value", "initializer .dw"],
+        )
+
+        # Static functions may be defined multiple times
+        [(_, chain)] = result.explain("_main.asm:_local_function")
+        self.assertEqual(chain[-2][0].name, "__main")
+
+        # Removed functions aren't kept by anything
+        self.assertEqual(result.explain("_unused_function")[0][1], None)
+
+        with self.assertRaises(ValueError):
+            result.explain("_does_not_exist")
+
+        # Unknown symbols fail the run
+        with suppress_output():
+            with self.assertRaises(ValueError):
+                run(
+                    input_files=input_files,
+                    output_dir=self.dce_output_dir,
+                    entry_label="_main",
+                    exclude_functions=None,
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                    explain=["_does_not_exist"],
+                )
+
+    def test_sizes(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        # Instruction and data sizes, including prefix bytes
+        for line, size in [
+            ("clrw x", 1),
+            ("clrw y", 2),
+            ("ld a, (0x01, sp)", 2),
+            ("ldw y, #0x1234", 4),
+            ("cpw x, _USED_CONSTANT+0", 3),
+            ("ld a, (_TABLE+1, y)", 4),
+            ("ld a, [_ptr+0]", 4),
+            ("clr _counter+0", 4),
+            ("call _used_function", 3),
+            ("btjt _flags+0, #1, 00103$", 5),
+        ]:
+            self.assertEqual(
+                sizes.instruction_size(asm_matchers.Instruction("", 1, line)), size
+            )
+        for line, size in [
+            (".db #0x01, #0x02", 2),
+            (".dw #0x0141", 2),
+            ('.ascii "Hello"', 5),
+        ]:
+            self.assertEqual(
+                sizes.directive_size(asm_matchers.Directive("", 1, line)), size
+            )
+
+        result = stm8dce.analyze(input_files, stm8dce.Options(entry_label="_main"))
+        kept, removed = result.sizes()
+
+        self.assertEqual(
+            kept,
+            sum(
+                obj.size
+                for obj in result.keep_functions
+                + result.keep_constants
+                + result.keep_initializers
+            ),
+        )
+        self.assertGreater(removed, 0)
+        for function in result.functions:
+            if not function.empty:
+                self.assertGreater(function.size, 0)
+        for constant in result.constants:
+            self.assertGreater(constant.size, 0)
+
+        # The flash budget fails the run if exceeded
+        with suppress_output():
+            with self.assertRaises(ValueError):
+                run(
+                    input_files=input_files,
+                    output_dir=self.dce_output_dir,
+                    entry_label="_main",
+                    exclude_functions=None,
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                    flash_budget=kept - 1,
+                )
+
+            run(
+                input_files=input_files,
+                output_dir=self.dce_output_dir,
+                entry_label="_main",
+                exclude_functions=None,
+                exclude_constants=None,
+                codeseg="CODE",
+                constseg="CONST",
+                verbose=False,
+                debug_flag=False,
+                opt_irq=False,
+                flash_budget=kept,
+            )
+
+    def test_retained_sizes(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(input_files, stm8dce.Options(entry_label="_main"))
+
+        def symbol(name):
+            return [obj for obj, _ in result.explain(f"_main.asm:{name}")][0]
+
+        used_function = symbol("_used_function")
+        used_function_sub = symbol("_used_function_sub")
+        used_constant = symbol("_USED_CONSTANT")
+        entry = symbol("__main")
+
+        dominators = result.dominators()
+        self.assertIs(dominators[used_function_sub], used_function)
+        self.assertIs(dominators[used_constant], used_function_sub)
+        self.assertIs(dominators[used_function], entry)
+
+        # Everything only kept through a function is retained by it
+        retained = result.retained_sizes()
+        self.assertEqual(
+            retained[used_function],
+            used_function.size + used_function_sub.size + used_constant.size,
+        )
+        self.assertGreater(retained[entry], retained[used_function])
+
+        # Only kept functions and constants have a retained size
+        self.assertEqual(
+            set(retained), set(result.keep_functions) | set(result.keep_constants)
+        )
+
+    def test_unused_variables(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "variables.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main", exclude_functions=("_use_variables",)
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        removed = {variable.name for variable in result.remove_variables}
+        kept = {variable.name for variable in result.keep_variables}
+        self.assertIn("_unused_variable", removed)
+        self.assertIn("_unused_initialized_variable", removed)
+        for name in [
+            "_used_variable",
+            "_written_variable",
+            "_used_initialized_variable",
+            "_external_function_ptr",
+        ]:
+            self.assertIn(name, kept)
+
+        # Initializers are removed along with their variables,
+        # and no longer keep the functions they point to
+        self.assertEqual(
+            sorted(initializer.name for initializer in result.remove_initializers),
+            [
+                "__xinit__unused_function_pointer",
+                "__xinit__unused_initialized_variable",
+            ],
+        )
+        self.assertIn(
+            "_pointed_to_by_unused_variable",
+            [function.name for function in result.remove_functions],
+        )
+        kept_ram, removed_ram = result.ram_sizes()
+        self.assertEqual(removed_ram, 5)
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/variables.asm", "r") as file:
+            lines = [line.strip() for line in file]
+        for name in ["_unused_variable", "_unused_initialized_variable"]:
+            self.assertNotIn(f"{name}::", lines)
+            self.assertNotIn(f".globl {name}", lines)
+        self.assertNotIn("__xinit__unused_initialized_variable:", lines)
+        self.assertIn("_used_initialized_variable::", lines)
+        self.assertIn("__xinit__used_initialized_variable:", lines)
+
+    def test_fold_identical_functions(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "folding.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main", exclude_functions=("_use_folding",), opt_fold=True
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        folded = {
+            function.name: kept.name
+            for function, kept in result.folded_functions.items()
+        }
+        self.assertEqual(folded.get("_get_counter_copy"), "_get_counter")
+
+        # Functions whose address is taken keep their own copy
+        self.assertNotIn("_get_counter_by_ptr", folded)
+        self.assertIn(
+            "_get_counter_by_ptr",
+            [function.name for function in result.keep_functions],
+        )
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/folding.asm", "r") as file:
+            lines = [line.strip() for line in file]
+        self.assertNotIn("_get_counter_copy:", lines)
+        self.assertNotIn("call\t_get_counter_copy", lines)
+        self.assertEqual(lines.count("call\t_get_counter"), 2)
+
+    def test_pool_constants(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "pooling.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main", exclude_functions=("_use_pooling",), opt_pool=True
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        pooled = {
+            constant.name: kept.name
+            for constant, kept in result.pooled_constants.items()
+        }
+        self.assertEqual(pooled, {"_table_copy": "_table"})
+        self.assertIn(
+            "_reversed_table",
+            [constant.name for constant in result.keep_constants],
+        )
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/pooling.asm", "r") as file:
+            lines = [line.strip() for line in file]
+        self.assertIn("_table:", lines)
+
+        # All reads of the pooled constant are redirected
+        for line in lines:
+            if not line.startswith(";"):
+                self.assertNotIn("_table_copy", line)
+
+    def test_unreachable_blocks(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "unreachable.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=("_spin_forever",),
+                opt_blocks=True,
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        # The return after the infinite loop is unreachable
+        blocks = [
+            (first, last)
+            for function, first, last, _ in result.remove_blocks
+            if function.name == "_spin_forever"
+        ]
+        self.assertEqual(len(blocks), 1)
+        function = next(
+            function
+            for function in result.keep_functions
+            if function.name == "_spin_forever"
+        )
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/unreachable.asm", "r") as file:
+            lines = file.readlines()
+        first, last = blocks[0]
+        for line in lines[first - 1 : last]:
+            self.assertTrue(line.startswith(";"))
+        code = "".join(
+            line.split(";")[0]
+            for line in lines[function.start_line_number : function.end_line_number]
+        )
+        self.assertIn("jra", code)
+        self.assertNotIn("ret", code)
+
+    def test_collapse_trampolines(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "trampolines.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=("_use_trampolines",),
+                opt_trampolines=True,
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        # Chains of trampolines are followed to their final target
+        collapsed = {
+            trampoline.name: target
+            for trampoline, target in result.collapsed_trampolines.items()
+        }
+        self.assertEqual(collapsed.get("_tick_wrapper"), "_tick")
+        self.assertEqual(collapsed.get("_tick_wrapper_wrapper"), "_tick")
+
+        # Trampolines whose address is taken are kept, but not called anymore
+        self.assertNotIn("_tick_hooked", collapsed)
+        self.assertIn(
+            "_tick_hooked",
+            [function.name for function in result.keep_functions],
+        )
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/trampolines.asm", "r") as file:
+            lines = [line.strip() for line in file]
+        self.assertNotIn("_tick_wrapper:", lines)
+        self.assertNotIn("_tick_wrapper_wrapper:", lines)
+        self.assertIn("_tick_hooked:", lines)
+        self.assertNotIn("call\t_tick_wrapper", lines)
+        self.assertNotIn("call\t_tick_hooked", lines)
+
+    def test_eliminate_calls_to_stubs(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "stubs.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=("_use_stubs",),
+                opt_calls=True,
+            ),
+            output_dir=self.dce_output_dir,
+        )
+
+        stubs = [stub.name for stub in result.remove_stubs]
+        self.assertIn("_log_sample", stubs)
+        calls = [
+            function.name
+            for function, _, _, stub in result.remove_calls
+            if stub.name == "_log_sample"
+        ]
+        self.assertEqual(calls, ["_use_stubs", "_use_stubs"])
+
+        # Stubs whose address is taken are kept along with their calls
+        self.assertNotIn("_on_sample", stubs)
+
+        stm8dce.apply(result)
+        with open(f"{self.dce_output_dir}/stubs.asm", "r") as file:
+            lines = [line.strip() for line in file]
+        self.assertNotIn("_log_sample:", lines)
+        self.assertNotIn("call\t_log_sample", lines)
+        self.assertIn("_on_sample:", lines)
+        self.assertIn("call\t_on_sample", lines)
+
+    def test_stack_depth(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+                "stack.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=("_use_stack", "_use_recursion"),
+            ),
+        )
+
+        depths, deepest = result.stack_depths()
+        by_name = {function.name: function for function in depths}
+        leaf = by_name["_stack_leaf"]
+        branch = by_name["_stack_branch"]
+        use_stack = by_name["_use_stack"]
+
+        # Callers are deeper than their callees by at least their return address
+        self.assertGreaterEqual(depths[leaf], 4)
+        self.assertGreaterEqual(depths[branch], depths[leaf] + 2)
+        self.assertGreaterEqual(depths[use_stack], depths[branch] + 2)
+        self.assertIs(deepest[branch], leaf)
+
+        # Relative calls push a return address just like calls
+        stack_asm = f"{self.dce_input_dir}/stack.asm"
+        with open(stack_asm) as file:
+            content = file.read()
+        self.assertIn("call\t_stack_leaf\n", content)
+        with open(stack_asm, "w") as file:
+            file.write(content.replace("call\t_stack_leaf\n", "callr\t_stack_leaf\n"))
+
+        relative_result = stm8dce.analyze(
+            input_files,
+            stm8dce.Options(
+                entry_label="_main",
+                exclude_functions=("_use_stack", "_use_recursion"),
+            ),
+        )
+        relative_depths, relative_deepest = relative_result.stack_depths()
+        relative_by_name = {function.name: function for function in relative_depths}
+        self.assertEqual(
+            relative_depths[relative_by_name["_stack_branch"]], depths[branch]
+        )
+        self.assertIs(
+            relative_deepest[relative_by_name["_stack_branch"]],
+            relative_by_name["_stack_leaf"],
+        )
+
+        with open(stack_asm, "w") as file:
+            file.write(content)
+
+        # Recursion is unbounded, as is everything reaching it
+        self.assertIsNone(depths[by_name["_stack_recursive"]])
+        self.assertIsNone(depths[by_name["_use_recursion"]])
+        main, _, total = result.stack_usage()
+        self.assertIsNone(main)
+        self.assertIsNone(total)
+
+        # The stack budget fails the run if the depth is unbounded or exceeded
+        with suppress_output():
+            with self.assertRaises(ValueError):
+                run(
+                    input_files=input_files,
+                    output_dir=self.dce_output_dir,
+                    entry_label="_main",
+                    exclude_functions=["_use_recursion"],
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                    stack_budget=1024,
+                )
+
+            with self.assertRaises(ValueError):
+                run(
+                    input_files=input_files,
+                    output_dir=self.dce_output_dir,
+                    entry_label="_main",
+                    exclude_functions=["_use_stack"],
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                    stack_budget=depths[use_stack] - 1,
+                )
+
+
+    def test_server(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+        local_output_dir = self.build_dir + "/local"
+        os.makedirs(local_output_dir)
+
+        socket_path = self.build_dir + "/stm8dce.sock"
+        dce_server = server.DCEServer(
+            socket_path, lambda argv, cache: dce_main(argv, cache=cache, served=True)
+        )
+        with suppress_output():
+            thread = threading.Thread(target=asyncio.run, args=(dce_server.serve(),))
+            thread.start()
+            while not os.path.exists(socket_path):
+                thread.join(0.01)
+
+        def compare_with_local_run():
+            response = server.request(
+                socket_path,
+                {
+                    "argv": ["-o", self.dce_output_dir, "-e", "_main", *input_files],
+                    "cwd": os.getcwd(),
+                },
+            )
+
+            output = io.StringIO()
+            with redirect_stdout(output):
+                run(
+                    input_files=input_files,
+                    output_dir=local_output_dir,
+                    entry_label="_main",
+                    exclude_functions=None,
+                    exclude_constants=None,
+                    codeseg="CODE",
+                    constseg="CONST",
+                    verbose=False,
+                    debug_flag=False,
+                    opt_irq=False,
+                )
+
+            self.assertEqual(response, {"status": 0, "output": output.getvalue()})
+            for input_file in input_files:
+                name = os.path.basename(input_file)
+                with open(f"{self.dce_output_dir}/{name}") as served, open(
+                    f"{local_output_dir}/{name}"
+                ) as local:
+                    self.assertEqual(served.read(), local.read())
+
+        try:
+            # A second server must not take over the socket of the running one
+            with self.assertRaises(ValueError):
+                asyncio.run(server.DCEServer(socket_path, None).serve())
+
+            compare_with_local_run()
+            cached = {key: entry.value for key, entry in dce_server.cache._asm.items()}
+            self.assertEqual(len(cached), len(input_files))
+
+            # Only the modified input is parsed again
+            modified = os.path.realpath(input_files[-1])
+            with open(modified, "a") as file:
+                file.write("; modified\n")
+            compare_with_local_run()
+            for key, entry in dce_server.cache._asm.items():
+                if key[0] == modified:
+                    self.assertIsNot(entry.value, cached[key])
+                else:
+                    self.assertIs(entry.value, cached[key])
+
+            # Requests that would block the server are rejected
+            response = server.request(
+                socket_path,
+                {"argv": ["--watch", "-o", self.dce_output_dir, *input_files]},
+            )
+            self.assertEqual(response["status"], 2)
+            self.assertIn("--watch can't be used with a server", response["output"])
+
+            response = server.request(
+                socket_path,
+                {"argv": ["--output-archive", "-", *input_files]},
+            )
+            self.assertEqual(response["status"], 2)
+            self.assertIn("archives can't be read from stdin", response["output"])
+        finally:
+            response = server.request(socket_path, {"command": "shutdown"})
+            thread.join()
+
+        self.assertEqual(response["status"], 0)
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_watch(self):
+        input_files = c2asm(
+            [
+                "main.c",
+                "_main.c",
+                "extra.c",
+            ],
+            self.dce_input_dir,
+        )
+
+        options = stm8dce.Options()
+        cache = ParseCache()
+        state = WatchState()
+
+        def iteration():
+            output = io.StringIO()
+            with redirect_stdout(output):
+                _, updated = watch_iteration(
+                    input_files, self.dce_output_dir, options, cache, state
+                )
+            return sorted(updated), output.getvalue()
+
+        updated, _ = iteration()
+        self.assertEqual(len(updated), 3)
+
+        # Backdate all outputs to detect rewrites
+        for output_file in updated:
+            os.utime(output_file, (0, 0))
+
+        # Nothing is written again while the inputs are unchanged
+        self.assertEqual(iteration(), ([], ""))
+
+        # Call unused_function instead of used_function
+        modified = f"{self.dce_input_dir}/_main.asm"
+        with open(modified) as file:
+            content = file.read()
+        self.assertIn("call\t_used_function\n", content)
+        with open(modified, "w") as file:
+            file.write(
+                content.replace("call\t_used_function\n", "call\t_unused_function\n")
+            )
+
+        output_file = f"{self.dce_output_dir}/_main.asm"
+        updated, output = iteration()
+        self.assertEqual(updated, [output_file])
+        self.assertIn(f"Newly kept: _unused_function - {modified}", output)
+        self.assertIn(f"Newly removed: _used_function - {modified}", output)
+
+        # Only the modified input's output was rewritten
+        self.assertNotEqual(os.stat(output_file).st_mtime, 0)
+        for unchanged in ("main.asm", "extra.asm"):
+            self.assertEqual(os.stat(f"{self.dce_output_dir}/{unchanged}").st_mtime, 0)
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
@@ -0,0 +1,28 @@
+#include <stdint.h>
+
+uint8_t ticks;
+
+void tick(void) {
+    ticks++;
+}
+
+void tick_wrapper(void) {
+    tick();
+}
+
+void tick_wrapper_wrapper(void) {
+    tick_wrapper();
+}
+
+void tick_hooked(void) {
+    tick();
+}
+
+void (*tick_hook)(void) = &tick_hooked;
+
+void use_trampolines(void) {
+    tick_wrapper();
+    tick_wrapper_wrapper();
+    tick_hooked();
+    tick_hook();
+}
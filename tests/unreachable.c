@@ -0,0 +1,9 @@
+#include <stdint.h>
+
+volatile uint8_t spin_counter;
+
+void spin_forever(void) {
+    while (1) {
+        spin_counter++;
+    }
+}
@@ -0,0 +1,17 @@
+#include <stdint.h>
+
+uint8_t unused_variable;
+uint8_t used_variable;
+uint8_t written_variable;
+uint16_t unused_initialized_variable = 0x1234;
+uint16_t used_initialized_variable = 0x4321;
+
+void pointed_to_by_unused_variable(void) {
+    __asm__("nop");
+}
+
+void (*unused_function_pointer)(void) = &pointed_to_by_unused_variable;
+
+void use_variables(void) {
+    written_variable = used_variable + (uint8_t)used_initialized_variable;
+}